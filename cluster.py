@@ -0,0 +1,80 @@
+"""
+Запуск модулей на нескольких машинах через общую очередь задач (JOB_QUEUE_FILE).
+
+Координатор:  python cluster.py publish balance      - задачи по выбранным аккаунтам (ACCOUNT_IDS, ACCOUNT_TAGS)
+Воркер:       python cluster.py worker --name box1   - выполнять задачи по аккаунтам своего accounts.txt
+Состояние:    python cluster.py status [модуль]      - задачи по статусам и скорость каждого воркера
+Результаты:   python cluster.py results balance      - подтвержденные результаты в JSONL
+"""
+import argparse
+import json
+import socket
+import sys
+
+from core.accounts import iter_accounts, selected_accounts
+from core.jobqueue import SqliteJobQueue
+from core.worker import job_function, run_worker
+
+
+def publish(jobs, args):
+    job_function(args.module)  # Модуль без run_job отклоняется до публикации
+    accounts = selected_accounts(args.accounts)
+    count = jobs.publish(args.module, [account.id for account in accounts])
+    print(f"Опубликовано задач {args.module}: {count}")
+
+
+def worker(jobs, args):
+    modules = args.modules.split(",") if args.modules else None
+    # Все аккаунты файла, а не только ACCOUNT_IDS: какие из них обрабатывать, решает координатор
+    run_worker(jobs, args.name, iter_accounts(args.accounts), modules, wait=args.wait)
+
+
+def status(jobs, args):
+    stats = jobs.stats(args.module)
+    counts = ", ".join(f"{name} {count}" for name, count in sorted(stats["statuses"].items()))
+    print(f"Задачи: {counts}" if counts else "Задач нет")
+    for row in stats["workers"]:
+        print(f"{row['worker']}: выполнено {row['done']}, неудачно {row['failed']}, "
+              f"{row['rate']:.1f} задач в секунду за {row['elapsed']:.0f} с")
+
+
+def results(jobs, args):
+    for account_id, result in jobs.results(args.module):
+        sys.stdout.write(json.dumps({"account": account_id, **(result or {})}, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запуск модулей через общую очередь задач")
+    parser.add_argument("--queue", default=None, help="файл очереди (по умолчанию JOB_QUEUE_FILE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("publish", help="опубликовать задачи модуля")
+    command.add_argument("module")
+    command.add_argument("--accounts", default="accounts.txt")
+    command.set_defaults(handler=publish)
+
+    command = commands.add_parser("worker", help="выполнять задачи")
+    command.add_argument("--name", default=socket.gethostname())
+    command.add_argument("--modules", help="только эти модули, через запятую")
+    command.add_argument("--accounts", default="accounts.txt")
+    command.add_argument("--wait", action="store_true", help="не завершаться, когда задачи кончились")
+    command.set_defaults(handler=worker)
+
+    command = commands.add_parser("status", help="состояние очереди")
+    command.add_argument("module", nargs="?")
+    command.set_defaults(handler=status)
+
+    command = commands.add_parser("results", help="результаты модуля в JSONL")
+    command.add_argument("module")
+    command.set_defaults(handler=results)
+
+    args = parser.parse_args()
+    jobs = SqliteJobQueue(args.queue) if args.queue else SqliteJobQueue()
+    try:
+        args.handler(jobs, args)
+    finally:
+        jobs.close()
+
+
+if __name__ == "__main__":
+    main()
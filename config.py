@@ -1,13 +1,52 @@
 # Настройки
 
 #Общие настройки
+API_URL = "https://api.bybit.com"  # Адрес REST API Bybit
 MAX_RETRIES = 1  # Максимальное количество попыток при ошибке
 DELAY_BETWEEN_RETRIES = 10  # Задержка между повторными попытками в секундах
 ACCOUNT_DELAY_RANGE = (0, 0)  # Задержка между аккаунтами
+ACCOUNT_IDS = None  # Какие аккаунты запускать, например "1-10,15", если None - то все
+ACCOUNT_TAGS = None  # Запускать только аккаунты с одним из тегов, например ["main"] (теги пишутся в конце строки accounts.txt после " #")
+HTTP_POOL_SIZE = 10  # Максимум keep-alive соединений в пуле на одну пару прокси и хост
+HTTP_TIMEOUT = (5, 15)  # Таймауты запросов в секундах: (на соединение через прокси, на ожидание ответа)
+PROXY_CHECK = True  # Перед запуском параллельно проверить все прокси и сообщить о нерабочих
+PROXY_MAX_FAILURES = 3  # После скольких ошибок соединения подряд прокси считается нерабочим
+PROXY_BACKUP_FILE = "proxies_backup.txt"  # Резервные прокси аккаунтов строками id:ip:port:login:pass, если файла нет - без резерва
+PROXY_REPORT_FILE = "proxy_health.txt"  # Куда записать отчет о прокси в конце запуска, если None - не записывать
+CLOCK_SYNC_SAMPLES = 3  # Сколько замеров времени сервера делать при синхронизации (берется замер с наименьшим RTT); смещение общее для всех прокси, пока у прокси не было ошибки метки времени
+CLOCK_SYNC_INTERVAL = 300  # Как часто в секундах заново синхронизировать часы с сервером
+ENGINE = "scheduler"  # "scheduler" - аккаунты на ограниченном наборе потоков, паузы не занимают потоки; "threads" - отдельный поток на каждый аккаунт; "async" - аккаунты как корутины одного event loop, новые берутся по мере завершения
+SCHEDULER_WORKERS = 32  # Сколько потоков выполняют шаги аккаунтов в режимах "scheduler" и "async"
+ASYNC_CONCURRENCY = 500  # Сколько аккаунтов одновременно в работе в режиме "async" (аккаунт на паузе поток не занимает)
+PROCESSES = 1  # На сколько процессов делить аккаунты в модулях баланса и адресов депозита (для десятков тысяч аккаунтов - по числу ядер), 1 - без деления
+RATE_LIMITS = {"order": 10, "asset": 5, "account": 10, "public": 50}  # Запросов в секунду на один API-ключ по типам эндпоинтов, уточняются по заголовкам X-Bapi-Limit
+IP_RATE_LIMIT = 100  # Запросов в секунду через один прокси
+BALANCE_CACHE_TTL = 5  # Сколько секунд модули используют один и тот же снимок балансов аккаунта
+RATE_LIMIT_BACKOFF = 1  # Пауза в секундах после ответа о превышении лимита, если биржа не указала время сброса
+WS_URL = "wss://stream.bybit.com"  # Адрес WebSocket Bybit
+WS_PING_INTERVAL = 20  # Как часто в секундах отправлять ping в WebSocket, чтобы биржа не закрыла соединение
+WS_RECONNECT_MAX_DELAY = 30  # Максимальная пауза в секундах между попытками переподключения WebSocket
+ORDER_TRANSPORT = "rest"  # Как отправлять ордера в модулях свапов и объема: "rest" - отдельный HTTPS-запрос на каждый ордер, "ws" - через постоянный торговый WebSocket
+WS_ORDER_TIMEOUT = 5  # Сколько секунд ждать ответа биржи на ордер, отправленный через WebSocket
+LOG_DIR = "logs"  # Папка журналов запуска в формате JSONL (по файлу на модуль и запуск), если None - только вывод в консоль
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Размер файла журнала, после которого он переименовывается в .1 и начинается новый
+LOG_BACKUPS = 5  # Сколько старых частей журнала хранить
+LOG_FLUSH_INTERVAL = 1  # Как часто в секундах сбрасывать журнал на диск
+RESULT_FSYNC_EVERY = 100  # Результаты аккаунтов (балансы, адреса) пишутся в файл .partial по мере получения и сбрасываются на диск раз в столько записей
+RESULT_FSYNC_INTERVAL = 1  # ... или раз в столько секунд, если записи приходят редко
+JOURNAL_FILE = "journal.db"  # Журнал запусков перевода, вывода и объема: с ним прерванный запуск продолжается с флагом --resume без повторных операций
+JOB_QUEUE_FILE = "jobs.db"  # Очередь задач для запуска на нескольких машинах (cluster.py): SQLite-файл на общем диске (без WAL, поэтому подходит и сетевой диск с блокировками файлов)
+JOB_LEASE_SECONDS = 120  # На сколько секунд воркер берет задачу; если он пропал, задачу после этого получит другой
+JOB_MAX_ATTEMPTS = 3  # Сколько раз задача выдается воркерам, прежде чем считается неудачной
+JOB_LEASE_BATCH = 50  # Сколько задач воркер берет за раз
+JOB_POLL_INTERVAL = 5  # Как часто воркер в режиме ожидания проверяет очередь на новые задачи
+CONTROL_API = False  # Запускать ли вместе с меню main.py локальный HTTP API для запуска модулей (python main.py --serve - только API, без меню)
+CONTROL_API_PORT = 8765  # Порт HTTP API на 127.0.0.1
+CONTROL_API_TOKEN = ""  # Токен HTTP API: если задан, запросы должны передавать его в заголовке X-Control-Token ("" - без токена)
 
 
 #МОДУЛЬ ПРОВЕРКИ БАЛАНСА
-TOKEN = "USDT"  # Указываем баланс какого токена мы проверяем
+TOKEN = "USDT"  # Указываем баланс какого токена мы проверяем, можно списком: ["USDT", "USDC"]
 THRESHOLD = 1  # Указываем мин баланс, выше которого баланс будет подсвечен зеленым цветом, ниже красным, если None - то все будет одним цветом
 ACCOUNT_TYPE = "UNIFIED"  # Указываем какой счет байбит проверяем "FUND" или "UNIFIED"
 
@@ -16,10 +55,16 @@ CHOSEN_TOKEN = "USDT" # Указываем токен который перев
 FROM_ACCOUNT_TYPE = "UNIFIED" # Указываем с какого счета переводим "FUND" или "UNIFIED"
 TO_ACCOUNT_TYPE = "FUND" # Указываем на какой счет переводим "FUND" или "UNIFIED"
 TRANSFER_AMOUNT = None # Указываем сумму которую хотим перевести, если None то переведет весь баланс
+TRANSFER_SWEEP = False # True - перевести сразу все монеты счета (по одному запросу балансов на аккаунт) вместо одного CHOSEN_TOKEN, TRANSFER_AMOUNT не используется
+SWEEP_COINS = None # Какие монеты переводить в режиме TRANSFER_SWEEP, например ["USDT", "ETH"], если None - все монеты на счете
+SWEEP_MIN_AMOUNTS = {"USDT": 0.01, "USDC": 0.01} # Остаток монеты меньше этого считается пылью и не переводится, для остальных монет - 0.0001
 
 #МОДУЛЬ ТОРГОВОГО ОБЬЕМА НА СПОТЕ В ПАРЕ USDC-USDT
 REPEATS = 2  # Пример значения, задайте нужное количество повторений свапов (одно повтоение это два свапа)
 PAUSE_RANGE = (5, 5)  # Минимальное и максимальное время задержки между свапами
+USE_PRIVATE_STREAM = True  # Ждать исполнения ордеров по приватному WebSocket вместо опроса баланса через REST
+WS_FILL_TIMEOUT = 10  # Сколько секунд ждать события об исполнении ордера, после этого исполнение запрашивается через REST
+RECONCILE_EVERY = 5  # Через сколько повторений сверять локально посчитанный баланс с биржей, если 0 - только в начале и в конце
 
 #МОДУЛЬ СВАП ЛЮБОЙ ПАРЫ НА СПОТЕ И НА МАРЖЕ
 TOKEN_1 = "VELAR" #токен который указан первым  в паре, если пара BNBUSDT - то указываем тут BNB
@@ -27,12 +72,30 @@ TOKEN_2 = "USDT" #токен который указан вторым в пар
 TRADE_DIRECTION = "SELL"  # "SELL" Или "BUY"
 EXCHANGE_AMOUNT = None  # Указываем сумму которую хотим обменять, если None то свапнет весь баланс монеты
 LEV = 10 # Задаем кредитное плече 
-DECIMAL_PLACES = 4 # Количество символов после запятой которое скрипт будет отправлять в работу
+DECIMAL_PLACES = 4 # Количество знаков после запятой, если параметры пары не удалось получить с биржи (обычно шаг количества берется из /v5/market/instruments-info)
+INSTRUMENT_CACHE_TTL = 3600 # Сколько секунд хранить параметры пар (шаг количества, минимум ордера) в .cache/instruments.json
+ACCOUNT_STATE_TTL = 86400 # Сколько секунд доверять сохраненному в .cache/account_state.json состоянию аккаунта (маржа, плечо, статус UTA); при ошибке биржи оно перечитывается
+WARMUP = True # Перед ордерами заранее открыть и авторизовать соединения всех аккаунтов, чтобы ордера шли по горячим соединениям
 
 #МОДУЛЬ ВЫВОДА С БИРЖИ
 CHOSEN_TOKEN_WITHDRAW = "USDT" # указываем токен который выводим
 DESIRED_NETWORK = "BSC" # Указываем название сети в которой делаем вывод, используй модуль "Узнать доступные сети для вывода" чтобы узнать как правильно записать сеть
 WITHDRAW_AMOUNT = None # Указываем сумму которую хотим вывести, если None то выведет весь баланс
+COIN_CACHE_TTL = 3600 # Сколько секунд хранить список монет и сетей (комиссия и минимум вывода, точность) в .cache/coins.json; по нему монета и сеть проверяются до запросов аккаунтов
+
+#МОДУЛЬ ОБНОВЛЕНИЯ ДО UTA
+UTA_POLL_INTERVAL = 10 # Через сколько секунд после запросов на обновление впервые проверить статус аккаунтов
+UTA_POLL_MAX_INTERVAL = 60 # Пауза между проверками удваивается до этого значения
+UTA_POLL_TIMEOUT = 300 # Сколько секунд всего ждать завершения обновления, после этого аккаунты попадают в итог как "еще идет"
+
+#МОДУЛЬ СУБАККАУНТОВ ЧЕРЕЗ МАСТЕР-КЛЮЧ
+MASTER_FILE = "master.txt" # Файл с одной строкой мастер-аккаунта в формате accounts.txt, ключу нужны права на субаккаунты и переводы между ними
+SUB_MODE = "balance" # "balance" - балансы всех субаккаунтов, "sweep" - собрать монету с субаккаунтов на мастер, "fund" - отправить каждому субаккаунту SUB_FUND_AMOUNT
+SUB_COIN = "USDT" # Монета, можно списком: ["USDT", "USDC"]
+SUB_ACCOUNT_TYPE = "FUND" # Счет субаккаунтов "FUND" или "UNIFIED"
+MASTER_ACCOUNT_TYPE = "FUND" # Счет мастер-аккаунта, на который собираются и с которого отправляются монеты
+SUB_FUND_AMOUNT = 10 # Сколько каждой монеты отправить каждому субаккаунту в режиме "fund"
+SUB_MEMBER_IDS = None # UID субаккаунтов, с которыми работать, например "123456-123460,123470", если None - со всеми
 
 #МОДУЛЬ ПОЛУЧЕНИЯ АДРЕСА ДЛЯ ДЕПОЗИТА
 COIN = "ETH" # Указываем токен который планируем депозитить
@@ -0,0 +1 @@
+# Общие компоненты, которые используются всеми модулями из папки modules
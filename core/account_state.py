@@ -0,0 +1,157 @@
+"""
+Сохраненное состояние аккаунтов: режим маржинальной торговли, плечо, статус UTA и режим маржи.
+
+Состояние читается из /v5/spot-margin-trade/state и /v5/account/info и хранится в
+.cache/account_state.json не дольше ACCOUNT_STATE_TTL секунд, поэтому повторный запуск не
+включает маржу и не ставит плечо заново, если они не менялись. После успешного изменения
+модуль записывает новое значение через update(), а при ошибке биржи сбрасывает состояние
+через invalidate() - следующий get() перечитает его с биржи.
+
+Ключи API в файл не попадают: записи хранятся по хэшу ключа.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import ACCOUNT_STATE_TTL
+from core import api, engine
+
+CACHE_FILE = os.path.join(".cache", "account_state.json")
+
+# unifiedMarginStatus: 1 - классический счет, 3 и 4 - UTA 1.0, 5 и 6 - UTA 2.0
+UNIFIED_STATUSES = (3, 4, 5, 6)
+
+_states = None
+_dirty = False
+_lock = threading.Lock()
+_locks = {}
+
+
+def _key_id(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:24]
+
+
+def _load():
+    global _states
+    if _states is None:
+        try:
+            with open(CACHE_FILE, "r") as file:
+                _states = json.load(file)
+        except (OSError, ValueError):
+            _states = {}
+        atexit.register(save)
+    return _states
+
+
+def _lock_for(key_id):
+    with _lock:
+        lock = _locks.get(key_id)
+        if lock is None:
+            lock = _locks[key_id] = threading.Lock()
+        return lock
+
+
+def _fetch(api_key, api_secret, proxy):
+    state = {}
+    data = api.signed_get("/v5/spot-margin-trade/state", api_key, api_secret, proxy)
+    if data.get("retCode") == 0:
+        state["spotMarginMode"] = str(data["result"].get("spotMarginMode", ""))
+        state["spotLeverage"] = str(data["result"].get("spotLeverage", ""))
+    data = api.signed_get("/v5/account/info", api_key, api_secret, proxy)
+    if data.get("retCode") == 0:
+        state["unifiedMarginStatus"] = data["result"].get("unifiedMarginStatus")
+        state["marginMode"] = data["result"].get("marginMode")
+    return state
+
+
+def get(api_key, api_secret, proxy, max_age=ACCOUNT_STATE_TTL, fetch=True):
+    """
+    Состояние аккаунта: {"spotMarginMode", "spotLeverage", "unifiedMarginStatus", "marginMode"}.
+    Поля, которые биржа не вернула, отсутствуют. Если биржа недоступна (или fetch=False и
+    сохраненного состояния нет), возвращается {} и модуль отправляет изменяющие запросы как раньше.
+    """
+    key_id = _key_id(api_key)
+    states = _load()
+    cached = states.get(key_id)
+    if cached is not None and time.time() - cached["fetched"] < max_age:
+        return cached
+    if not fetch:
+        return {}
+
+    with _lock_for(key_id):
+        cached = states.get(key_id)
+        if cached is not None and time.time() - cached["fetched"] < max_age:
+            return cached
+        try:
+            state = _fetch(api_key, api_secret, proxy)
+        except Exception:
+            return {}
+        if not state:
+            return {}
+        state["fetched"] = time.time()
+        _store(key_id, state)
+        return state
+
+
+def _store(key_id, state):
+    global _dirty
+    with _lock:
+        _states[key_id] = state
+        _dirty = True
+
+
+def update(api_key, **fields):
+    """Записывает значения, которые модуль только что успешно изменил на бирже."""
+    key_id = _key_id(api_key)
+    states = _load()
+    state = dict(states.get(key_id) or {"fetched": time.time()})
+    state.update(fields)
+    _store(key_id, state)
+
+
+def invalidate(api_key):
+    """Сбрасывает состояние после ошибки биржи: оно могло измениться вне скрипта."""
+    global _dirty
+    states = _load()
+    with _lock:
+        if states.pop(_key_id(api_key), None) is not None:
+            _dirty = True
+
+
+def is_unified(state):
+    return state.get("unifiedMarginStatus") in UNIFIED_STATUSES
+
+
+def refresh(accounts):
+    """Читает состояние аккаунтов, у которых его нет или оно устарело, параллельно до начала работы."""
+    states = _load()
+    now = time.time()
+    stale = [account for account in accounts
+             if now - (states.get(_key_id(account.api_key)) or {}).get("fetched", 0) >= ACCOUNT_STATE_TTL]
+    if stale:
+        print(f"Чтение состояния аккаунтов с биржи: {len(stale)} из {len(accounts)}")
+        # Без ACCOUNT_DELAY_RANGE: это чтение, а задержки между аккаунтами нужны для ордеров
+        engine.run_accounts(get, [(account.api_key, account.api_secret, account.proxy) for account in stale],
+                            delay_range=(0, 0))
+    save()
+
+
+def save():
+    """Пишет измененное состояние в .cache/account_state.json (один раз за запуск, а не на каждый аккаунт)."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        data = json.dumps(_states)
+        _dirty = False
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        temp_path = CACHE_FILE + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(data)
+        os.replace(temp_path, CACHE_FILE)
+    except OSError:
+        pass
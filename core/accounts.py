@@ -0,0 +1,210 @@
+"""
+Единый реестр аккаунтов из accounts.txt.
+
+Формат строки: id:api_key:api_secret:ip:port:login:pass[:withdraw_address[:withdraw_tag]] [#тег1,тег2]
+Теги после " #" нужны только для выбора аккаунтов (настройка ACCOUNT_TAGS).
+Номер аккаунта - любая строка; числовой номер хранится числом и выбирается диапазонами ACCOUNT_IDS.
+"""
+import gc
+import os
+import pickle
+
+from config import ACCOUNT_IDS, ACCOUNT_TAGS
+
+CACHE_VERSION = 2
+
+# {путь: ((mtime, size), AccountRegistry)} - реестры, уже загруженные этим процессом
+_loaded = {}
+
+
+class Account:
+    __slots__ = ("id", "api_key", "api_secret", "proxy_ip", "proxy_port", "proxy_login", "proxy_password",
+                 "withdraw_address", "withdraw_tag", "tags", "proxy_url", "proxy")
+
+    def __init__(self, id, api_key, api_secret, proxy_ip, proxy_port, proxy_login, proxy_password,
+                 withdraw_address=None, withdraw_tag=None, tags=()):
+        self.id = id
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.proxy_ip = proxy_ip
+        self.proxy_port = proxy_port
+        self.proxy_login = proxy_login
+        self.proxy_password = proxy_password
+        self.withdraw_address = withdraw_address
+        self.withdraw_tag = withdraw_tag
+        self.tags = tags
+        # URL и словарь прокси собираются один раз, а не при каждом запросе
+        self.proxy_url = f"http://{proxy_login}:{proxy_password}@{proxy_ip}:{proxy_port}"
+        self.proxy = {"http": self.proxy_url, "https": self.proxy_url}
+
+    def to_tuple(self):
+        return (self.id, self.api_key, self.api_secret, self.proxy_ip, self.proxy_port, self.proxy_login,
+                self.proxy_password, self.withdraw_address, self.withdraw_tag, self.tags)
+
+    def __repr__(self):
+        return f"Account({self.id})"
+
+
+def parse_id(text):
+    """Номер аккаунта: число, если он из цифр, иначе строка как есть."""
+    text = str(text).strip()
+    return int(text) if text.isdigit() else text
+
+
+def id_sort_key(account_id):
+    """Ключ сортировки номеров: сначала числовые по возрастанию, потом строковые."""
+    return (isinstance(account_id, str), account_id)
+
+
+def parse_line(line):
+    """Разбирает строку accounts.txt. Возвращает Account, None для пустой строки, ValueError при ошибке."""
+    line, _, tags_part = line.strip().partition(" #")
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    parts = [part.strip() for part in line.split(":")]
+    if len(parts) < 7:
+        raise ValueError("не хватает данных, нужно минимум 7 полей")
+
+    tags = tuple(tag.strip() for tag in tags_part.split(",") if tag.strip())
+    return Account(parse_id(parts[0]), *parts[1:7],
+                   withdraw_address=parts[7] if len(parts) > 7 and parts[7] else None,
+                   withdraw_tag=parts[8] if len(parts) > 8 and parts[8] else None,
+                   tags=tags)
+
+
+def iter_accounts(filename="accounts.txt"):
+    """Читает файл построчно, не загружая его целиком в память."""
+    with open(filename, "r") as file:
+        for index, line in enumerate(file):
+            try:
+                account = parse_line(line)
+            except ValueError as e:
+                print(f"Ошибка в строке {index + 1} файла {filename}: {e}")
+                continue
+            if account is not None:
+                yield account
+
+
+def parse_ids(spec):
+    """'1-10,15,main' -> [(1, 10), (15, 15), ('main', 'main')]: нечисловая часть - один номер как есть."""
+    ranges = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        if start.strip().isdigit() and (not end or end.strip().isdigit()):
+            ranges.append((int(start), int(end or start)))
+        else:
+            ranges.append((part, part))
+    return ranges
+
+
+def id_in(account_id, ranges):
+    """Входит ли номер в диапазоны parse_ids: числовой - по диапазонам, строковый - точным совпадением."""
+    if isinstance(account_id, str):
+        return (account_id, account_id) in ranges
+    return any(isinstance(start, int) and start <= account_id <= end for start, end in ranges)
+
+
+class AccountRegistry:
+    """
+    Все строки файла загружаются в память кортежами (в таком виде они и кэшируются в .cache);
+    откладывается только создание объекта Account - при первом обращении к аккаунту.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._accounts = [None] * len(rows)
+        self._by_id = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for index in range(len(self.rows)):
+            yield self._account(index)
+
+    def _account(self, index):
+        account = self._accounts[index]
+        if account is None:
+            account = self._accounts[index] = Account(*self.rows[index])
+        return account
+
+    def get(self, account_id):
+        if self._by_id is None:
+            self._by_id = {row[0]: index for index, row in enumerate(self.rows)}
+        index = self._by_id.get(parse_id(account_id))
+        return None if index is None else self._account(index)
+
+    def select(self, ids=None, tags=None):
+        """Аккаунты из диапазонов ids ('1-10,15') и/или с любым из тегов tags."""
+        ranges = parse_ids(ids) if ids else None
+        tags = set(tags) if tags else None
+        for index, row in enumerate(self.rows):
+            if ranges is not None and not id_in(row[0], ranges):
+                continue
+            if tags is not None and not tags.intersection(row[9]):
+                continue
+            yield self._account(index)
+
+    def selected(self):
+        """Аккаунты, выбранные настройками ACCOUNT_IDS и ACCOUNT_TAGS."""
+        return list(self.select(ACCOUNT_IDS, ACCOUNT_TAGS))
+
+
+def _cache_path(filename):
+    path = os.path.abspath(filename)
+    directory = os.path.join(os.path.dirname(path), ".cache")
+    return os.path.join(directory, os.path.basename(path) + ".pickle")
+
+
+def _read_cache(cache_path, stat):
+    # Сборщик мусора на время загрузки отключен: на сотнях тысяч кортежей он тратит больше времени, чем сам pickle
+    gc.disable()
+    try:
+        with open(cache_path, "rb") as file:
+            version, mtime, size, rows = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+    finally:
+        gc.enable()
+    if version != CACHE_VERSION or mtime != stat.st_mtime_ns or size != stat.st_size:
+        return None
+    return rows
+
+
+def _write_cache(cache_path, stat, rows):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump((CACHE_VERSION, stat.st_mtime_ns, stat.st_size, rows), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def load_accounts(filename="accounts.txt"):
+    """Загружает реестр; разобранный файл кэшируется в .cache и перечитывается только при изменении."""
+    stat = os.stat(filename)
+    # В долгоживущем процессе (main.py) реестр берется из памяти, пока файл не изменился
+    key = os.path.abspath(filename)
+    loaded = _loaded.get(key)
+    if loaded is not None and loaded[0] == (stat.st_mtime_ns, stat.st_size):
+        return loaded[1]
+
+    cache_path = _cache_path(filename)
+    rows = _read_cache(cache_path, stat)
+    if rows is None:
+        rows = [account.to_tuple() for account in iter_accounts(filename)]
+        _write_cache(cache_path, stat, rows)
+    registry = AccountRegistry(rows)
+    _loaded[key] = ((stat.st_mtime_ns, stat.st_size), registry)
+    return registry
+
+
+def selected_accounts(filename="accounts.txt"):
+    return load_accounts(filename).selected()
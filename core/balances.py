@@ -0,0 +1,108 @@
+"""
+Снимок всех балансов счета одним запросом с коротким общим кэшем.
+
+UNIFIED читается из /v5/account/wallet-balance, остальные типы счетов (FUND, SPOT, CONTRACT)
+из /v5/asset/transfer/query-account-coins-balance. В обоих случаях результат приводится
+к виду {coin: {"walletBalance": float, "transferBalance": float}}.
+
+transferBalance в wallet-balance - availableToWithdraw, который биржа может вернуть пустым
+(тогда 0). Точную сумму для перевода считает сама биржа: get_transferable берет ее из
+query-account-coins-balance для любого типа счета, включая UNIFIED (за вычетом залога
+ордеров и маржи позиций).
+"""
+import threading
+import time
+
+from config import BALANCE_CACHE_TTL
+from core import api
+
+_cache = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _lock_for(key):
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.Lock()
+        return lock
+
+
+def parse_wallet(wallets):
+    """Список кошельков в формате wallet-balance (и топика wallet в WebSocket) -> {coin: {...}}."""
+    balances = {}
+    for wallet in wallets:
+        for row in wallet.get("coin", []):
+            balances[row["coin"]] = {
+                "walletBalance": _to_float(row.get("walletBalance")),
+                "transferBalance": _to_float(row.get("availableToWithdraw")),
+            }
+    return balances
+
+
+def _fetch_unified(api_key, api_secret, proxy):
+    data = api.signed_get("/v5/account/wallet-balance", api_key, api_secret, proxy, {"accountType": "UNIFIED"})
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить балансы: {data.get('retMsg')}")
+    return parse_wallet(data["result"]["list"])
+
+
+def _fetch_coins(api_key, api_secret, proxy, account_type):
+    params = {"accountType": account_type}
+    data = api.signed_get("/v5/asset/transfer/query-account-coins-balance", api_key, api_secret, proxy, params)
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить балансы: {data.get('retMsg')}")
+
+    return {
+        row["coin"]: {
+            "walletBalance": _to_float(row.get("walletBalance")),
+            "transferBalance": _to_float(row.get("transferBalance")),
+        }
+        for row in data["result"]["balance"]
+    }
+
+
+def get_balances(api_key, api_secret, proxy, account_type="UNIFIED", max_age=BALANCE_CACHE_TTL):
+    """Все монеты счета одним запросом. Ответ не старше max_age секунд берется из кэша."""
+    key = (api_key, account_type)
+    cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < max_age:
+        return cached[1]
+
+    with _lock_for(key):
+        # Если несколько потоков запросили один счет, запрос уйдет только один
+        cached = _cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+        if account_type == "UNIFIED":
+            balances = _fetch_unified(api_key, api_secret, proxy)
+        else:
+            balances = _fetch_coins(api_key, api_secret, proxy, account_type)
+        _cache[key] = (time.monotonic(), balances)
+        return balances
+
+
+def get_transferable(api_key, api_secret, proxy, account_type="UNIFIED"):
+    """Снимок счета с transferBalance, посчитанным биржей для перевода. Без кэша: нужен перед переводом."""
+    return _fetch_coins(api_key, api_secret, proxy, account_type)
+
+
+def get_balance(api_key, api_secret, proxy, coin, account_type="UNIFIED", max_age=BALANCE_CACHE_TTL):
+    """walletBalance одной монеты из снимка, 0 если монеты на счете нет."""
+    balances = get_balances(api_key, api_secret, proxy, account_type, max_age)
+    return balances.get(coin, {}).get("walletBalance", 0.0)
+
+
+def invalidate(api_key, account_type=None):
+    """Сбрасывает кэш после ордера или перевода, которые меняют баланс."""
+    for key in list(_cache):
+        if key[0] == api_key and (account_type is None or key[1] == account_type):
+            _cache.pop(key, None)
@@ -0,0 +1,105 @@
+import re
+import threading
+import time
+
+from config import API_URL, CLOCK_SYNC_SAMPLES, CLOCK_SYNC_INTERVAL
+from core import transport
+
+TIME_URL = API_URL + "/v5/market/time"
+
+# retCode 10002: метка времени запроса вне recv_window
+_TIMESTAMP_ERROR = re.compile(rb'"retCode"\s*:\s*10002\b')
+
+# Смещение часов Bybit относительно локальных. Оно зависит от локальных часов, а не от прокси,
+# поэтому одно общее смещение (rtt_ms, offset_ms, synced_at) подходит всем прокси: из замеров через
+# любые прокси (в том числе проверок прокси перед запуском) берется замер с наименьшим RTT.
+# Свое смещение {proxy: (rtt_ms, offset_ms, synced_at)} прокси получает, только когда с ним пришла
+# ошибка 10002, и тогда замеров CLOCK_SYNC_SAMPLES
+_shared = None
+_offsets = {}
+_skewed = set()
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(key):
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.Lock()
+        return lock
+
+
+def _measure(proxies, failover=True):
+    """Один замер: возвращает (rtt_ms, offset_ms)."""
+    sent = time.time() * 1000
+    response = transport.get(TIME_URL, proxies=proxies, failover=failover)
+    received = time.time() * 1000
+    if response.status_code != 200:
+        raise Exception(f"Не удалось получить время сервера: {response.status_code}")
+
+    result = response.json()['result']
+    if result.get('timeNano'):
+        server_ms = int(result['timeNano']) / 1_000_000
+    else:
+        server_ms = int(result['timeSecond']) * 1000
+    return received - sent, server_ms - (sent + received) / 2
+
+
+def _fresh(cached):
+    return cached is not None and time.monotonic() - cached[2] < CLOCK_SYNC_INTERVAL
+
+
+def sync(proxies, failover=True, samples=CLOCK_SYNC_SAMPLES):
+    """
+    Измеряет смещение через этот прокси (samples замеров, берется замер с наименьшим RTT).
+    Замер уточняет общее смещение, а у прокси с ошибкой 10002 становится его собственным.
+    """
+    global _shared
+    rtt, offset = min(_measure(proxies, failover) for _ in range(samples))
+    synced = (rtt, offset, time.monotonic())
+    key = transport.proxy_key(proxies)
+    if key in _skewed:
+        _offsets[key] = synced
+        return offset
+    with _locks_guard:
+        if not _fresh(_shared) or rtt < _shared[0]:
+            _shared = synced
+        return _shared[1]
+
+
+def get_offset(proxies):
+    key = transport.proxy_key(proxies)
+    skewed = key in _skewed
+    cached = _offsets.get(key) if skewed else _shared
+    if _fresh(cached):
+        return cached[1]
+
+    # Без ошибки 10002 смещение общее: одна синхронизация на процесс, а не на каждый прокси
+    with _lock_for(key if skewed else None):
+        # Пока ждали блокировку, смещение мог обновить другой поток
+        cached = _offsets.get(key) if skewed else _shared
+        if _fresh(cached):
+            return cached[1]
+        return sync(proxies)
+
+
+def timestamp(proxies):
+    """Время сервера Bybit в миллисекундах без отдельного запроса к /v5/market/time."""
+    return int(time.time() * 1000 + get_offset(proxies))
+
+
+def invalidate(proxies):
+    """Ошибка метки времени через этот прокси: дальше у него свое смещение, измеренное заново."""
+    key = transport.proxy_key(proxies)
+    _skewed.add(key)
+    _offsets.pop(key, None)
+
+
+def _on_response(response, proxies):
+    # Ошибка метки времени: при следующей подписи смещение будет измерено заново
+    if _TIMESTAMP_ERROR.search(response.content[:200]):
+        invalidate(proxies)
+
+
+transport.add_response_hook(_on_response)
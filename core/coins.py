@@ -0,0 +1,162 @@
+"""
+Справочник монет и сетей из /v5/asset/coin/query-info: комиссия и минимум вывода, точность суммы
+(minAccuracy) и открыты ли депозит и вывод в сети.
+
+Справочник всех монет загружается одним подписанным запросом (ключом первого аккаунта) и хранится
+в памяти и в .cache/coins.json не дольше COIN_CACHE_TTL секунд. Поиск идет по двум индексам - по
+монете и по сети, - поэтому проверка COIN/CHAIN, DESIRED_NETWORK или CHOSEN_TOKEN в модулях идет в
+памяти до запросов аккаунтов: опечатка в сети останавливает модуль сразу, а не ошибкой на каждом аккаунте.
+"""
+import json
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+from config import COIN_CACHE_TTL
+from core import api
+
+CACHE_FILE = os.path.join(".cache", "coins.json")
+
+_catalogue = None
+_failed_at = 0.0
+_lock = threading.Lock()
+
+
+class Chain:
+    """Одна сеть одной монеты."""
+
+    __slots__ = ("coin", "chain", "chain_type", "withdraw_fee", "withdraw_min", "precision", "deposit_min",
+                 "can_deposit", "can_withdraw")
+
+    def __init__(self, coin, row):
+        self.coin = coin
+        self.chain = row["chain"]
+        self.chain_type = row.get("chainType", "")
+        self.withdraw_fee = Decimal(row.get("withdrawFee") or "0")
+        self.withdraw_min = Decimal(row.get("withdrawMin") or "0")
+        self.precision = int(row.get("minAccuracy") or 8)
+        self.deposit_min = Decimal(row.get("depositMin") or "0")
+        self.can_deposit = str(row.get("chainDeposit")) == "1"
+        self.can_withdraw = str(row.get("chainWithdraw")) == "1"
+
+    def quantize(self, amount):
+        """Сумма, обрезанная вниз до minAccuracy знаков (Decimal)."""
+        return Decimal(str(amount)).quantize(Decimal(1).scaleb(-self.precision), rounding=ROUND_DOWN)
+
+
+class Catalogue:
+    """Индексы справочника: монета -> {сеть: Chain} и сеть -> {монета: Chain}."""
+
+    def __init__(self, fetched, rows):
+        self.fetched = fetched
+        self.by_coin = {}
+        self.by_chain = {}
+        for row in rows:
+            coin = row["coin"]
+            chains = self.by_coin.setdefault(coin, {})
+            for chain_row in row.get("chains") or []:
+                chain = Chain(coin, chain_row)
+                chains[chain.chain] = chain
+                self.by_chain.setdefault(chain.chain, {})[coin] = chain
+
+    def chains(self, coin):
+        return self.by_coin.get(coin.upper(), {})
+
+    def coins_on(self, chain):
+        return self.by_chain.get(chain.upper(), {})
+
+    def get(self, coin, chain):
+        return self.chains(coin).get(chain.upper())
+
+    def check(self, coin, chain=None, purpose="withdraw"):
+        """Текст ошибки, если монеты или сети нет в справочнике или purpose ("withdraw"/"deposit") в ней закрыт, иначе None."""
+        chains = self.by_coin.get(coin.upper())
+        if chains is None:
+            return f"Монета {coin} не найдена в справочнике биржи"
+        if chain is None:
+            return None
+        found = chains.get(chain.upper())
+        if found is None:
+            known = ", ".join(sorted(chains)) or "нет сетей"
+            return f"Сеть {chain} не найдена для {coin}. Доступные сети: {known}"
+        if purpose == "withdraw" and not found.can_withdraw:
+            return f"Вывод {coin} в сети {found.chain} сейчас закрыт биржей"
+        if purpose == "deposit" and not found.can_deposit:
+            return f"Депозит {coin} в сети {found.chain} сейчас закрыт биржей"
+        return None
+
+
+def _read_disk():
+    try:
+        with open(CACHE_FILE, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_disk(entry):
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        temp_path = CACHE_FILE + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(entry, file)
+        os.replace(temp_path, CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _fetch(account):
+    data = api.signed_get("/v5/asset/coin/query-info", account.api_key, account.api_secret, account.proxy)
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить список монет и сетей: {data.get('retMsg')}")
+    return data["result"]["rows"]
+
+
+def get_catalogue(account=None):
+    """
+    Справочник из памяти, из .cache/coins.json или одним запросом с ключом account.
+    None, если справочника нет и получить его не удалось (или account не передан): тогда
+    модули работают без предварительной проверки, как раньше.
+    """
+    global _catalogue, _failed_at
+    cached = _catalogue
+    if cached is not None and time.time() - cached.fetched < COIN_CACHE_TTL:
+        return cached
+
+    with _lock:
+        if _catalogue is not None and time.time() - _catalogue.fetched < COIN_CACHE_TTL:
+            return _catalogue
+        # После неудачного запроса новая попытка не чаще раза в минуту, а не на каждом аккаунте
+        if time.time() - _failed_at < 60:
+            return _catalogue
+
+        entry = _read_disk()
+        if entry is None or time.time() - entry["fetched"] >= COIN_CACHE_TTL:
+            try:
+                if account is None:
+                    raise Exception("Нет аккаунта для запроса списка монет и сетей")
+                entry = {"fetched": time.time(), "rows": _fetch(account)}
+            except Exception as e:
+                _failed_at = time.time()
+                if entry is None:
+                    print(f"{e}. Монета и сеть не проверяются заранее")
+                    return None
+                print(f"{e}. Используется сохраненный список монет и сетей")
+            else:
+                _save_disk(entry)
+
+        _catalogue = Catalogue(entry["fetched"], entry["rows"])
+        return _catalogue
+
+
+def get_chain(coin, chain, account=None):
+    """Параметры сети chain монеты coin или None, если их нет в справочнике."""
+    catalogue = get_catalogue(account)
+    return catalogue.get(coin, chain) if catalogue is not None else None
+
+
+def check(coin, chain=None, purpose="withdraw", account=None):
+    """Проверка монеты и сети по справочнику: текст ошибки или None (в том числе если справочника нет)."""
+    catalogue = get_catalogue(account)
+    return catalogue.check(coin, chain, purpose) if catalogue is not None else None
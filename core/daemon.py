@@ -0,0 +1,194 @@
+"""
+Запуск модулей внутри одного долгоживущего процесса.
+
+Между запусками остаются прогретыми пулы соединений (core.transport), смещение часов
+(core.clock), кэши балансов и реестр аккаунтов. Перед каждым запуском config.py и модуль
+перечитываются: модуль берет настройки при импорте (токены, монеты, суммы) и там же открывает
+файл журнала запуска, поэтому правки config.py между запусками применяются, а у каждого
+запуска свой файл в LOG_DIR. Настройки самих core-модулей (прокси, пулы, лимиты) действуют с
+момента старта процесса. Запуски выполняются по одному в порядке поступления: из меню
+main.py и из локального HTTP API.
+
+HTTP API слушает только 127.0.0.1:CONTROL_API_PORT:
+    GET  /modules           - модули, которые можно запускать
+    POST /run               - {"module": "balance", "resume": false} -> {"id": 1}
+    GET  /jobs, /jobs/<id>  - запуски и их состояние
+    GET  /stats             - статистика соединений
+
+POST принимается только с Content-Type: application/json и без чужого заголовка Origin:
+страница в браузере не может отправить такой запрос на 127.0.0.1 без разрешения CORS.
+Если задан CONTROL_API_TOKEN, каждый запрос должен передавать его в заголовке X-Control-Token.
+"""
+import hmac
+import importlib
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from config import CONTROL_API_TOKEN
+from core import journal, transport, proxy_pool
+
+# Модули, которые можно запускать без ввода с клавиатуры
+MODULES = ["balance", "transfer", "volume_spot", "swap", "leverage_swap", "withdraw", "get_address", "upgrade_to_uta", "subaccounts"]
+# Модули с вводом с клавиатуры - только из меню
+INTERACTIVE_MODULES = ["network"]
+
+
+def load_module(module):
+    """Модуль modules/<module>.py, импортированный заново вместе с config.py."""
+    importlib.reload(config)
+    name = f"modules.{module}"
+    if name in sys.modules:
+        return importlib.reload(sys.modules[name])
+    return importlib.import_module(name)
+
+
+class Runner:
+    """Очередь запусков модулей и поток, который выполняет их по одному."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._current = None
+        self.jobs = {}
+        transport.add_response_hook(self._on_response)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, module, resume=False):
+        """Ставит запуск модуля в очередь. Возвращает описание запуска (словарь, обновляется по ходу)."""
+        if module not in MODULES + INTERACTIVE_MODULES:
+            raise ValueError(f"Неизвестный модуль: {module}")
+        job = {"id": next(self._ids), "module": module, "resume": resume, "status": "queued",
+               "submitted": time.time(), "elapsed": None, "first_response": None, "error": None}
+        job["done"] = threading.Event()
+        with self._lock:
+            self.jobs[job["id"]] = job
+        self._queue.put(job)
+        return job
+
+    def run(self, module, resume=False):
+        """Запуск из меню: ставит в очередь и ждет завершения."""
+        job = self.submit(module, resume)
+        job["done"].wait()
+        return job
+
+    def _on_response(self, response, proxies):
+        # Время до первого ответа биржи в запуске - сколько стоит старт модуля
+        job = self._current
+        if job is not None and job["first_response"] is None:
+            job["first_response"] = time.perf_counter() - job["_started"]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job["status"] = "running"
+            job["_started"] = time.perf_counter()
+            self._current = job
+            journal.set_resume(job["resume"])
+            try:
+                load_module(job["module"]).main()
+                job["status"] = "done"
+            except (Exception, SystemExit) as e:
+                job["status"] = "failed"
+                job["error"] = str(e) or type(e).__name__
+                traceback.print_exc()
+            finally:
+                journal.set_resume(False)
+                # Процесс не завершается, поэтому отчет о прокси пишется после каждого запуска, а не при выходе
+                proxy_pool.write_report()
+                self._current = None
+                job["elapsed"] = time.perf_counter() - job["_started"]
+                job["done"].set()
+
+    def describe(self, job):
+        return {key: value for key, value in job.items() if not key.startswith("_") and key != "done"}
+
+    def list_jobs(self):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [self.describe(job) for job in jobs]
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    runner = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        """Проверка токена CONTROL_API_TOKEN. Ответ 401 и False, если токен задан и не совпал."""
+        if not CONTROL_API_TOKEN:
+            return True
+        token = self.headers.get("X-Control-Token") or ""
+        if hmac.compare_digest(token.encode("utf-8"), CONTROL_API_TOKEN.encode("utf-8")):
+            return True
+        self._reply(401, {"error": "неверный токен X-Control-Token"})
+        return False
+
+    def _same_origin(self):
+        # Браузер ставит Origin во все POST; свои клиенты (curl, скрипты) его не передают
+        origin = self.headers.get("Origin")
+        port = self.server.server_address[1]
+        return origin is None or origin in (f"http://127.0.0.1:{port}", f"http://localhost:{port}")
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/modules":
+            return self._reply(200, {"modules": MODULES})
+        if self.path == "/jobs":
+            return self._reply(200, {"jobs": self.runner.list_jobs()})
+        if self.path.startswith("/jobs/"):
+            job_id = self.path[len("/jobs/"):]
+            job = self.runner.jobs.get(int(job_id)) if job_id.isdigit() else None
+            if job is None:
+                return self._reply(404, {"error": "запуск не найден"})
+            return self._reply(200, self.runner.describe(job))
+        if self.path == "/stats":
+            return self._reply(200, transport.get_stats())
+        self._reply(404, {"error": "неизвестный адрес"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path != "/run":
+            return self._reply(404, {"error": "неизвестный адрес"})
+        if not self._same_origin():
+            return self._reply(403, {"error": "запрос с чужой страницы отклонен"})
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            return self._reply(415, {"error": "нужен Content-Type: application/json"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            module = body.get("module")
+            if module not in MODULES:
+                raise ValueError(f"Модуль {module} нельзя запустить через API")
+            job = self.runner.submit(module, bool(body.get("resume")))
+        except ValueError as e:
+            return self._reply(400, {"error": str(e)})
+        self._reply(202, self.runner.describe(job))
+
+
+def serve(runner, port):
+    """Запускает HTTP API в фоновом потоке. Возвращает сервер."""
+    handler = type("Handler", (ControlHandler,), {"runner": runner})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,122 @@
+import asyncio
+import inspect
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
+from config import ENGINE, ACCOUNT_DELAY_RANGE, SCHEDULER_WORKERS, ASYNC_CONCURRENCY
+from core.scheduler import Scheduler, drive
+
+
+def _account_delay(delay_range):
+    delay = random.randint(*delay_range)
+    if delay > 0:
+        print(f"Задержка перед следующим аккаунтом: {delay} секунд")
+    return delay
+
+
+def run_threaded(target, args_list, delay_range=ACCOUNT_DELAY_RANGE):
+    """Поток на каждый аккаунт, как раньше в модулях. Возвращает результаты target в порядке args_list."""
+    results = []
+    threads = []
+
+    def call(index, args):
+        results[index] = drive(target(*args))
+
+    for index, args in enumerate(args_list):
+        results.append(None)
+        thread = Thread(target=call, args=(index, args))
+        threads.append(thread)
+        thread.start()
+        time.sleep(_account_delay(delay_range))
+
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _next_step(generator):
+    # StopIteration нельзя передать через Future, поэтому конец генератора возвращается значением
+    try:
+        return False, next(generator)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+async def _drive_async(loop, executor, target, args):
+    """Шаги аккаунта между yield идут в пуле потоков, паузы yield delay - таймеры event loop."""
+    result = await loop.run_in_executor(executor, lambda: target(*args))
+    if not inspect.isgenerator(result):
+        return result
+    while True:
+        finished, value = await loop.run_in_executor(executor, _next_step, result)
+        if finished:
+            return value
+        await asyncio.sleep(max(value or 0, 0))
+
+
+async def _run_async(target, args_list, concurrency, workers, delay_range):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    tasks = set()
+
+    async def call(index, args):
+        try:
+            results[index] = await _drive_async(loop, executor, target, args)
+        except Exception as e:
+            print(f"Ошибка при обработке аккаунта: {e}")
+        finally:
+            semaphore.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Аккаунты берутся из args_list лениво: в работе не больше concurrency аккаунтов
+        for index, args in enumerate(args_list):
+            await semaphore.acquire()
+            results.append(None)
+            task = asyncio.create_task(call(index, args))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            delay = _account_delay(delay_range)
+            if delay:
+                await asyncio.sleep(delay)
+        await asyncio.gather(*list(tasks))
+    return results
+
+
+def run_async(target, args_list, concurrency=ASYNC_CONCURRENCY, workers=SCHEDULER_WORKERS, delay_range=ACCOUNT_DELAY_RANGE):
+    """
+    Аккаунты как корутины одного event loop: одновременно в работе не больше concurrency аккаунтов,
+    включая стоящие на паузе, а запросы между паузами выполняют workers потоков. Аккаунт на паузе
+    не занимает ни потока, ни места в пуле, поэтому concurrency может быть в десятки раз больше workers.
+    """
+    return asyncio.run(_run_async(target, args_list, concurrency, workers, delay_range))
+
+
+def run_scheduled(target, args_list, workers=SCHEDULER_WORKERS, delay_range=ACCOUNT_DELAY_RANGE):
+    """
+    Аккаунты как задачи планировщика на workers потоках. Старт каждого аккаунта сдвинут на
+    случайную задержку от предыдущего, но запускающий цикл не спит, а паузы внутри аккаунтов
+    (yield delay в target) не держат потоки.
+    """
+    scheduler = Scheduler(workers)
+    jobs = []
+    start_at = time.monotonic()
+    for args in args_list:
+        jobs.append(scheduler.call_at(start_at, target, *args))
+        start_at += random.randint(*delay_range)
+    scheduler.run()
+    return [job.result for job in jobs]
+
+
+def run_accounts(target, args_list, delay_range=ACCOUNT_DELAY_RANGE):
+    """
+    Запускает target(*args) для каждого аккаунта движком из настройки ENGINE ("threads", "async"
+    или планировщик). target может быть генератором: yield delay - пауза аккаунта на delay секунд.
+    """
+    if ENGINE == "async":
+        return run_async(target, args_list, delay_range=delay_range)
+    if ENGINE == "threads":
+        return run_threaded(target, args_list, delay_range=delay_range)
+    return run_scheduled(target, args_list, delay_range=delay_range)
@@ -0,0 +1,142 @@
+"""
+Параметры спотовых пар из /v5/market/instruments-info: шаг количества и минимумы ордера.
+
+Рыночный ордер на споте: покупка (BUY) указывается в монете котировки и округляется до
+quotePrecision, продажа (SELL) - в базовой монете и округляется до basePrecision. Минимум
+продажи - minOrderQty, минимум покупки - minOrderAmt. Количество обрезается вниз до шага
+через Decimal, поэтому ордер не отклоняется за лишние знаки и не превышает баланс.
+
+Параметры хранятся в памяти и в .cache/instruments.json не дольше INSTRUMENT_CACHE_TTL секунд,
+так что повторный запуск не делает запросов. Модули с ордерами вызывают get_instrument один раз
+до запуска аккаунтов, а не в первом ордере каждого аккаунта.
+"""
+import json
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+from config import INSTRUMENT_CACHE_TTL, DECIMAL_PLACES
+from core import api
+
+CACHE_FILE = os.path.join(".cache", "instruments.json")
+
+_instruments = {}
+_lock = threading.Lock()
+_disk = None
+
+
+class Instrument:
+    """Параметры одной пары и квантизация количества под них."""
+
+    __slots__ = ("symbol", "base_coin", "quote_coin", "base_precision", "quote_precision", "min_order_qty", "min_order_amt")
+
+    def __init__(self, symbol, base_coin, quote_coin, base_precision, quote_precision, min_order_qty, min_order_amt):
+        self.symbol = symbol
+        self.base_coin = base_coin
+        self.quote_coin = quote_coin
+        self.base_precision = Decimal(base_precision)
+        self.quote_precision = Decimal(quote_precision)
+        self.min_order_qty = Decimal(min_order_qty)
+        self.min_order_amt = Decimal(min_order_amt)
+
+    @classmethod
+    def from_api(cls, row):
+        lot = row["lotSizeFilter"]
+        return cls(row["symbol"], row.get("baseCoin", ""), row.get("quoteCoin", ""), lot["basePrecision"],
+                   lot["quotePrecision"], lot["minOrderQty"], lot["minOrderAmt"])
+
+    @classmethod
+    def fallback(cls, symbol):
+        """Без данных биржи: шаг 10^-DECIMAL_PLACES и без минимумов."""
+        step = str(Decimal(1).scaleb(-DECIMAL_PLACES))
+        return cls(symbol, "", "", step, step, "0", "0")
+
+    def step(self, side):
+        return self.quote_precision if side.upper() == "BUY" else self.base_precision
+
+    def minimum(self, side):
+        return self.min_order_amt if side.upper() == "BUY" else self.min_order_qty
+
+    def quantize(self, side, quantity):
+        """Количество для рыночного ордера side, обрезанное вниз до шага пары (Decimal)."""
+        step = self.step(side)
+        # str(): Decimal от float тянет двоичный хвост, а str дает то же число, что видит человек
+        value = Decimal(str(quantity))
+        return (value / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+    def format(self, side, quantity):
+        """Строка количества для параметра qty: без экспоненты и лишних нулей."""
+        value = self.quantize(side, quantity)
+        text = format(value, "f")
+        return text.rstrip("0").rstrip(".") if "." in text else text
+
+    def is_tradable(self, side, quantity):
+        """Пройдет ли количество минимум пары после обрезки до шага."""
+        value = self.quantize(side, quantity)
+        return value > 0 and value >= self.minimum(side)
+
+
+def _load_disk():
+    global _disk
+    if _disk is None:
+        try:
+            with open(CACHE_FILE, "r") as file:
+                _disk = json.load(file)
+        except (OSError, ValueError):
+            _disk = {}
+    return _disk
+
+
+def _save_disk():
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        temp_path = CACHE_FILE + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(_disk, file)
+        os.replace(temp_path, CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _fetch(symbol, proxy):
+    data = api.public_get("/v5/market/instruments-info", {"category": "spot", "symbol": symbol}, proxy)
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить параметры пары {symbol}: {data.get('retMsg')}")
+    rows = data["result"]["list"]
+    if not rows:
+        raise Exception(f"Пара {symbol} не найдена на бирже")
+    return rows[0]
+
+
+def get_instrument(symbol, proxy=None):
+    """Параметры пары: из памяти, из .cache/instruments.json или одним запросом к бирже."""
+    cached = _instruments.get(symbol)
+    if cached is not None and time.time() - cached[0] < INSTRUMENT_CACHE_TTL:
+        return cached[1]
+
+    # Один запрос на пару, сколько бы аккаунтов ни ждали ее одновременно
+    with _lock:
+        cached = _instruments.get(symbol)
+        if cached is not None and time.time() - cached[0] < INSTRUMENT_CACHE_TTL:
+            return cached[1]
+
+        entry = _load_disk().get(symbol)
+        if entry is None or time.time() - entry["fetched"] >= INSTRUMENT_CACHE_TTL:
+            try:
+                entry = {"fetched": time.time(), "row": _fetch(symbol, proxy)}
+            except Exception as e:
+                if entry is None:
+                    print(f"{e}. Количество будет округляться до {DECIMAL_PLACES} знаков")
+                    instrument = Instrument.fallback(symbol)
+                    # Без данных биржи - не дольше минуты, потом новая попытка
+                    _instruments[symbol] = (time.time() - INSTRUMENT_CACHE_TTL + 60, instrument)
+                    return instrument
+                print(f"{e}. Используются сохраненные параметры пары")
+            else:
+                _disk[symbol] = entry
+                _save_disk()
+
+        instrument = Instrument.from_api(entry["row"])
+        _instruments[symbol] = (entry["fetched"], instrument)
+        return instrument
@@ -0,0 +1,196 @@
+"""
+Очередь задач по аккаунтам для работы на нескольких машинах (cluster.py).
+
+Координатор публикует задачи "модуль + номер аккаунта", воркеры берут их в аренду пачками,
+выполняют и подтверждают результатом. Пока задача выполняется, воркер продлевает аренду; если
+воркер пропал, аренда истекает и задачу получает другой воркер. После JOB_MAX_ATTEMPTS выдач
+задача считается неудачной. Ключи и прокси в очередь не попадают: воркер берет их из своего
+accounts.txt и получает только задачи по аккаунтам из этого файла.
+
+Шаги задачи с денежными операциями (запись "started" со ссылкой transferId или requestId перед
+запросом, итог после ответа) хранятся в строке задачи (steps), а не в журнале воркера. Задача,
+выданная повторно после истечения аренды или падения воркера, приходит с этими шагами, и новый
+воркер сверяет начатую операцию с биржей по той же ссылке, а не отправляет новую.
+
+Хранилище по умолчанию - SQLite-файл JOB_QUEUE_FILE (одна машина или общий диск). Файл работает
+в обычном режиме журнала SQLite (rollback journal), а не WAL: WAL требует общей памяти процессов
+одной машины и не работает на сетевых дисках, а обычному режиму нужны только блокировки файлов
+(сетевой диск должен их поддерживать, как NFS с lockd или SMB). Другое хранилище подключается
+классом с теми же методами: publish, lease, renew, save_steps, ack, fail, stats.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from config import JOB_QUEUE_FILE, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    module TEXT NOT NULL,
+    -- Без типа: номер хранится как есть, числом или строкой (core.accounts.parse_id)
+    account NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT,
+    steps TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, lease_until, id);
+CREATE INDEX IF NOT EXISTS jobs_worker ON jobs (worker, status);
+"""
+
+
+class Job:
+    __slots__ = ("id", "module", "account", "attempts", "steps")
+
+    def __init__(self, id, module, account, attempts, steps=None):
+        self.id = id
+        self.module = module
+        self.account = account
+        self.attempts = attempts
+        # Шаги прошлых выдач задачи: {шаг: {"status", "ref", "data"}}
+        self.steps = steps or {}
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.module}, {self.account})"
+
+
+class SqliteJobQueue:
+    def __init__(self, path=JOB_QUEUE_FILE):
+        self._lock = threading.Lock()
+        # timeout - ожидание блокировки файла другими воркерами (busy timeout), до 30 секунд
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=DELETE")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "steps" not in columns:
+            # Очередь, созданная до хранения шагов в задаче
+            self._db.execute("ALTER TABLE jobs ADD COLUMN steps TEXT")
+        self._local_ids = False
+
+    def publish(self, module, account_ids, max_attempts=JOB_MAX_ATTEMPTS):
+        """Добавляет по задаче на каждый аккаунт. Возвращает число добавленных задач."""
+        now = time.time()
+        rows = [(module, account_id, max_attempts, now) for account_id in account_ids]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("INSERT INTO jobs (module, account, max_attempts, created) VALUES (?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def restrict_accounts(self, account_ids):
+        """Дальше lease отдает этому воркеру только задачи по account_ids (аккаунты его accounts.txt)."""
+        with self._lock:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS local_accounts (id PRIMARY KEY)")
+            self._db.execute("DELETE FROM local_accounts")
+            self._db.executemany("INSERT OR IGNORE INTO local_accounts (id) VALUES (?)", ((i,) for i in account_ids))
+            self._local_ids = True
+
+    def lease(self, worker, limit, modules=None, lease_seconds=JOB_LEASE_SECONDS):
+        """Берет в аренду до limit задач: новые и те, чья аренда истекла. Возвращает [Job, ...]."""
+        now = time.time()
+        conditions = ["(status = 'queued' OR (status = 'leased' AND lease_until < ?))", "attempts < max_attempts"]
+        params = [now]
+        if modules:
+            conditions.append(f"module IN ({', '.join('?' for _ in modules)})")
+            params.extend(modules)
+        if self._local_ids:
+            conditions.append("account IN (SELECT id FROM local_accounts)")
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Истекшие аренды без оставшихся попыток больше никому не выдаются
+                self._db.execute("UPDATE jobs SET status = 'failed', error = 'аренда истекла', finished = ? "
+                                 "WHERE status = 'leased' AND lease_until < ? AND attempts >= max_attempts", (now, now))
+                rows = self._db.execute(
+                    f"SELECT id, module, account, attempts, steps FROM jobs WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+                    params + [limit],
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, started = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(worker, now + lease_seconds, now, row[0]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [Job(row[0], row[1], row[2], row[3] + 1, json.loads(row[4]) if row[4] else None) for row in rows]
+
+    def renew(self, worker, job_ids, lease_seconds=JOB_LEASE_SECONDS):
+        """Продлевает аренду задач, которые воркер еще выполняет."""
+        if not job_ids:
+            return
+        until = time.time() + lease_seconds
+        with self._lock:
+            self._db.executemany("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                 [(until, job_id, worker) for job_id in job_ids])
+
+    def save_steps(self, worker, job_id, steps):
+        """
+        Записывает шаги задачи ({шаг: запись}) в ее строку. False, если аренда уже у другого
+        воркера: тогда шаг не записан, и операцию отправлять нельзя.
+        """
+        with self._lock:
+            cursor = self._db.execute("UPDATE jobs SET steps = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                      (json.dumps(steps, ensure_ascii=False), job_id, worker))
+        return cursor.rowcount == 1
+
+    def ack(self, worker, job_id, result):
+        """Подтверждает задачу. False, если аренда уже передана другому воркеру и результат не принят."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, worker, job_id, error):
+        """Ошибка выполнения: задача вернется в очередь, пока не исчерпаны попытки."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = ?, finished = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (str(error), time.time(), job_id, worker),
+            )
+
+    def stats(self, module=None):
+        """
+        {"statuses": {статус: число задач}, "workers": [{"worker", "done", "failed", "elapsed", "rate"}, ...]}.
+        rate - подтвержденных задач в секунду за время работы воркера.
+        """
+        where, params = ("WHERE module = ?", [module]) if module else ("", [])
+        with self._lock:
+            statuses = dict(self._db.execute(f"SELECT status, COUNT(*) FROM jobs {where} GROUP BY status", params).fetchall())
+            rows = self._db.execute(
+                f"SELECT worker, SUM(status = 'done'), SUM(status = 'failed'), MIN(started), MAX(finished) FROM jobs "
+                f"{where} {'AND' if where else 'WHERE'} worker IS NOT NULL GROUP BY worker ORDER BY worker",
+                params,
+            ).fetchall()
+        workers = []
+        for worker, done, failed, started, finished in rows:
+            elapsed = (finished - started) if started and finished else 0.0
+            workers.append({"worker": worker, "done": done or 0, "failed": failed or 0, "elapsed": elapsed,
+                            "rate": (done or 0) / elapsed if elapsed > 0 else 0.0})
+        return {"statuses": statuses, "workers": workers}
+
+    def results(self, module):
+        """Подтвержденные результаты модуля по возрастанию номера аккаунта: (аккаунт, результат)."""
+        with self._lock:
+            rows = self._db.execute("SELECT account, result FROM jobs WHERE module = ? AND status = 'done' ORDER BY account, id",
+                                    (module,)).fetchall()
+        for account, result in rows:
+            yield account, json.loads(result) if result else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
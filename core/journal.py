@@ -0,0 +1,145 @@
+"""
+Журнал запусков: что уже сделано по каждому аккаунту, чтобы прерванный запуск можно было продолжить.
+
+Записи только добавляются в SQLite-файл JOURNAL_FILE: (запуск, аккаунт, шаг, статус, ссылка, данные).
+Ссылка - идентификатор операции на бирже (transferId, id вывода, orderLinkId). Перед отправкой
+денежной операции пишется статус "started", после ответа - "done" или "failed", так что после
+падения видно, какие операции могли уйти на биржу без подтверждения.
+
+Запуск модуля с --resume продолжает его последний запуск, если тот не завершен (как в
+has_unfinished): модуль спрашивает у журнала последний статус шага аккаунта и пропускает
+сделанное. Поиск идет по индексу, поэтому продолжение запуска со 100 тысячами записей не
+требует чтения журнала целиком.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from config import JOURNAL_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    module TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run INTEGER NOT NULL,
+    -- Без типа: номер хранится как есть, числом или строкой (core.accounts.parse_id)
+    account NOT NULL,
+    step TEXT NOT NULL,
+    status TEXT NOT NULL,
+    ref TEXT,
+    data TEXT,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS steps_lookup ON steps (run, account, step, id);
+CREATE INDEX IF NOT EXISTS runs_module ON runs (module, id);
+"""
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class Journal:
+    def __init__(self, module, resume=False, path=JOURNAL_FILE):
+        self.module = module
+        self._lock = threading.Lock()
+        self._db = _connect(path)
+        self.run_id = None
+        if resume:
+            # Завершенный запуск не продолжается: --resume после полного запуска начинает новый
+            row = self._db.execute("SELECT id, finished FROM runs WHERE module = ? ORDER BY id DESC LIMIT 1",
+                                   (module,)).fetchone()
+            if row is not None and row[1] is None:
+                self.run_id = row[0]
+        self.resumed = self.run_id is not None
+        if self.run_id is None:
+            cursor = self._db.execute("INSERT INTO runs (module, started) VALUES (?, ?)", (module, time.time()))
+            self.run_id = cursor.lastrowid
+
+    def record(self, account, step, status, ref=None, **data):
+        """Добавляет запись о шаге аккаунта. Запись на диске до возврата из функции."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO steps (run, account, step, status, ref, data, time) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, account, step, status, ref, json.dumps(data, ensure_ascii=False) if data else None, time.time()),
+            )
+
+    def last(self, account, step):
+        """Последняя запись о шаге аккаунта в этом запуске: {"status", "ref", "data"} или None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, ref, data FROM steps WHERE run = ? AND account = ? AND step = ? ORDER BY id DESC LIMIT 1",
+                (self.run_id, account, step),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "ref": row[1], "data": json.loads(row[2]) if row[2] else {}}
+
+    def entries(self, account, prefix=""):
+        """Последние записи шагов аккаунта в этом запуске, чьи имена начинаются с prefix: {шаг: запись}."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT step, status, ref, data FROM steps WHERE run = ? AND account = ? AND step >= ? ORDER BY id",
+                (self.run_id, account, prefix),
+            ).fetchall()
+        return {step: {"status": status, "ref": ref, "data": json.loads(data) if data else {}}
+                for step, status, ref, data in rows if step.startswith(prefix)}
+
+    def is_done(self, account, step):
+        entry = self.last(account, step)
+        return entry is not None and entry["status"] == "done"
+
+    def close(self):
+        """Отмечает запуск завершенным."""
+        with self._lock:
+            self._db.execute("UPDATE runs SET finished = ? WHERE id = ?", (time.time(), self.run_id))
+            self._db.close()
+
+
+_resume = False
+
+
+def set_resume(value):
+    """Продолжать последний запуск без флага --resume (запуск модулей внутри main.py)."""
+    global _resume
+    _resume = value
+
+
+def resume_requested():
+    return _resume or "--resume" in sys.argv[1:]
+
+
+def open_journal(module):
+    """Журнал модуля: продолжение последнего запуска при --resume, иначе новый запуск."""
+    journal = Journal(module, resume=resume_requested())
+    if journal.resumed:
+        print(f"Продолжение запуска {journal.run_id}: сделанные шаги будут пропущены")
+    elif resume_requested():
+        print("Прерванных запусков нет, начинается новый")
+    return journal
+
+
+def has_unfinished(module, path=JOURNAL_FILE):
+    """Был ли последний запуск модуля прерван до конца."""
+    if not os.path.exists(path):
+        return False
+    try:
+        db = sqlite3.connect(path)
+        try:
+            row = db.execute("SELECT finished FROM runs WHERE module = ? ORDER BY id DESC LIMIT 1", (module,)).fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return False
+    return row is not None and row[0] is None
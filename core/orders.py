@@ -0,0 +1,162 @@
+"""
+Отправка ордеров через REST (/v5/order/create) или через торговый WebSocket (/v5/trade).
+
+Способ выбирается настройкой ORDER_TRANSPORT. Через WebSocket у аккаунта одно постоянное
+авторизованное соединение: на каждый ордер не нужно ни нового соединения, ни подписи
+заголовков, ответ сопоставляется с запросом по reqId. Оба способа возвращают ответ в
+одном виде: {"retCode", "retMsg", "result": {"orderId", "orderLinkId"}}.
+"""
+import threading
+import time
+import uuid
+
+from config import ORDER_TRANSPORT, WS_ORDER_TIMEOUT
+from core import api, clock, ratelimit
+from core.stream import Connection
+
+TRADE_PATH = "/v5/trade"
+
+# Время от отправки ордера до ответа биржи, отдельно по способу отправки: {"rest": [сек, ...], "ws": [...]}
+_latencies = {}
+_latencies_lock = threading.Lock()
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+class TradeConnection(Connection):
+    """Торговый WebSocket одного аккаунта. Запросы и ответы сопоставляются по reqId."""
+
+    path = TRADE_PATH
+
+    def __init__(self, api_key, api_secret, proxies=None):
+        super().__init__(api_key, api_secret, proxies)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    def call(self, op, args, timeout=WS_ORDER_TIMEOUT):
+        """Отправляет op (order.create, order.cancel) и возвращает ответ биржи."""
+        req_id = uuid.uuid4().hex
+        waiter = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[req_id] = waiter
+        try:
+            self.send({
+                "reqId": req_id,
+                "header": {"X-BAPI-TIMESTAMP": str(clock.timestamp(self.proxies)), "X-BAPI-RECV-WINDOW": api.RECV_WINDOW},
+                "op": op,
+                "args": [args],
+            })
+            if not waiter[0].wait(timeout):
+                raise TimeoutError(f"Нет ответа на {op} за {timeout} секунд")
+            if waiter[1] is None:
+                raise ConnectionError(f"Соединение разорвано до ответа на {op}")
+            return waiter[1]
+        finally:
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+
+    def on_message(self, message):
+        with self._pending_lock:
+            waiter = self._pending.get(message.get("reqId"))
+        if waiter is not None:
+            waiter[1] = message
+            waiter[0].set()
+
+    def on_disconnected(self):
+        # Ответы на отправленные запросы по новому соединению уже не придут
+        with self._pending_lock:
+            waiters = list(self._pending.values())
+        for waiter in waiters:
+            waiter[0].set()
+
+
+def get_connection(api_key, api_secret, proxies=None):
+    """Общее торговое соединение аккаунта, подключается при первом ордере."""
+    with _connections_lock:
+        connection = _connections.get(api_key)
+        if connection is None:
+            connection = _connections[api_key] = TradeConnection(api_key, api_secret, proxies)
+            connection.start(0)
+    if not connection.ready.wait(WS_ORDER_TIMEOUT):
+        raise ConnectionError("Торговый WebSocket не подключен")
+    return connection
+
+
+def _record(transport_name, elapsed):
+    with _latencies_lock:
+        _latencies.setdefault(transport_name, []).append(elapsed)
+
+
+def _ws_call(api_key, api_secret, proxy, op, params):
+    connection = get_connection(api_key, api_secret, proxy)
+    reply = connection.call(op, params)
+    return {"retCode": reply.get("retCode"), "retMsg": reply.get("retMsg"), "result": reply.get("data") or {}}
+
+
+def create_order(api_key, api_secret, proxy, params, transport_name=None):
+    """Размещает ордер выбранным способом ("rest" или "ws", по умолчанию ORDER_TRANSPORT)."""
+    transport_name = transport_name or ORDER_TRANSPORT
+    started = time.perf_counter()
+    if transport_name == "ws":
+        ratelimit.acquire_key(api_key, "order")
+        response = _ws_call(api_key, api_secret, proxy, "order.create", params)
+    else:
+        response = api.signed_post("/v5/order/create", api_key, api_secret, proxy, params)
+    _record(transport_name, time.perf_counter() - started)
+    return response
+
+
+def outcome(response):
+    """Итог ордера для результата задачи очереди: {"status": "done", "orderId", "orderLinkId"} или {"status": "failed", "error"}."""
+    if response is None or response.get("retCode") != 0:
+        return {"status": "failed", "error": (response or {}).get("retMsg") or "все попытки неудачны"}
+    result = response.get("result") or {}
+    return {"status": "done", "orderId": result.get("orderId"), "orderLinkId": result.get("orderLinkId")}
+
+
+def cancel_order(api_key, api_secret, proxy, params, transport_name=None):
+    """Отменяет ордер по orderId или orderLinkId."""
+    transport_name = transport_name or ORDER_TRANSPORT
+    if transport_name == "ws":
+        ratelimit.acquire_key(api_key, "order")
+        return _ws_call(api_key, api_secret, proxy, "order.cancel", params)
+    return api.signed_post("/v5/order/cancel", api_key, api_secret, proxy, params)
+
+
+def get_order(api_key, api_secret, proxy, order_link_id):
+    """Состояние ордера по orderLinkId через REST (/v5/order/realtime). None, если ордер не найден."""
+    data = api.signed_get("/v5/order/realtime", api_key, api_secret, proxy,
+                          {"category": "spot", "orderLinkId": order_link_id})
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить ордер {order_link_id}: {data.get('retMsg')}")
+    rows = data["result"]["list"]
+    return rows[0] if rows else None
+
+
+def get_stats():
+    """{"rest": {"orders", "p50", "p99"}, "ws": {...}}, задержки в секундах."""
+    stats = {}
+    with _latencies_lock:
+        for name, values in _latencies.items():
+            ordered = sorted(values)
+            stats[name] = {
+                "orders": len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p99": ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)],
+            }
+    return stats
+
+
+def print_stats():
+    for name, stats in get_stats().items():
+        print(f"Ордера через {name}: {stats['orders']}, задержка p50 {stats['p50'] * 1000:.1f} мс, "
+              f"p99 {stats['p99'] * 1000:.1f} мс")
+
+
+def close_all():
+    with _connections_lock:
+        connections = list(_connections.values())
+        _connections.clear()
+    for connection in connections:
+        connection.close()
@@ -0,0 +1,245 @@
+"""
+Состояние прокси: проверка перед запуском, скользящие оценки задержки и ошибок,
+переключение на резервный прокси аккаунта и отчет о здоровье прокси в конце запуска.
+
+Прокси, помеченный нерабочим, не списывается навсегда: успешный запрос через него снимает
+отметку, а prepare() перед каждым запуском заново проверяет нерабочие прокси, даже без PROXY_CHECK.
+
+Резервные прокси задаются в файле PROXY_BACKUP_FILE строками id:ip:port:login:pass,
+где id - номер аккаунта из accounts.txt. Без файла переключения нет, только отчет.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from config import PROXY_CHECK, PROXY_MAX_FAILURES, PROXY_BACKUP_FILE, PROXY_REPORT_FILE
+from core.accounts import parse_id
+
+# Вес нового замера в скользящей средней задержки
+LATENCY_ALPHA = 0.2
+
+_health = {}
+_backups = {}
+_lock = threading.Lock()
+_report_registered = False
+
+
+class ProxyHealth:
+    __slots__ = ("proxy", "requests", "errors", "consecutive_errors", "latency", "last_error", "dead")
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.latency = None
+        self.last_error = ""
+        self.dead = False
+
+    @property
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def score(self):
+        """Чем меньше, тем лучше: задержка, утяжеленная долей ошибок."""
+        if self.dead:
+            return float("inf")
+        return (self.latency or 0.0) * (1 + 10 * self.error_rate)
+
+
+def _get(proxy):
+    health = _health.get(proxy)
+    if health is None:
+        with _lock:
+            health = _health.get(proxy)
+            if health is None:
+                health = _health[proxy] = ProxyHealth(proxy)
+    return health
+
+
+def mask(proxy):
+    """Адрес прокси для вывода, без пароля."""
+    parts = urlsplit(proxy)
+    return f"{parts.username}@{parts.hostname}:{parts.port}" if parts.username else f"{parts.hostname}:{parts.port}"
+
+
+def record_success(proxy, elapsed):
+    if not proxy:
+        return
+    health = _get(proxy)
+    with _lock:
+        health.requests += 1
+        health.consecutive_errors = 0
+        if health.dead:
+            health.dead = False
+            print(f"Прокси {mask(proxy)} снова отвечает")
+        health.latency = elapsed if health.latency is None else health.latency + LATENCY_ALPHA * (elapsed - health.latency)
+
+
+def record_error(proxy, error):
+    """Учитывает ошибку соединения; после PROXY_MAX_FAILURES подряд прокси считается мертвым."""
+    if not proxy:
+        return
+    health = _get(proxy)
+    with _lock:
+        health.requests += 1
+        health.errors += 1
+        health.consecutive_errors += 1
+        health.last_error = type(error).__name__
+        if health.consecutive_errors >= PROXY_MAX_FAILURES and not health.dead:
+            health.dead = True
+            print(f"Прокси {mask(proxy)} не отвечает ({health.last_error}), помечен как нерабочий")
+
+
+def is_dead(proxy):
+    health = _health.get(proxy)
+    return health is not None and health.dead
+
+
+def backup_for(proxies):
+    """Словарь резервного прокси для прокси аккаунта или None, если резерва нет."""
+    backup = _backups.get(_proxy_url(proxies))
+    if backup is None:
+        return None
+    return {"http": backup, "https": backup}
+
+
+def route(proxies):
+    """Прокси, через который реально идти: основной, а если он мертв и есть живой резерв - резервный."""
+    proxy = _proxy_url(proxies)
+    if proxy and is_dead(proxy):
+        backup = backup_for(proxies)
+        if backup is not None and not is_dead(backup["https"]):
+            return backup
+    return proxies
+
+
+def _proxy_url(proxies):
+    if not proxies:
+        return None
+    return proxies.get("https") or proxies.get("http")
+
+
+def load_backups(filename=PROXY_BACKUP_FILE):
+    """{номер аккаунта: url резервного прокси} из файла id:ip:port:login:pass."""
+    backups = {}
+    if not filename or not os.path.exists(filename):
+        return backups
+    with open(filename, "r") as file:
+        for index, line in enumerate(file):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = [part.strip() for part in line.split(":")]
+            if len(parts) != 5 or not parts[0]:
+                print(f"Ошибка в строке {index + 1} файла {filename}: нужен формат id:ip:port:login:pass")
+                continue
+            account_id, ip, port, login, password = parts
+            backups[parse_id(account_id)] = f"http://{login}:{password}@{ip}:{port}"
+    return backups
+
+
+def probe(proxy):
+    """
+    Проверка прокси одним запросом времени сервера через него: ответ заодно уточняет общее смещение
+    часов, и при подписи запросов модуля отдельная синхронизация не нужна. Возвращает True, если прокси ответил.
+    """
+    from core import clock
+    try:
+        clock.sync({"http": proxy, "https": proxy}, failover=False, samples=1)
+    except Exception:
+        return False
+    return True
+
+
+def probe_all(proxy_urls, workers=32):
+    """Проверяет все прокси параллельно. Возвращает {proxy: True/False}."""
+    proxy_urls = list(dict.fromkeys(proxy for proxy in proxy_urls if proxy))
+    if not proxy_urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(proxy_urls))) as executor:
+        results = dict(zip(proxy_urls, executor.map(probe, proxy_urls)))
+    for proxy, ok in results.items():
+        health = _get(proxy)
+        with _lock:
+            # Ответивший прокси снова рабочий, даже если раньше был помечен нерабочим
+            health.dead = not ok
+            if ok:
+                health.consecutive_errors = 0
+    return results
+
+
+def prepare(accounts):
+    """
+    Подготовка прокси перед запуском модуля: резервы из PROXY_BACKUP_FILE, параллельная
+    проверка всех прокси (если PROXY_CHECK, иначе только помеченных нерабочими в прошлых
+    запусках этого процесса) и отчет о здоровье прокси при выходе.
+    """
+    global _report_registered
+    backups = load_backups()
+    with _lock:
+        for account in accounts:
+            if account.id in backups:
+                _backups[account.proxy_url] = backups[account.id]
+
+    proxy_urls = [account.proxy_url for account in accounts] + list(backups.values())
+    if not PROXY_CHECK:
+        proxy_urls = [proxy for proxy in proxy_urls if is_dead(proxy)]
+    results = probe_all(proxy_urls)
+    dead = [proxy for proxy, ok in results.items() if not ok]
+    if results:
+        print(f"Проверено прокси: {len(results)}, не отвечают: {len(dead)}")
+    for proxy in dead:
+        note = " (будет использован резервный)" if proxy in _backups else ""
+        print(f"Прокси {mask(proxy)} не отвечает{note}")
+
+    if PROXY_REPORT_FILE and not _report_registered:
+        _report_registered = True
+        atexit.register(write_report)
+
+
+def export_health():
+    """Состояние прокси для передачи в другой процесс: [(proxy, поля ProxyHealth), ...]."""
+    with _lock:
+        return [(proxy, {name: getattr(health, name) for name in ProxyHealth.__slots__})
+                for proxy, health in _health.items()]
+
+
+def merge_health(rows):
+    """Добавляет состояние прокси из другого процесса (export_health), чтобы оно попало в отчет."""
+    global _report_registered
+    for proxy, fields in rows:
+        health = _get(proxy)
+        with _lock:
+            if fields["latency"] is not None:
+                health.latency = fields["latency"] if health.latency is None else (health.latency + fields["latency"]) / 2
+            health.requests += fields["requests"]
+            health.errors += fields["errors"]
+            health.last_error = fields["last_error"] or health.last_error
+            health.dead = health.dead or fields["dead"]
+    if PROXY_REPORT_FILE and rows and not _report_registered:
+        _report_registered = True
+        atexit.register(write_report)
+
+
+def write_report(filename=PROXY_REPORT_FILE):
+    """
+    Пишет отчет по всем прокси, через которые шли запросы с начала работы процесса, от худших
+    к лучшим. Вызывается при выходе, а в main.py - еще и после каждого запуска модуля.
+    """
+    with _lock:
+        rows = sorted(_health.values(), key=lambda health: health.score, reverse=True)
+    if not filename or not rows:
+        return
+    try:
+        with open(filename, "w") as file:
+            file.write("прокси | статус | запросов | ошибок | доля ошибок | задержка, мс | последняя ошибка\n")
+            for health in rows:
+                latency = f"{health.latency * 1000:.0f}" if health.latency is not None else "-"
+                file.write(f"{mask(health.proxy)} | {'не работает' if health.dead else 'работает'} | {health.requests} | "
+                           f"{health.errors} | {health.error_rate:.1%} | {latency} | {health.last_error or '-'}\n")
+    except OSError as e:
+        print(f"Не удалось записать отчет о прокси в {filename}: {e}")
@@ -0,0 +1,138 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from config import RATE_LIMITS, IP_RATE_LIMIT, RATE_LIMIT_BACKOFF
+
+# retCode 10006 - превышен лимит API-ключа, 10018 - превышен лимит IP
+_RATE_LIMIT_ERROR = re.compile(rb'"retCode"\s*:\s*(10006|10018)\b')
+
+
+class TokenBucket:
+    """Ведро токенов: rate запросов в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Забирает токен и возвращает, сколько секунд нужно подождать до запроса."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Токен резервируется сразу, даже в долг: потоки встают в очередь
+            # с равными интервалами, а не просыпаются все вместе
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def update(self, limit=None, remaining=None, reset_in=None):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.rate = self.capacity = float(limit)
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+            if reset_in is not None:
+                self.blocked_until = max(self.blocked_until, now + reset_in)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket(key, rate):
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = _buckets[key] = TokenBucket(rate)
+    return bucket
+
+
+def endpoint_class(url):
+    path = urlparse(url).path
+    if "/order/" in path:
+        return "order"
+    if "/asset/" in path or path.startswith("/asset"):
+        return "asset"
+    if "/market/" in path or "/public/" in path:
+        return "public"
+    return "account"
+
+
+def _buckets_for(url, proxy, api_key):
+    kind = endpoint_class(url)
+    buckets = [_bucket(("ip", proxy), IP_RATE_LIMIT)]
+    if api_key:
+        buckets.append(_bucket(("key", api_key, kind), RATE_LIMITS[kind]))
+    else:
+        buckets.append(_bucket(("public", proxy, kind), RATE_LIMITS[kind]))
+    return buckets
+
+
+def _api_key(headers):
+    if not headers:
+        return None
+    for name, value in headers.items():
+        if name.lower() == "x-bapi-api-key":
+            return value
+    return None
+
+
+def acquire(url, proxy, headers=None):
+    """Ждет свободного места во всех бюджетах запроса: IP прокси, API-ключ и класс эндпоинта."""
+    wait = max(bucket.reserve() for bucket in _buckets_for(url, proxy, _api_key(headers)))
+    if wait > 0:
+        time.sleep(wait)
+
+
+def acquire_key(api_key, kind):
+    """Ждет бюджета API-ключа без лимита IP - для заявок через торговый WebSocket."""
+    wait = _bucket(("key", api_key, kind), RATE_LIMITS[kind]).reserve()
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _reset_in(response):
+    reset = response.headers.get("X-Bapi-Limit-Reset-Timestamp")
+    if not reset:
+        return None
+    # Timenow - время сервера на момент ответа, так не зависим от локальных часов
+    now = response.headers.get("Timenow")
+    now_ms = int(now) if now else time.time() * 1000
+    return max(int(reset) - now_ms, 0) / 1000
+
+
+def update(url, proxy, headers, response):
+    """Подстраивает бюджеты по заголовкам X-Bapi-Limit* и ответам о превышении лимита."""
+    ip_bucket, key_bucket = _buckets_for(url, proxy, _api_key(headers))
+
+    limit = response.headers.get("X-Bapi-Limit")
+    remaining = response.headers.get("X-Bapi-Limit-Status")
+    if limit or remaining:
+        reset_in = _reset_in(response) if remaining == "0" else None
+        key_bucket.update(limit=int(limit) if limit else None,
+                          remaining=int(remaining) if remaining else None,
+                          reset_in=reset_in)
+
+    if response.status_code == 403:
+        # 403 от Bybit - превышен лимит на IP
+        ip_bucket.update(remaining=0, reset_in=RATE_LIMIT_BACKOFF)
+        return
+
+    match = _RATE_LIMIT_ERROR.search(response.content[:200])
+    if match:
+        bucket = ip_bucket if match.group(1) == b"10018" else key_bucket
+        bucket.update(remaining=0, reset_in=_reset_in(response) or RATE_LIMIT_BACKOFF)
@@ -0,0 +1,80 @@
+"""
+Потоковая запись результатов по аккаунтам.
+
+Результат аккаунта сразу дописывается строкой JSONL в файл <итоговый файл>.partial и
+сбрасывается на диск (fsync) пачками: раз в RESULT_FSYNC_EVERY записей или RESULT_FSYNC_INTERVAL
+секунд. В памяти остается только смещение строки каждого аккаунта, поэтому итоговый
+отсортированный отчет строится одним проходом по файлу в конце. Если запуск упал,
+все уже полученные результаты остаются в .partial.
+"""
+import json
+import os
+import threading
+import time
+
+from config import RESULT_FSYNC_EVERY, RESULT_FSYNC_INTERVAL
+from core.accounts import id_sort_key
+
+
+class ResultSink:
+    def __init__(self, path):
+        self.path = path
+        self.stream_path = path + ".partial"
+        self._file = open(self.stream_path, "wb")
+        self._offsets = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def add(self, key, record):
+        """
+        Дописывает результат аккаунта key (словарь) сразу в файл, а не копит его в памяти до конца
+        запуска. Можно вызывать из разных потоков.
+        """
+        line = (json.dumps({"key": key, **record}, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._offsets[key] = self._file.tell()
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= RESULT_FSYNC_EVERY or time.monotonic() - self._last_sync >= RESULT_FSYNC_INTERVAL:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, key):
+        return key in self._offsets
+
+    def records(self, keys=None):
+        """
+        Результаты в порядке keys (по умолчанию - по возрастанию ключа, числовые раньше строковых) одним проходом по файлу.
+        Для ключа без результата отдается None.
+        """
+        self.close()
+        if keys is None:
+            keys = sorted(self._offsets, key=id_sort_key)
+        with open(self.stream_path, "rb") as file:
+            for key in keys:
+                offset = self._offsets.get(key)
+                if offset is None:
+                    yield key, None
+                    continue
+                file.seek(offset)
+                yield key, json.loads(file.readline())
+
+    def finish(self):
+        """Удаляет поток после того, как итоговый отчет записан."""
+        self.close()
+        os.remove(self.stream_path)
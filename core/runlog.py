@@ -0,0 +1,169 @@
+"""
+Журнал запуска: цветной вывод в консоль и JSONL-файл в LOG_DIR.
+
+Поток аккаунта только кладет запись в очередь и пишет строку в консоль одним вызовом write,
+без блокировок. Файл пишет отдельный фоновый поток пачками: открывается один раз, сбрасывается
+на диск не чаще раза в LOG_FLUSH_INTERVAL секунд и переименовывается в .1, .2, ... при
+достижении LOG_MAX_BYTES.
+
+Запись в файле: {"time", "module", "level", "message", "account", "step", "latency", "retCode"}
+(пустые поля не пишутся).
+"""
+import atexit
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from config import LOG_DIR, LOG_MAX_BYTES, LOG_BACKUPS, LOG_FLUSH_INTERVAL
+
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+ENDC = "\033[0m"
+
+LEVEL_COLORS = {"ok": GREEN, "error": RED, "warn": YELLOW, "info": ""}
+
+# Имена полей в файле для аргументов log()
+FIELD_NAMES = {"ret_code": "retCode"}
+
+# Сколько записей writer забирает из очереди за один заход
+BATCH_SIZE = 500
+
+_STOP = object()
+
+
+class _Writer(threading.Thread):
+    """Фоновый поток, который пишет записи из очереди в файлы логов."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.queue = queue.SimpleQueue()
+        self.files = {}
+
+    def run(self):
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self.queue.get(timeout=LOG_FLUSH_INTERVAL)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = {}
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                    continue
+                path, record = item
+                lines.setdefault(path, []).append(json.dumps(record, ensure_ascii=False))
+            for path, path_lines in lines.items():
+                self._write(path, "\n".join(path_lines) + "\n")
+
+            now = time.monotonic()
+            if stopping or now - last_flush >= LOG_FLUSH_INTERVAL:
+                for file in self.files.values():
+                    file.flush()
+                last_flush = now
+
+        for file in self.files.values():
+            file.close()
+
+    def _write(self, path, text):
+        file = self.files.get(path)
+        if file is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file = self.files[path] = open(path, "a", encoding="utf-8")
+        file.write(text)
+        if LOG_MAX_BYTES and file.tell() >= LOG_MAX_BYTES:
+            file.close()
+            self._rotate(path)
+            self.files[path] = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _rotate(path):
+        for index in range(LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{path}.{index}"):
+                os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+        if LOG_BACKUPS:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _Writer()
+                _writer.start()
+                atexit.register(close)
+    return _writer
+
+
+def close():
+    """Дописывает очередь в файлы и останавливает фоновый поток."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.queue.put(_STOP)
+        writer.join()
+
+
+class RunLogger:
+    """Журнал одного модуля. Файл: LOG_DIR/<module>_<дата-время>.jsonl."""
+
+    def __init__(self, module, console=True, file=True):
+        self.module = module
+        self.console = console
+        self.path = None
+        if file and LOG_DIR:
+            stamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            self.path = os.path.join(LOG_DIR, f"{module}_{stamp}.jsonl")
+
+    def log(self, message, level="info", console=True, file=True, **fields):
+        if self.console and console:
+            color = LEVEL_COLORS.get(level, "")
+            # Одна запись в stdout: строки разных потоков не перемешиваются и без блокировки
+            sys.stdout.write(f"{color}{message}{ENDC}\n" if color else f"{message}\n")
+        if self.path is None or not file:
+            return
+
+        record = {"time": round(time.time(), 3), "module": self.module, "level": level, "message": message}
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if name == "latency":
+                value = round(value, 4)
+            record[FIELD_NAMES.get(name, name)] = value
+        _get_writer().queue.put((self.path, record))
+
+    def ok(self, message, **fields):
+        self.log(message, "ok", **fields)
+
+    def error(self, message, **fields):
+        self.log(message, "error", **fields)
+
+    def warn(self, message, **fields):
+        self.log(message, "warn", **fields)
+
+    def info(self, message, **fields):
+        self.log(message, "info", **fields)
+
+
+def get_logger(module, **options):
+    return RunLogger(module, **options)
@@ -0,0 +1,111 @@
+"""
+Планировщик шагов аккаунтов на очереди с приоритетом по времени запуска.
+
+Задача - "выполнить шаг аккаунта X в момент T". Шаги выполняются ограниченным набором
+потоков, а паузы между шагами никого не занимают: пока один аккаунт ждет, потоки работают
+с другими. Шаг может быть генератором: каждое yield delay означает "продолжить через delay
+секунд", и генератор возобновляется планировщиком, а не спит в потоке.
+"""
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """Запланированный шаг. result - значение, которое вернула функция или генератор."""
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.generator = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Scheduler:
+    def __init__(self, workers):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # Запланированные и выполняющиеся задачи: пока их больше нуля, run() не завершается
+        self._outstanding = 0
+        self._stopped = False
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def call_at(self, when, fn, *args):
+        """Выполнить fn(*args) в момент when (по time.monotonic)."""
+        job = Job(fn, args)
+        with self._condition:
+            self._outstanding += 1
+            self._push(when, job)
+        return job
+
+    def call_later(self, delay, fn, *args):
+        return self.call_at(time.monotonic() + max(delay, 0), fn, *args)
+
+    def _push(self, when, job):
+        heapq.heappush(self._heap, (when, next(self._sequence), job))
+        self._condition.notify_all()
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+            self._executor.submit(self._step, job)
+
+    def _step(self, job):
+        try:
+            if job.generator is None:
+                result = job.fn(*job.args)
+                if not inspect.isgenerator(result):
+                    return self._finish(job, result=result)
+                job.generator = result
+            delay = next(job.generator)
+        except StopIteration as stop:
+            return self._finish(job, result=stop.value)
+        except Exception as e:
+            print(f"Ошибка в задаче планировщика: {e}")
+            return self._finish(job, error=e)
+
+        # Генератор попросил паузу - продолжим его позже, поток свободен для других аккаунтов
+        with self._condition:
+            self._push(time.monotonic() + max(delay or 0, 0), job)
+
+    def _finish(self, job, result=None, error=None):
+        job.result = result
+        job.error = error
+        job.done.set()
+        with self._condition:
+            self._outstanding -= 1
+            self._condition.notify_all()
+
+    def run(self):
+        """Ждет, пока не останется ни запланированных, ни выполняющихся задач, и останавливает потоки."""
+        with self._condition:
+            while self._outstanding:
+                self._condition.wait()
+            self._stopped = True
+            self._condition.notify_all()
+        self._executor.shutdown(wait=True)
+
+
+def drive(result):
+    """Выполняет генератор шага в текущем потоке, засыпая на каждом yield. Для движков без планировщика."""
+    if not inspect.isgenerator(result):
+        return result
+    try:
+        while True:
+            time.sleep(max(next(result) or 0, 0))
+    except StopIteration as stop:
+        return stop.value
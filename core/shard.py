@@ -0,0 +1,134 @@
+"""
+Распределение аккаунтов по нескольким процессам.
+
+Подпись запросов, разбор JSON и вывод в одном процессе упираются в GIL, сколько бы потоков
+ни было. При PROCESSES > 1 список аккаунтов делится между процессами-воркерами, каждый
+обрабатывает свою часть обычным движком (core.engine), а результаты аккаунтов пачками
+возвращаются в родительский процесс и пишутся в его ResultSink (core.results). Поэтому
+итоговые файлы и суммы получаются такими же, как при одном процессе.
+
+Функция аккаунта вызывается как target(account, sink), где sink.add(key, record) - как у ResultSink.
+Прокси проверяются там, где обрабатываются аккаунты: каждый воркер проверяет прокси своей части
+(заодно синхронизируя часы, которые нужны ему же), а отчет о прокси собирает родитель.
+"""
+import importlib
+import multiprocessing
+import queue
+import threading
+
+import config
+from config import PROCESSES
+from core import engine, proxy_pool, transport
+
+# Сколько результатов воркер отправляет родителю за раз
+BATCH_SIZE = 100
+
+_stats = {}
+
+
+class QueueSink:
+    """Приемник результатов в воркере: копит их и отправляет родителю пачками."""
+
+    def __init__(self, results_queue):
+        self._queue = results_queue
+        self._batch = []
+        self._lock = threading.Lock()
+
+    def add(self, key, record):
+        with self._lock:
+            self._batch.append((key, record))
+            if len(self._batch) < BATCH_SIZE:
+                return
+            batch, self._batch = self._batch, []
+        self._queue.put(("results", batch))
+
+    def flush(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch:
+            self._queue.put(("results", batch))
+
+
+def _worker(index, settings, module_name, function_name, accounts, results_queue):
+    # Настройки родителя применяются до импорта модуля, чтобы его from config import ... их увидел
+    vars(config).update(settings)
+    target = getattr(importlib.import_module(module_name), function_name)
+
+    sink = QueueSink(results_queue)
+    proxy_pool.prepare(accounts)
+    try:
+        engine.run_accounts(target, [(account, sink) for account in accounts])
+    finally:
+        sink.flush()
+        results_queue.put(("done", (index, transport.get_stats(), proxy_pool.export_health())))
+
+
+def run_accounts(target, accounts, sink, processes=PROCESSES):
+    """
+    Обрабатывает accounts функцией target(account, sink) в processes процессах (или в текущем,
+    если processes <= 1). Аккаунты делятся между процессами, а результаты всех процессов собираются
+    в sink вызывающего процесса.
+    """
+    accounts = list(accounts)
+    processes = min(processes, len(accounts))
+    if processes <= 1:
+        proxy_pool.prepare(accounts)
+        return engine.run_accounts(target, [(account, sink) for account in accounts])
+
+    # Отчет о прокси пишет родитель по данным всех воркеров
+    settings = {name: value for name, value in vars(config).items() if name.isupper()}
+    settings.update(PROXY_REPORT_FILE=None)
+
+    # spawn, а не fork: в родителе уже работают потоки (пулы соединений, журнал), и форк их состояния небезопасен
+    context = multiprocessing.get_context("spawn")
+    results_queue = context.Queue()
+    workers = []
+    for index in range(processes):
+        # Через один, а не подряд: медленные аккаунты из одного участка файла не попадают в один процесс
+        shard = accounts[index::processes]
+        worker = context.Process(target=_worker, args=(index, settings, target.__module__, target.__name__,
+                                                       shard, results_queue), daemon=True)
+        worker.start()
+        workers.append(worker)
+    print(f"Аккаунты распределены по {processes} процессам")
+
+    finished = set()
+    worker_stats = []
+    while len(finished) < processes:
+        try:
+            kind, payload = results_queue.get(timeout=1)
+        except queue.Empty:
+            # Воркер, который упал, не пришлет "done": его аккаунты остаются без результата
+            for index, worker in enumerate(workers):
+                if index not in finished and worker.exitcode not in (None, 0):
+                    print(f"Процесс {index + 1} завершился с ошибкой (код {worker.exitcode})")
+                    finished.add(index)
+            continue
+        if kind == "results":
+            for key, record in payload:
+                sink.add(key, record)
+        else:
+            index, stats, health = payload
+            finished.add(index)
+            worker_stats.append(stats)
+            proxy_pool.merge_health(health)
+
+    for worker in workers:
+        worker.join()
+
+    _stats.clear()
+    _stats["processes"] = processes
+    for stats in worker_stats:
+        for name, value in stats.items():
+            _stats[name] = _stats.get(name, 0) + value
+
+
+def get_stats():
+    """Сумма transport.get_stats() по воркерам последнего запуска и число процессов."""
+    return dict(_stats)
+
+
+def print_stats():
+    if _stats:
+        print(f"Процессов: {_stats['processes']}, сессий: {_stats.get('sessions', 0)}, запросов: {_stats.get('requests', 0)}, "
+              f"новых соединений: {_stats.get('handshakes', 0)}, переиспользовано: {_stats.get('reused', 0)}")
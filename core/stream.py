@@ -0,0 +1,259 @@
+"""
+Приватный WebSocket Bybit: топики wallet, order и execution и книга балансов аккаунта.
+
+Соединение живет в отдельном потоке. После разрыва поток переподключается с нарастающей
+паузой, заново проходит авторизацию и подписку и перечитывает балансы одним REST-снимком:
+события, пропущенные за время разрыва, биржа повторно не присылает.
+"""
+import hashlib
+import hmac
+import json
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit, unquote
+
+import websocket
+
+from config import WS_URL, WS_PING_INTERVAL, WS_RECONNECT_MAX_DELAY
+from core import balances, clock, transport, proxy_pool
+
+PRIVATE_PATH = "/v5/private"
+TOPICS = ["wallet", "order", "execution"]
+
+# Статусы, после которых ордер больше не меняется
+FINAL_STATUSES = {"Filled", "Cancelled", "Rejected", "PartiallyFilledCanceled", "Deactivated"}
+
+# Один SSL-контекст на все WebSocket-соединения: корневые сертификаты загружаются один раз, а не при каждом подключении
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+
+def ssl_context():
+    global _ssl_context
+    with _ssl_context_lock:
+        if _ssl_context is None:
+            _ssl_context = ssl.create_default_context()
+        return _ssl_context
+
+
+def auth_args(api_key, api_secret, proxies):
+    expires = clock.timestamp(proxies) + 10000
+    signature = hmac.new(api_secret.encode('utf-8'), f"GET/realtime{expires}".encode('utf-8'), hashlib.sha256).hexdigest()
+    return [api_key, expires, signature]
+
+
+def proxy_options(proxies):
+    """Параметры прокси для websocket-client из словаря прокси аккаунта."""
+    proxy = transport.proxy_key(proxies)
+    if not proxy:
+        return {}
+    parts = urlsplit(proxy)
+    options = {"http_proxy_host": parts.hostname, "http_proxy_port": parts.port, "proxy_type": "http"}
+    if parts.username:
+        options["http_proxy_auth"] = (unquote(parts.username), unquote(parts.password or ""))
+    return options
+
+
+class BalanceBook:
+    """Балансы и ордера одного аккаунта, которые обновляются событиями из WebSocket."""
+
+    def __init__(self):
+        self.coins = {}
+        self.orders = {}
+        self.executions = {}
+        self.condition = threading.Condition()
+
+    def seed(self, snapshot):
+        """Заменяет балансы REST-снимком вида {coin: {"walletBalance", "transferBalance"}}."""
+        with self.condition:
+            self.coins = {coin: dict(row) for coin, row in snapshot.items()}
+            self.condition.notify_all()
+
+    def apply_wallet(self, wallets):
+        with self.condition:
+            self.coins.update(balances.parse_wallet(wallets))
+            self.condition.notify_all()
+
+    def apply_orders(self, rows):
+        with self.condition:
+            for row in rows:
+                self.orders[row.get("orderLinkId") or row.get("orderId")] = row
+            self.condition.notify_all()
+
+    def apply_executions(self, rows):
+        with self.condition:
+            for row in rows:
+                self.executions.setdefault(row.get("orderLinkId") or row.get("orderId"), []).append(row)
+            self.condition.notify_all()
+
+    def balance(self, coin):
+        with self.condition:
+            return self.coins.get(coin, {}).get("walletBalance", 0.0)
+
+    def wait_order(self, order_link_id, timeout):
+        """Ждет конечного статуса ордера. Возвращает последнее событие по ордеру или None по таймауту."""
+        def done():
+            return self.orders.get(order_link_id, {}).get("orderStatus") in FINAL_STATUSES
+
+        with self.condition:
+            if self.condition.wait_for(done, timeout):
+                return self.orders[order_link_id]
+            return None
+
+
+class Connection:
+    """Авторизованное WebSocket-соединение с переподключением. Подклассы задают путь и обработку сообщений."""
+
+    path = PRIVATE_PATH
+
+    def __init__(self, api_key, api_secret, proxies=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.proxies = proxies
+        self.ready = threading.Event()
+        self.reconnects = 0
+        self._closed = threading.Event()
+        self._send_lock = threading.Lock()
+        self._ws = None
+        self._thread = None
+
+    def start(self, timeout=10):
+        """Запускает поток соединения и ждет первого подключения. Возвращает True, если оно удалось."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self.ready.wait(timeout)
+
+    def close(self):
+        self._closed.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def send(self, message):
+        ws = self._ws
+        if ws is None:
+            raise ConnectionError("WebSocket не подключен")
+        with self._send_lock:
+            ws.send(json.dumps(message, separators=(',', ':')))
+
+    def _request(self, ws, message):
+        """Отправляет служебное сообщение (auth, subscribe) и ждет ответа на него."""
+        with self._send_lock:
+            ws.send(json.dumps(message, separators=(',', ':')))
+        while True:
+            reply = json.loads(ws.recv())
+            if reply.get("op") == message["op"]:
+                if not reply.get("success", reply.get("retCode") == 0):
+                    raise ConnectionError(f"{message['op']} отклонен: {reply.get('ret_msg') or reply.get('retMsg')}")
+                return reply
+            self.on_message(reply)
+
+    def _connect(self):
+        options = proxy_options(proxy_pool.route(self.proxies))
+        if WS_URL.startswith("wss://"):
+            options["sslopt"] = {"context": ssl_context()}
+        ws = websocket.create_connection(WS_URL + self.path, timeout=WS_PING_INTERVAL, **options)
+        try:
+            self._request(ws, {"op": "auth", "args": auth_args(self.api_key, self.api_secret, self.proxies)})
+            self.on_connected(ws)
+        except Exception:
+            ws.close()
+            raise
+        return ws
+
+    def _run(self):
+        delay = 1
+        while not self._closed.is_set():
+            try:
+                ws = self._connect()
+            except Exception as e:
+                if self._closed.is_set():
+                    break
+                print(f"Не удалось подключиться к WebSocket {self.path}: {e}, повтор через {delay} секунд")
+                self._closed.wait(delay)
+                delay = min(delay * 2, WS_RECONNECT_MAX_DELAY)
+                continue
+
+            if self._ws is not None:
+                self.reconnects += 1
+            self._ws = ws
+            delay = 1
+            self.ready.set()
+            try:
+                self._listen(ws)
+            except Exception as e:
+                if not self._closed.is_set():
+                    print(f"Соединение WebSocket {self.path} разорвано: {e}, переподключение")
+            finally:
+                self.ready.clear()
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+                self.on_disconnected()
+
+    def _listen(self, ws):
+        # Короткий таймаут чтения, чтобы ping уходил вовремя и при непрерывном потоке событий
+        ws.settimeout(max(WS_PING_INTERVAL / 4, 0.5))
+        last_ping = last_message = time.monotonic()
+        while not self._closed.is_set():
+            try:
+                message = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                message = None
+            now = time.monotonic()
+            if message:
+                last_message = now
+                self.on_message(json.loads(message))
+            elif message is not None:
+                raise ConnectionError("сервер закрыл соединение")
+            elif now - last_message > WS_PING_INTERVAL * 2:
+                # На ping нет даже pong - соединение мертвое, хотя сокет не закрыт
+                raise ConnectionError("нет ответа на ping")
+            if now - last_ping >= WS_PING_INTERVAL:
+                self.send({"op": "ping"})
+                last_ping = now
+
+    def on_connected(self, ws):
+        pass
+
+    def on_message(self, message):
+        pass
+
+    def on_disconnected(self):
+        pass
+
+
+class PrivateStream(Connection):
+    """Подписка на wallet, order и execution одного аккаунта с книгой балансов в self.book."""
+
+    def __init__(self, api_key, api_secret, proxies=None):
+        super().__init__(api_key, api_secret, proxies)
+        self.book = BalanceBook()
+
+    def on_connected(self, ws):
+        self._request(ws, {"op": "subscribe", "args": TOPICS})
+        # Снимок берется уже после подписки, чтобы между ним и первым событием не было дыры
+        self.book.seed(balances.get_balances(self.api_key, self.api_secret, self.proxies, max_age=0))
+
+    def on_message(self, message):
+        topic = message.get("topic")
+        if topic == "wallet":
+            self.book.apply_wallet(message.get("data", []))
+        elif topic == "order":
+            self.book.apply_orders(message.get("data", []))
+        elif topic == "execution":
+            self.book.apply_executions(message.get("data", []))
+
+
+def open_stream(api_key, api_secret, proxies=None, timeout=10):
+    """Подключает приватный поток аккаунта. Возвращает PrivateStream или None, если подключиться не удалось."""
+    stream = PrivateStream(api_key, api_secret, proxies)
+    if stream.start(timeout):
+        return stream
+    stream.close()
+    return None
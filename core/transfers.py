@@ -0,0 +1,69 @@
+"""
+Переводы с журналом, общие для модулей перевода между счетами и субаккаунтов.
+
+Перед запросом в журнал пишется "started" с transferId и данными перевода, после ответа -
+"done" или "failed". Начатый перевод при продолжении сначала проверяется на бирже по
+transferId и повторяется с тем же transferId, только если биржа его не знает, поэтому
+сбой между запросом и записью ответа не приводит к двойному переводу.
+
+Запрос перевода и проверку статуса передает модуль: send(transfer_data) -> ответ биржи,
+get_status(transferId) -> "SUCCESS", "PENDING", "FAILED" или None.
+"""
+import time
+import uuid
+from decimal import Decimal, ROUND_DOWN
+
+# Суммы переводов с точностью до 4 знаков
+AMOUNT_STEP = Decimal("0.0001")
+
+
+def quantize(amount):
+    """Сумма, обрезанная вниз до AMOUNT_STEP (Decimal)."""
+    return Decimal(str(amount)).quantize(AMOUNT_STEP, rounding=ROUND_DOWN)
+
+
+def start(journal, account, step, coin, amount, **route):
+    """Новый перевод: запись "started" с новым transferId до запроса. Возвращает данные перевода."""
+    transfer_data = {"transferId": str(uuid.uuid4()), "coin": coin, "amount": str(amount), **route}
+    journal.record(account, step, "started", ref=transfer_data["transferId"], **transfer_data)
+    return transfer_data
+
+
+def finish(journal, account, step, transfer_data, send, log, where):
+    """
+    Отправляет перевод и пишет итог в журнал. where - где перевод для сообщений ("аккаунте номер 5").
+    Ошибка запроса не пробрасывается: перевод мог дойти до биржи, запись остается "started".
+    """
+    started = time.perf_counter()
+    try:
+        data = send(transfer_data)
+    except Exception as e:
+        log.error(f"Ошибка перевода {transfer_data['coin']} на {where}: {e}", account=account, step=step,
+                  latency=time.perf_counter() - started)
+        return
+    fields = {"account": account, "step": step, "latency": time.perf_counter() - started, "ret_code": data.get("retCode")}
+    if data.get("retCode") == 0:
+        journal.record(account, step, "done", ref=transfer_data["transferId"], amount=transfer_data["amount"])
+        log.ok(f"Перевод на {where} успешно выполнен. Сумма: {transfer_data['amount']} {transfer_data['coin']}.", **fields)
+    else:
+        journal.record(account, step, "failed", ref=transfer_data["transferId"], retCode=data.get("retCode"),
+                       retMsg=data.get("retMsg"))
+        log.error(f"Ошибка перевода {transfer_data['coin']} на {where}. Сообщение: {data.get('retMsg')}", **fields)
+
+
+def resume(journal, account, step, entry, send, get_status, log, where):
+    """Перевод, записанный как начатый: сверка с биржей по transferId, повтор с ним же, если биржа его не знает."""
+    try:
+        status = get_status(entry["ref"])
+    except Exception as e:
+        # Запись остается "started" и будет проверена при следующем продолжении
+        log.error(f"Не удалось проверить перевод {entry['ref']} на {where}: {e}", account=account, step=step)
+        return
+    if status == "SUCCESS":
+        journal.record(account, step, "done", ref=entry["ref"], amount=entry["data"]["amount"])
+        log.ok(f"Перевод {entry['ref']} на {where} уже выполнен биржей", account=account, step="resume")
+    elif status == "PENDING":
+        log.warn(f"Перевод {entry['ref']} на {where} еще обрабатывается биржей", account=account, step="resume")
+    else:
+        log.warn(f"Повтор неподтвержденного перевода {entry['ref']} на {where}", account=account, step="resume")
+        finish(journal, account, step, entry["data"], send, log, where)
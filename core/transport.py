@@ -0,0 +1,146 @@
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_SIZE, HTTP_TIMEOUT
+from core import ratelimit, proxy_pool
+
+# Ошибки, при которых запрос точно не дошел до биржи: его можно повторить через резервный прокси
+_CONNECT_ERRORS = (requests.exceptions.ConnectTimeout, requests.exceptions.ProxyError)
+
+# Одна keep-alive сессия на пару (прокси, хост): TCP, CONNECT через прокси и TLS
+# выполняются один раз, дальше все запросы аккаунта идут по готовому соединению
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Функции, которые вызываются после каждого ответа: hook(response, proxies)
+_response_hooks = []
+
+# urllib3 отправляет заголовки и тело POST отдельными пакетами; без TCP_NODELAY тело ждет
+# подтверждения заголовков (Nagle + delayed ACK), и каждый ордер теряет ~40 мс
+SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+
+
+class _Adapter(HTTPAdapter):
+    """HTTPAdapter с TCP_NODELAY и для прямых соединений, и для соединений через прокси."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs.setdefault("socket_options", SOCKET_OPTIONS)
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def proxy_key(proxies):
+    if not proxies:
+        return None
+    return proxies.get("https") or proxies.get("http")
+
+
+def get_session(url, proxies=None):
+    """Возвращает общую сессию для прокси и хоста из url, создавая ее при первом обращении."""
+    key = (proxy_key(proxies), urlparse(url).netloc)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = _Adapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if proxies:
+                session.proxies.update(proxies)
+            _sessions[key] = session
+    return session
+
+
+def add_response_hook(hook):
+    if hook not in _response_hooks:
+        _response_hooks.append(hook)
+
+
+def request(method, url, proxies=None, failover=True, **kwargs):
+    """
+    Запрос через общую сессию прокси с таймаутами HTTP_TIMEOUT. Если прокси аккаунта мертв или
+    не дал соединиться, а у аккаунта есть резервный прокси, запрос идет через резерв.
+    """
+    if failover:
+        proxies = proxy_pool.route(proxies)
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    session = get_session(url, proxies)
+    proxy = proxy_key(proxies)
+    ratelimit.acquire(url, proxy, kwargs.get("headers"))
+    started = time.perf_counter()
+    try:
+        response = session.request(method, url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        proxy_pool.record_error(proxy, e)
+        # GET можно повторить при любой сетевой ошибке, POST - только если соединения не было
+        retryable = isinstance(e, _CONNECT_ERRORS) or (method == "GET" and isinstance(
+            e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)))
+        backup = proxy_pool.backup_for(proxies) if failover and retryable else None
+        if backup is None or proxy_pool.is_dead(proxy_key(backup)):
+            raise
+        print(f"Прокси {proxy_pool.mask(proxy)} не ответил ({type(e).__name__}), повтор через резервный")
+        return request(method, url, proxies=backup, failover=False, **kwargs)
+    proxy_pool.record_success(proxy, time.perf_counter() - started)
+    ratelimit.update(url, proxy, kwargs.get("headers"), response)
+    for hook in _response_hooks:
+        hook(response, proxies)
+    return response
+
+
+def get(url, proxies=None, **kwargs):
+    return request("GET", url, proxies=proxies, **kwargs)
+
+
+def post(url, proxies=None, **kwargs):
+    return request("POST", url, proxies=proxies, **kwargs)
+
+
+def _iter_pools(adapter):
+    managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+    for manager in managers:
+        for pool_key in list(manager.pools.keys()):
+            pool = manager.pools.get(pool_key)
+            if pool is not None:
+                yield pool
+
+
+def get_stats():
+    """Считает открытые соединения (рукопожатия) и повторно использованные по всем сессиям."""
+    stats = {"sessions": 0, "requests": 0, "handshakes": 0, "reused": 0}
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+
+    for session in sessions:
+        stats["sessions"] += 1
+        adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+        for adapter in adapters.values():
+            for pool in _iter_pools(adapter):
+                stats["requests"] += pool.num_requests
+                stats["handshakes"] += pool.num_connections
+    stats["reused"] = max(stats["requests"] - stats["handshakes"], 0)
+    return stats
+
+
+def print_stats():
+    stats = get_stats()
+    print(f"Сессий: {stats['sessions']}, запросов: {stats['requests']}, "
+          f"новых соединений: {stats['handshakes']}, переиспользовано: {stats['reused']}")
+
+
+def close_all():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,60 @@
+"""
+Прогрев соединений перед пачкой ордеров.
+
+Для каждого аккаунта через его прокси заранее открывается соединение с биржей (CONNECT, TLS),
+синхронизируются часы и делается подписанный запрос снимка балансов: он проверяет ключ и сразу
+попадает в кэш balances, который модуль все равно прочитает перед ордером. При ORDER_TRANSPORT = "ws"
+заранее подключается и торговый WebSocket. Модули с ордерами вызывают warm_up до запуска
+аккаунтов (при WARMUP), поэтому открытие соединений не попадает в задержку ордеров, а время
+прогрева считается отдельно.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ORDER_TRANSPORT, SCHEDULER_WORKERS
+from core import balances, clock, orders, transport
+
+_stats = {}
+
+
+def warm_account(account):
+    """Прогревает один аккаунт. Возвращает время прогрева в секундах или None при ошибке."""
+    started = time.perf_counter()
+    try:
+        clock.get_offset(account.proxy)
+        balances.get_balances(account.api_key, account.api_secret, account.proxy)
+        if ORDER_TRANSPORT == "ws":
+            orders.get_connection(account.api_key, account.api_secret, account.proxy)
+    except Exception as e:
+        print(f"Не удалось прогреть аккаунт {account.id}: {e}")
+        return None
+    return time.perf_counter() - started
+
+
+def warm_up(accounts, workers=SCHEDULER_WORKERS):
+    """Прогревает все аккаунты параллельно и печатает, сколько это стоило."""
+    accounts = list(accounts)
+    if not accounts:
+        return {}
+    handshakes_before = transport.get_stats()["handshakes"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(workers, len(accounts))) as executor:
+        timings = list(executor.map(warm_account, accounts))
+    elapsed = time.perf_counter() - started
+
+    done = sorted(timing for timing in timings if timing is not None)
+    _stats.update({
+        "accounts": len(done),
+        "failed": len(timings) - len(done),
+        "elapsed": elapsed,
+        "p50": done[len(done) // 2] if done else 0.0,
+        "p99": done[min(int(len(done) * 0.99), len(done) - 1)] if done else 0.0,
+        "handshakes": transport.get_stats()["handshakes"] - handshakes_before,
+    })
+    print(f"Прогрев: {_stats['accounts']} аккаунтов за {elapsed:.2f} с, на аккаунт p50 {_stats['p50'] * 1000:.0f} мс, "
+          f"p99 {_stats['p99'] * 1000:.0f} мс, новых соединений {_stats['handshakes']}, ошибок {_stats['failed']}")
+    return dict(_stats)
+
+
+def get_stats():
+    return dict(_stats)
@@ -0,0 +1,139 @@
+"""
+Воркер очереди задач (core.jobqueue): берет задачи в аренду, выполняет их функцией
+run_job(account, sink) модуля и подтверждает результатом, записанным в sink. Модули с
+денежными операциями пишут шаги в sink.journal - журнал, который хранится в строке задачи.
+"""
+import importlib
+import inspect
+import threading
+import time
+
+from config import JOB_LEASE_SECONDS, JOB_LEASE_BATCH, JOB_POLL_INTERVAL
+from core import engine, proxy_pool
+
+_job_functions = {}
+
+
+class JobJournal:
+    """
+    Журнал шагов одной задачи с интерфейсом core.journal.Journal (record, last, entries).
+    Шаги хранятся в строке задачи в очереди (jobs.save_steps), а не в journal.db воркера:
+    если аренда истечет, задача придет другому воркеру вместе с записью "started" и ссылкой
+    операции, и модуль проверит ее на бирже вместо отправки новой.
+    """
+
+    def __init__(self, jobs, worker, job):
+        self._jobs = jobs
+        self._worker = worker
+        self._job = job
+        self._steps = dict(job.steps)
+        self._lock = threading.Lock()
+        self.resumed = bool(self._steps)
+
+    def record(self, account, step, status, ref=None, **data):
+        """Записывает шаг в очередь до возврата. Исключение, если аренда задачи передана другому воркеру."""
+        with self._lock:
+            self._steps[step] = {"status": status, "ref": ref, "data": data}
+            if not self._jobs.save_steps(self._worker, self._job.id, self._steps):
+                raise Exception(f"Задача {self._job.id}: аренда передана другому воркеру, шаг {step} не записан")
+
+    def last(self, account, step):
+        with self._lock:
+            entry = self._steps.get(step)
+        return dict(entry) if entry is not None else None
+
+    def entries(self, account, prefix=""):
+        with self._lock:
+            return {step: dict(entry) for step, entry in self._steps.items() if step.startswith(prefix)}
+
+    def is_done(self, account, step):
+        entry = self.last(account, step)
+        return entry is not None and entry["status"] == "done"
+
+    def close(self):
+        pass
+
+
+class RecordSink:
+    """Результат одной задачи: модуль вызывает sink.add(account_id, record), шаги пишет в sink.journal."""
+
+    def __init__(self, journal=None):
+        self.record = {}
+        self.journal = journal
+
+    def add(self, key, record):
+        self.record = record
+
+
+def job_function(module):
+    """run_job модуля modules/<module>.py."""
+    function = _job_functions.get(module)
+    if function is None:
+        function = getattr(importlib.import_module(f"modules.{module}"), "run_job", None)
+        if function is None:
+            raise ValueError(f"Модуль {module} не поддерживает работу через очередь задач")
+        _job_functions[module] = function
+    return function
+
+
+def execute(jobs, worker, job, account, in_flight):
+    """Выполняет задачу и подтверждает ее. Генератор: паузы модуля (yield delay) отдаются движку."""
+    sink = RecordSink(JobJournal(jobs, worker, job))
+    if job.steps:
+        print(f"Задача {job.id} выдана повторно (попытка {job.attempts}): начатые операции будут сверены с биржей")
+    try:
+        result = job_function(job.module)(account, sink)
+        if inspect.isgenerator(result):
+            yield from result
+    except Exception as e:
+        print(f"Задача {job.id} ({job.module}, аккаунт {account.id}) не выполнена: {e}")
+        jobs.fail(worker, job.id, e)
+    else:
+        if not jobs.ack(worker, job.id, sink.record):
+            print(f"Задача {job.id}: аренда истекла и передана другому воркеру, результат не принят")
+    finally:
+        in_flight.discard(job.id)
+
+
+def _heartbeat(jobs, worker, in_flight, stop):
+    # Продление аренды с запасом: три продления за время одной аренды
+    while not stop.wait(JOB_LEASE_SECONDS / 3):
+        jobs.renew(worker, list(in_flight))
+
+
+def run_worker(jobs, worker, accounts, modules=None, batch=JOB_LEASE_BATCH, wait=False):
+    """
+    Выполняет задачи из очереди jobs по аккаунтам accounts, пока они есть (или бесконечно при wait).
+    Возвращает число выполненных задач.
+    """
+    accounts = {account.id: account for account in accounts}
+    jobs.restrict_accounts(accounts)
+    in_flight = set()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(jobs, worker, in_flight, stop), daemon=True)
+    heartbeat.start()
+
+    processed = 0
+    started = time.monotonic()
+    try:
+        while True:
+            leased = jobs.lease(worker, batch, modules)
+            if not leased:
+                if not wait:
+                    break
+                time.sleep(JOB_POLL_INTERVAL)
+                continue
+
+            batch_accounts = [accounts[job.account] for job in leased]
+            proxy_pool.prepare(batch_accounts)  # Проверка прокси только тех аккаунтов, что пришли в пачке
+            in_flight.update(job.id for job in leased)
+            engine.run_accounts(execute, [(jobs, worker, job, accounts[job.account], in_flight) for job in leased])
+            processed += len(leased)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    elapsed = time.monotonic() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Воркер {worker}: выполнено задач {processed} за {elapsed:.1f} с ({rate:.1f} в секунду)")
+    return processed
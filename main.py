@@ -1,70 +1,72 @@
-import subprocess
 import sys
+import time
 
-def run_balance_module():
-    subprocess.run([sys.executable, 'modules/balance.py'])
+from config import CONTROL_API, CONTROL_API_PORT
+from core.daemon import Runner, serve
+from core.journal import has_unfinished
 
-def run_transfer_module():
-    subprocess.run([sys.executable, 'modules/transfer.py'])
+# Модули выполняются в этом же процессе: соединения, часы и кэши остаются прогретыми между запусками
+MENU = [
+    ("Баланс", "balance"),
+    ("Перевод между счетами", "transfer"),
+    ("Торговый объем на споте", "volume_spot"),
+    ("Свап в любой паре на споте", "swap"),
+    ("Свап в любой паре на МАРЖЕ", "leverage_swap"),
+    ("Вывод с биржи", "withdraw"),
+    ("Узнать доступные сети для вывода", "network"),
+    ("Узнать адрес для депозита", "get_address"),
+    ("Обновление аккаунтов до UTA", "upgrade_to_uta"),
+    ("Субаккаунты через мастер-ключ", "subaccounts"),
+]
 
-def run_volume_spot_module():
-    subprocess.run([sys.executable, 'modules/volume_spot.py'])
+# Модули с журналом, которые можно продолжить после прерванного запуска
+RESUMABLE = ("transfer", "volume_spot", "withdraw", "subaccounts")
 
-def run_swap_module():
-    subprocess.run([sys.executable, 'modules/swap.py'])
+def ask_resume(module):
+    """True, если прошлый запуск модуля прерван и его нужно продолжить."""
+    if module in RESUMABLE and has_unfinished(module):
+        answer = input("Предыдущий запуск модуля не завершен. Продолжить его, пропустив сделанное? (y/n): ")
+        return answer.strip().lower() == "y"
+    return False
 
-def run_leverage_swap_module():
-    subprocess.run([sys.executable, 'modules/leverage_swap.py'])
+def run_module(runner, module):
+    job = runner.run(module, ask_resume(module))
+    if job["status"] == "failed":
+        print(f"Модуль завершился с ошибкой: {job['error']}")
+    first_response = f", первый ответ биржи через {job['first_response']:.2f} с" if job["first_response"] is not None else ""
+    print(f"Время выполнения: {job['elapsed']:.1f} с{first_response}")
 
-def run_withdraw_module():
-    subprocess.run([sys.executable, 'modules/withdraw.py'])
-
-def run_network_module():
-    subprocess.run([sys.executable, 'modules/network.py'])
-
-def run_upgrade_to_uta_module():
-    subprocess.run([sys.executable, 'modules/upgrade_to_uta.py'])
-
-def run_get_address_module():
-    subprocess.run([sys.executable, 'modules/get_address.py'])
+def serve_forever(runner):
+    serve(runner, CONTROL_API_PORT)
+    print(f"HTTP API запущен на http://127.0.0.1:{CONTROL_API_PORT} (POST /run {{\"module\": \"balance\"}}), Ctrl+C - выход")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Выход из программы.")
 
 def main():
+    runner = Runner()
+    if "--serve" in sys.argv[1:]:
+        return serve_forever(runner)
+    if CONTROL_API:
+        serve(runner, CONTROL_API_PORT)
+        print(f"HTTP API запущен на http://127.0.0.1:{CONTROL_API_PORT}")
+
+    exit_choice = str(len(MENU) + 1)
     while True:
         print("Выберите модуль для запуска:")
-        print("1. Баланс")
-        print("2. Перевод между счетами")
-        print("3. Торговый объем на споте")
-        print("4. Свап в любой паре на споте")
-        print("5. Свап в любой паре на МАРЖЕ")
-        print("6. Вывод с биржи")
-        print("7. Узнать доступные сети для вывода")
-        print("8. Узнать адрес для депозита")
-        print("9. Обновление аккаунтов до UTA")
-        print("10. Выход")
+        for number, (title, _) in enumerate(MENU, 1):
+            print(f"{number}. {title}")
+        print(f"{exit_choice}. Выход")
 
         choice = input("Введите номер модуля: ")
 
-        if choice == '1':
-            run_balance_module()
-        elif choice == '2':
-            run_transfer_module()
-        elif choice == '3':
-            run_volume_spot_module()
-        elif choice == '4':
-            run_swap_module()
-        elif choice == '5':
-            run_leverage_swap_module()
-        elif choice == '6':
-            run_withdraw_module()
-        elif choice == '7':
-            run_network_module()
-        elif choice == '8':
-            run_get_address_module()   
-        elif choice == '9':
-            run_upgrade_to_uta_module()
-        elif choice == '10':
+        if choice == exit_choice:
             print("Выход из программы.")
             break
+        if choice.isdigit() and 1 <= int(choice) <= len(MENU):
+            run_module(runner, MENU[int(choice) - 1][1])
         else:
             print("Неверный ввод. Пожалуйста, введите корректный номер модуля.")
 
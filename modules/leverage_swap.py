@@ -1,20 +1,19 @@
-import requests
 import json
-from threading import Thread
 import time
 import hmac
 import hashlib
-from requests.exceptions import RequestException
 from urllib.parse import urlencode
-import math
 import random
 import sys
 import os
 
 # Добавление пути к корневой директории проекта в sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import (TOKEN_1, TOKEN_2, TRADE_DIRECTION, EXCHANGE_AMOUNT, 
-                    MAX_RETRIES, DELAY_BETWEEN_RETRIES, LEV, ACCOUNT_DELAY_RANGE)
+from config import (API_URL, TOKEN_1, TOKEN_2, TRADE_DIRECTION, EXCHANGE_AMOUNT, 
+                    MAX_RETRIES, DELAY_BETWEEN_RETRIES, WARMUP, LEV)
+from core import transport, clock, engine, proxy_pool
+from core import balances, orders, warmup, instruments, account_state
+from core.accounts import selected_accounts
 
 SYMBOL_TO_TRADE = TOKEN_1 + TOKEN_2
 
@@ -40,19 +39,6 @@ def print_yellow(text):
     colored_text = color_text(text, YELLOW)
     print(colored_text)
 
-# Функция для получения текущего времени в формате timestamp
-def get_server_time(proxy):
-    url = 'https://api.bybit.com/v5/market/time'
-    url = url.strip()  # Очистка URL-адреса от лишних символов
-    try:
-        response = requests.get(url, proxies=proxy)
-        if response.status_code == 200:
-            data = response.json()
-            return int(data['result']['timeSecond']) * 1000
-        raise Exception(f"Ошибка запроса: {response.status_code}")
-    except Exception as e:
-        raise
-
 # Функция для подписи параметров запроса
 def generate_signature(api_key, api_secret, timestamp, recv_window, params, method='GET'):
     sign_str = f"{timestamp}{api_key}{recv_window}"
@@ -63,36 +49,13 @@ def generate_signature(api_key, api_secret, timestamp, recv_window, params, meth
     signature = hmac.new(api_secret.encode('utf-8'), sign_str.encode('utf-8'), hashlib.sha256).hexdigest()
     return signature
 
-# Функция для получения баланса монеты
-def get_coin_balance(api_key, api_secret, proxy, coin, accountType="UNIFIED", memberId=None): # вместо UNIFIED Может быть SPOT
-    timestamp = get_server_time(proxy)
-    recv_window = "20000"
-    params = {"accountType": accountType, "coin": coin}
-    if memberId:
-        params["memberId"] = memberId
-
-    signature = generate_signature(api_key, api_secret, timestamp, recv_window, params, 'GET')
-    headers = {
-        "X-BAPI-API-KEY": api_key,
-        "X-BAPI-SIGN": signature,
-        "X-BAPI-TIMESTAMP": str(timestamp),
-        "X-BAPI-RECV-WINDOW": recv_window,
-    }
-    url = "https://api.bybit.com/v5/asset/transfer/query-account-coin-balance?" + urlencode(params)
-    response = requests.get(url, headers=headers, proxies=proxy)
-    return response.text
-
-# Функция для обрезания числа до заданного количества знаков после запятой без округления
-def format_number(number, decimal_places):
-    return str(number)[:str(number).index('.') + 1 + decimal_places]
-
 def create_unique_order_link_id():
     current_milliseconds = int(round(time.time() * 1000))
     random_number = random.randint(100, 999)
     return f"order_{current_milliseconds}_{random_number}"
 
 def toggle_margin_trade(api_key, api_secret, spotMarginMode, proxy):
-    timestamp = str(int(time.time() * 1000))
+    timestamp = str(clock.timestamp(proxy))
     recv_window = "20000"
     params = {
         "spotMarginMode": spotMarginMode  # "1" для включения, "0" для выключения
@@ -110,13 +73,13 @@ def toggle_margin_trade(api_key, api_secret, spotMarginMode, proxy):
         "Content-Type": "application/json"
     }
 
-    url = "https://api.bybit.com/v5/spot-margin-trade/switch-mode"
-    response = requests.post(url, headers=headers, data=params_json, proxies=proxy)
+    url = API_URL + "/v5/spot-margin-trade/switch-mode"
+    response = transport.post(url, headers=headers, data=params_json, proxies=proxy)
 
     return response.text
 
 def set_leverage(api_key, api_secret, leverage, proxy):
-    timestamp = str(int(time.time() * 1000))
+    timestamp = str(clock.timestamp(proxy))
     recv_window = "20000"
     params = {
         "leverage": leverage
@@ -134,18 +97,16 @@ def set_leverage(api_key, api_secret, leverage, proxy):
         "Content-Type": "application/json"
     }
 
-    url = "https://api.bybit.com/v5/spot-margin-trade/set-leverage"
-    response = requests.post(url, headers=headers, data=params_json, proxies=proxy)
+    url = API_URL + "/v5/spot-margin-trade/set-leverage"
+    response = transport.post(url, headers=headers, data=params_json, proxies=proxy)
 
     return response.text
 
 
-# Функция для размещения рыночного ордера
-def place_market_order(api_key, api_secret, symbol, side, quantity, proxy, decimal_places, is_leverage=1):
-    timestamp = str(int(time.time() * 1000))
-    recv_window = "20000"
-
-    formatted_quantity = format_number(float(quantity), decimal_places)
+# Функция для размещения рыночного ордера (REST или WebSocket, по настройке ORDER_TRANSPORT)
+def place_market_order(api_key, api_secret, symbol, side, quantity, proxy, is_leverage=1):
+    # Количество обрезается вниз до шага пары: для BUY - в монете котировки, для SELL - в базовой
+    formatted_quantity = instruments.get_instrument(symbol, proxy).format(side, quantity)
     print_green(f"Отправляемый запрос с количеством: {formatted_quantity}")
 
     order_link_id = create_unique_order_link_id()
@@ -160,25 +121,11 @@ def place_market_order(api_key, api_secret, symbol, side, quantity, proxy, decim
         "isLeverage": is_leverage  # Указываем, что это маржинальный ордер
     }
 
-    params_json = json.dumps(params, separators=(',', ':'), sort_keys=True)
-    signature = generate_signature(api_key, api_secret, timestamp, recv_window, params_json, method='POST')
-
-    headers = {
-        "X-BAPI-API-KEY": api_key,
-        "X-BAPI-SIGN": signature,
-        "X-BAPI-TIMESTAMP": timestamp,
-        "X-BAPI-RECV-WINDOW": recv_window,
-        "Content-Type": "application/json"
-    }
-
-    url = "https://api.bybit.com/v5/order/create"
-    response = requests.post(url, headers=headers, data=params_json, proxies=proxy)
-
-    return response.text
+    return orders.create_order(api_key, api_secret, proxy, params)
 
 
 # Функция для размещения рыночного ордера с повторными попытками
-def attempt_place_market_order(api_key, api_secret, symbol, side, quantity, proxy, decimal_places, account_id):
+def attempt_place_market_order(api_key, api_secret, symbol, side, quantity, proxy, account_id):
     retries = 0
     while retries < MAX_RETRIES:
         # Получаем баланс валюты для торговли
@@ -187,12 +134,11 @@ def attempt_place_market_order(api_key, api_secret, symbol, side, quantity, prox
         else:
             coin_to_check = TOKEN_2
         
-        balance_info_text = get_coin_balance(api_key, api_secret, proxy, coin_to_check)
-        balance_info = json.loads(balance_info_text)
-        if 'result' in balance_info and 'balance' in balance_info['result']:
-            balance = float(balance_info['result']['balance']['walletBalance'])
+        # При повторной попытке баланс берется из снимка, если ордер его не изменил
+        try:
+            balance = balances.get_balance(api_key, api_secret, proxy, coin_to_check)
             print_yellow(f"Доступный баланс для {coin_to_check}: {balance}")
-        else:
+        except Exception:
             print_red("Не удалось получить баланс.")
             return None
 
@@ -203,15 +149,15 @@ def attempt_place_market_order(api_key, api_secret, symbol, side, quantity, prox
         else:
             quantity = EXCHANGE_AMOUNT
 
-        formatted_quantity = format_number(quantity, decimal_places)
+        formatted_quantity = instruments.get_instrument(SYMBOL_TO_TRADE, proxy).format(TRADE_DIRECTION, quantity)
         print_green(f"Используемое количество для торговли на попытке {retries + 1}: {formatted_quantity}")
         
-        order_response_text = place_market_order(api_key, api_secret, SYMBOL_TO_TRADE, TRADE_DIRECTION, formatted_quantity, proxy, decimal_places, 1) # is_leverage всегда 1, т.к. уже учли в quantity
+        order_response = place_market_order(api_key, api_secret, SYMBOL_TO_TRADE, TRADE_DIRECTION, formatted_quantity, proxy, 1) # is_leverage всегда 1, т.к. уже учли в quantity
 
-        order_response = json.loads(order_response_text)
         if order_response['retCode'] == 0:
+            balances.invalidate(api_key)
             print_green(f"Свап успешный для аккаунта {account_id}")
-            return order_response_text
+            return order_response
         else:
             print_red(f"Ошибка при свапе для аккаунта {account_id}: {order_response['retMsg']}")
             retries += 1
@@ -221,113 +167,133 @@ def attempt_place_market_order(api_key, api_secret, symbol, side, quantity, prox
     return None
 
 
-# Функция для загрузки информации об аккаунтах
-def load_accounts(filename='accounts.txt'):
-    accounts = []
-    with open(filename, 'r') as file:
-        for line in file:
-            parts = line.strip().split(':')
-            if len(parts) < 7:
-                continue
-            account_id, api_key, api_secret, proxy_ip, proxy_port, proxy_login, proxy_password = parts[:7]
-            
-            # Очистка API ключей от лишних символов и форматирование
-            api_key = api_key.strip()
-            api_secret = api_secret.strip()
-            
-            proxy_ip = proxy_ip.strip()
-            proxy_port = proxy_port.strip()
-            proxy_login = proxy_login.strip()
-            proxy_password = proxy_password.strip()
-            
-            proxy = {
-                "http": f"http://{proxy_login}:{proxy_password}@{proxy_ip}:{proxy_port}",
-                "https": f"http://{proxy_login}:{proxy_password}@{proxy_ip}:{proxy_port}"
-            }
-            accounts.append((account_id, api_key, api_secret, proxy))
-    return accounts
-
-def process_account(account_id, api_key, api_secret, proxy):
-    print_yellow(f"Работаем с аккаунтом: {account_id}")
+def ensure_margin(account_id, api_key, api_secret, proxy):
+    """
+    Включает маржинальную торговлю и плечо LEV. Запросы уходят, только если сохраненное
+    состояние аккаунта (core.account_state) отличается от нужного. Возвращает, сколько
+    изменений отправлено на биржу, или None при ошибке.
+    """
+    state = account_state.get(api_key, api_secret, proxy)
+    changed = 0
 
     # Включение маржинальной торговли
-    try:
-        toggle_margin_response = toggle_margin_trade(api_key, api_secret, "1", proxy)  # "1" для включения
-        toggle_margin_result = json.loads(toggle_margin_response)
-        if toggle_margin_result['retCode'] != 0:
-            print_red(f"Не удалось включить маржинальную торговлю для аккаунта {account_id}: {toggle_margin_result['retMsg']}")
-            return
-        else:
-            print_green(f"Маржинальная торговля включена для аккаунта {account_id}")
-    except Exception as e:
-        print_red(f"Ошибка при включении маржинальной торговли для аккаунта {account_id}: {str(e)}")
-        return
+    if state.get("spotMarginMode") == "1":
+        print_green(f"Маржинальная торговля уже включена для аккаунта {account_id}")
+    else:
+        try:
+            toggle_margin_response = toggle_margin_trade(api_key, api_secret, "1", proxy)  # "1" для включения
+            toggle_margin_result = json.loads(toggle_margin_response)
+            if toggle_margin_result['retCode'] != 0:
+                print_red(f"Не удалось включить маржинальную торговлю для аккаунта {account_id}: {toggle_margin_result['retMsg']}")
+                account_state.invalidate(api_key)
+                return None
+            else:
+                account_state.update(api_key, spotMarginMode="1")
+                changed += 1
+                print_green(f"Маржинальная торговля включена для аккаунта {account_id}")
+        except Exception as e:
+            print_red(f"Ошибка при включении маржинальной торговли для аккаунта {account_id}: {str(e)}")
+            return None
 
     # Установка кредитного плеча
     leverage = LEV  # Пример значения кредитного плеча
+    if state.get("spotLeverage") == str(leverage):
+        print_green(f"Кредитное плечо {leverage} уже установлено для аккаунта {account_id}")
+        return changed
     try:
         leverage_response_text = set_leverage(api_key, api_secret, leverage, proxy)
         leverage_response = json.loads(leverage_response_text)
         if leverage_response['retCode'] != 0:
             print_red(f"Ошибка при установке кредитного плеча для аккаунта {account_id}: {leverage_response['retMsg']}")
-            return
+            account_state.invalidate(api_key)
+            return None
         else:
+            account_state.update(api_key, spotLeverage=str(leverage))
             print_green(f"Кредитное плечо успешно установлено для аккаунта {account_id}")
     except Exception as e:
         print_red(f"Ошибка при установке кредитного плеча для аккаунта {account_id}: {str(e)}")
-        return
+        return None
+    return changed + 1
+
+
+def process_account(account_id, api_key, api_secret, proxy):
+    """Маржа, плечо и ордер аккаунта. Возвращает итог ордера (orders.outcome) для результата задачи очереди."""
+    print_yellow(f"Работаем с аккаунтом: {account_id}")
+
+    if ensure_margin(account_id, api_key, api_secret, proxy) is None:
+        return {"status": "failed", "error": "Не удалось включить маржу или плечо"}
 
     # Проверка баланса и размещение ордера
     coin_to_check = TOKEN_1 if TRADE_DIRECTION == "SELL" else TOKEN_2
     print(f"Проверяем токен: {coin_to_check}")
 
     try:
-        balance_info_text = get_coin_balance(api_key, api_secret, proxy, coin_to_check, 'UNIFIED')
-        balance_info = json.loads(balance_info_text)
-        if 'result' in balance_info and 'balance' in balance_info['result']:
-            balance = balance_info['result']['balance']['walletBalance']
-            print(f"Баланс токена на аккаунте {account_id}: {coin_to_check}: {balance}")
-
-            if float(balance) < 1 / (10 ** 2):  # Проверка минимального баланса для торговли
-                print_red(f"Недостаточный баланс для торговли на аккаунте {account_id}")
-                return
-            else:
-                quantity = EXCHANGE_AMOUNT if EXCHANGE_AMOUNT is not None else balance
-                print(f"Используемое количество для торговли: {quantity}")
-
-                # Размещение ордера
-                for attempt in range(MAX_RETRIES):
-                    order_response_text = attempt_place_market_order(
-                        api_key, api_secret, SYMBOL_TO_TRADE, TRADE_DIRECTION, quantity, proxy, 2, account_id  # Предполагается, что десятичные места равны 2
-                    )
-                    order_response = json.loads(order_response_text)
-                    if order_response['retCode'] == 0:
-                        print_green(f"Успешная торговля для аккаунта {account_id}")
-                        break
-                    else:
-                        print_red(f"Попытка {attempt + 1}/{MAX_RETRIES} на аккаунте {account_id} не удалась: {order_response['retMsg']}")
-                        if attempt < MAX_RETRIES - 1:
-                            time.sleep(DELAY_BETWEEN_RETRIES)
+        balance = balances.get_balance(api_key, api_secret, proxy, coin_to_check, 'UNIFIED')
+        print(f"Баланс токена на аккаунте {account_id}: {coin_to_check}: {balance}")
+
+        # Проверка минимального ордера пары (с учетом кредитного плеча, как в attempt_place_market_order)
+        instrument = instruments.get_instrument(SYMBOL_TO_TRADE, proxy)
+        if not instrument.is_tradable(TRADE_DIRECTION, EXCHANGE_AMOUNT if EXCHANGE_AMOUNT is not None else float(balance) * LEV):
+            print_red(f"Недостаточный баланс для торговли на аккаунте {account_id}: "
+                      f"минимальный ордер {SYMBOL_TO_TRADE} - {instrument.minimum(TRADE_DIRECTION)}")
+            return {"status": "skipped", "error": f"меньше минимального ордера {instrument.minimum(TRADE_DIRECTION)}"}
         else:
-            print_red(f"Не удалось получить баланс для аккаунта {account_id}: {balance_info_text}")
+            quantity = EXCHANGE_AMOUNT if EXCHANGE_AMOUNT is not None else balance
+            print(f"Используемое количество для торговли: {quantity}")
+
+            # Размещение ордера
+            attempt = 0
+            state_checked = False
+            order_response = None
+            while attempt < MAX_RETRIES:
+                order_response = attempt_place_market_order(
+                    api_key, api_secret, SYMBOL_TO_TRADE, TRADE_DIRECTION, quantity, proxy, account_id
+                )
+                if order_response is not None:
+                    print_green(f"Успешная торговля для аккаунта {account_id}")
+                    break
+                else:
+                    print_red(f"Попытка {attempt + 1}/{MAX_RETRIES} на аккаунте {account_id} не удалась")
+                    # Маржу или плечо могли изменить вне скрипта: состояние один раз перечитывается с биржи,
+                    # и если его пришлось исправить, ордер повторяется сразу, не расходуя попытку
+                    if not state_checked:
+                        state_checked = True
+                        account_state.invalidate(api_key)
+                        changed = ensure_margin(account_id, api_key, api_secret, proxy)
+                        if changed is None:
+                            return {"status": "failed", "error": "Не удалось включить маржу или плечо"}
+                        if changed:
+                            continue
+                    attempt += 1
+                    if attempt < MAX_RETRIES:
+                        time.sleep(DELAY_BETWEEN_RETRIES)
+            return orders.outcome(order_response)
     except Exception as e:
         print_red(f"Ошибка при получении баланса для аккаунта {account_id}: {str(e)}")
+        return {"status": "failed", "error": str(e)}
+
+
+def run_job(account, sink):
+    """Задача очереди (cluster.py): результат - итог ордера."""
+    sink.add(account.id, process_account(account.id, account.api_key, account.api_secret, account.proxy))
 
 
 def main():
-    accounts = load_accounts()
-    threads = []
-    
-    for account_id, api_key, api_secret, proxy in accounts:
-        thread = Thread(target=process_account, args=(account_id, api_key, api_secret, proxy))
-        threads.append(thread)
-        thread.start()
-        # Генерируем случайную задержку в пределах ACCOUNT_DELAY_RANGE
-        random_delay = random.randint(*ACCOUNT_DELAY_RANGE)
-        time.sleep(random_delay)
-    
-    for thread in threads:
-        thread.join()
+    accounts = selected_accounts()
+    proxy_pool.prepare(accounts)
+    if accounts:
+        instruments.get_instrument(SYMBOL_TO_TRADE, accounts[0].proxy)
+    # Маржа и плечо проверяются по сохраненному состоянию, с биржи читаются только новые и устаревшие аккаунты
+    account_state.refresh(accounts)
+    if WARMUP:
+        warmup.warm_up(accounts)
+    engine.run_accounts(process_account, [(account.id, account.api_key, account.api_secret, account.proxy)
+                                          for account in accounts])
+    account_state.save()
+
+    orders.print_stats()
+    orders.close_all()
+    transport.print_stats()
 
 
 if __name__ == "__main__":
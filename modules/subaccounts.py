@@ -0,0 +1,195 @@
+"""
+Субаккаунты через ключ мастер-аккаунта.
+
+Все запросы идут с одним ключом и прокси из MASTER_FILE по одному соединению: субаккаунтам
+не нужны свои ключи и прокси. Список субаккаунтов - /v5/user/query-sub-members, балансы -
+/v5/asset/transfer/query-account-coins-balance с memberId, переводы - универсальный перевод
+/v5/asset/transfer/universal-transfer между мастером и субаккаунтами.
+
+SUB_MODE:
+    "balance" - балансы SUB_COIN на счетах SUB_ACCOUNT_TYPE всех субаккаунтов в sub_balances.txt
+    "sweep"   - весь доступный баланс SUB_COIN с субаккаунтов на счет MASTER_ACCOUNT_TYPE мастера
+    "fund"    - SUB_FUND_AMOUNT SUB_COIN с мастера каждому субаккаунту
+Переводы пишутся в журнал (journal.db) и с --resume не повторяются.
+"""
+import sys
+import os
+
+# Добавление пути к корневой директории проекта в sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import (MASTER_FILE, SUB_MODE, SUB_COIN, SUB_ACCOUNT_TYPE, MASTER_ACCOUNT_TYPE, SUB_FUND_AMOUNT,
+                    SUB_MEMBER_IDS)
+from core import api, transport, engine, proxy_pool, results, runlog, transfers
+from core.accounts import iter_accounts, parse_ids, id_in
+from core.journal import open_journal
+
+# SUB_COIN может быть одной монетой или списком монет
+COINS = [SUB_COIN] if isinstance(SUB_COIN, str) else list(SUB_COIN)
+
+# Консоль и журнал logs/subaccounts_*.jsonl
+log = runlog.get_logger("subaccounts")
+
+def print_red(text, **fields):
+    log.error(text, **fields)
+
+def print_yellow(text, **fields):
+    log.warn(text, **fields)
+
+
+def load_master():
+    """Мастер-аккаунт: первая строка MASTER_FILE в формате accounts.txt."""
+    if not os.path.exists(MASTER_FILE):
+        raise Exception(f"Нет файла {MASTER_FILE}: запишите в него ключ мастер-аккаунта в формате accounts.txt")
+    master = next(iter_accounts(MASTER_FILE), None)
+    if master is None:
+        raise Exception(f"В файле {MASTER_FILE} нет строки мастер-аккаунта")
+    return master
+
+
+def get_master_uid(master):
+    data = api.signed_get("/v5/user/query-api", master.api_key, master.api_secret, master.proxy)
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить UID мастер-аккаунта: {data.get('retMsg')}")
+    return int(data["result"]["userID"])
+
+
+def get_sub_members(master):
+    """UID действующих субаккаунтов (status 1), с фильтром SUB_MEMBER_IDS."""
+    data = api.signed_get("/v5/user/query-sub-members", master.api_key, master.api_secret, master.proxy)
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить список субаккаунтов: {data.get('retMsg')}")
+    uids = [int(member["uid"]) for member in data["result"]["subMembers"] if int(member.get("status", 1)) == 1]
+    if SUB_MEMBER_IDS is not None:
+        ranges = parse_ids(SUB_MEMBER_IDS)
+        uids = [uid for uid in uids if id_in(uid, ranges)]
+    return sorted(uids)
+
+
+def get_sub_balances(master, uid, account_type):
+    """{coin: transferBalance} монет COINS на счете субаккаунта."""
+    params = {"memberId": uid, "accountType": account_type, "coin": ",".join(COINS)}
+    data = api.signed_get("/v5/asset/transfer/query-account-coins-balance", master.api_key, master.api_secret,
+                          master.proxy, params)
+    if data.get("retCode") != 0:
+        raise Exception(data.get("retMsg"))
+    return {row["coin"]: float(row.get("transferBalance") or 0) for row in data["result"]["balance"]}
+
+
+def get_transfer_status(master, transfer_id):
+    """Статус универсального перевода по transferId или None, если биржа его не знает."""
+    data = api.signed_get("/v5/asset/transfer/query-universal-transfer-list", master.api_key, master.api_secret,
+                          master.proxy, {"transferId": transfer_id})
+    if data.get("retCode") != 0:
+        raise Exception(f"Не удалось получить статус перевода: {data.get('retMsg')}")
+    rows = data["result"]["list"]
+    return rows[0]["status"] if rows else None
+
+
+def process_balance(master, uid, sink):
+    try:
+        sink.add(uid, {"values": get_sub_balances(master, uid, SUB_ACCOUNT_TYPE)})
+    except Exception as e:
+        sink.add(uid, {"error": str(e)})
+
+
+def _transfer_calls(master):
+    """Запрос универсального перевода и проверка его статуса ключом мастера (для core.transfers)."""
+    def send(transfer_data):
+        return api.signed_post("/v5/asset/transfer/universal-transfer", master.api_key, master.api_secret,
+                               master.proxy, transfer_data)
+    return send, lambda transfer_id: get_transfer_status(master, transfer_id)
+
+
+def process_transfer(master, master_uid, uid, journal):
+    """sweep: с субаккаунта на мастер, fund: с мастера на субаккаунт, по каждой монете COINS."""
+    send, get_status = _transfer_calls(master)
+    where = f"субаккаунте {uid}"
+    pending = []
+    for coin in COINS:
+        step = f"{SUB_MODE} {coin}"
+        entry = journal.last(uid, step)
+        if entry is not None and entry["status"] == "done":
+            continue
+        if entry is not None and entry["status"] == "started":
+            transfers.resume(journal, uid, step, entry, send, get_status, log, where)
+            continue
+        pending.append(coin)
+    if not pending:
+        return
+
+    if SUB_MODE == "sweep":
+        try:
+            available = get_sub_balances(master, uid, SUB_ACCOUNT_TYPE)
+        except Exception as e:
+            print_red(f"Не удалось получить баланс субаккаунта {uid}: {e}", account=uid, step="balance")
+            return
+        route = {"fromMemberId": uid, "toMemberId": master_uid,
+                 "fromAccountType": SUB_ACCOUNT_TYPE, "toAccountType": MASTER_ACCOUNT_TYPE}
+    else:
+        available = {coin: SUB_FUND_AMOUNT for coin in pending}
+        route = {"fromMemberId": master_uid, "toMemberId": uid,
+                 "fromAccountType": MASTER_ACCOUNT_TYPE, "toAccountType": SUB_ACCOUNT_TYPE}
+
+    for coin in pending:
+        step = f"{SUB_MODE} {coin}"
+        amount = transfers.quantize(available.get(coin, 0))
+        if amount <= 0:
+            journal.record(uid, step, "done", ref=None, amount="0")
+            continue
+        # Сначала запись в журнал, потом запрос: после падения будет видно, что перевод мог уйти
+        transfer_data = transfers.start(journal, uid, step, coin, amount, **route)
+        transfers.finish(journal, uid, step, transfer_data, send, log, where)
+
+
+def report_balances(uids, sink):
+    output_filename = "sub_balances.txt"
+    total = {coin: 0.0 for coin in COINS}
+    with open(output_filename, "w") as file:
+        for uid, result in sink.records(uids):
+            if result is None or "error" in result:
+                text = f"Не удалось получить баланс субаккаунта {uid}: {(result or {}).get('error', 'нет данных')}"
+                print_red(text, account=uid, step="balance")
+                file.write(text + "\n")
+                continue
+            for coin in COINS:
+                value = result["values"].get(coin, 0.0)
+                total[coin] += value
+                text = f"Баланс {coin} на субаккаунте {uid}: {value}"
+                log.info(text, account=uid, step="balance")
+                file.write(text + "\n")
+        file.write("\n")
+        for coin in COINS:
+            text = f"Общий баланс {coin} всех субаккаунтов: {total[coin]}"
+            print_yellow(text)
+            file.write(text + "\n")
+
+
+def main():
+    if SUB_MODE not in ("balance", "sweep", "fund"):
+        print_red(f"Неизвестный SUB_MODE: {SUB_MODE}")
+        return
+    master = load_master()
+    proxy_pool.prepare([master])  # Проверка прокси мастер-аккаунта
+
+    uids = get_sub_members(master)
+    print_yellow(f"Субаккаунтов: {len(uids)}, режим {SUB_MODE}, счет {SUB_ACCOUNT_TYPE}, монеты: {', '.join(COINS)}")
+
+    # Все субаккаунты идут через один ключ и одно соединение: темп задают лимиты ключа (core.ratelimit),
+    # а ACCOUNT_DELAY_RANGE не применяется
+    if SUB_MODE == "balance":
+        sink = results.ResultSink("sub_balances.txt")
+        engine.run_accounts(process_balance, [(master, uid, sink) for uid in uids], delay_range=(0, 0))
+        report_balances(uids, sink)
+        sink.finish()
+    else:
+        master_uid = get_master_uid(master)
+        journal = open_journal("subaccounts")  # С --resume сделанные переводы пропускаются
+        engine.run_accounts(process_transfer, [(master, master_uid, uid, journal) for uid in uids], delay_range=(0, 0))
+        journal.close()
+
+    transport.print_stats()
+
+
+if __name__ == "__main__":
+    main()
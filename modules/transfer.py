@@ -1,51 +1,32 @@
-import requests
 import json
 import hmac
 import hashlib
-import time
-import threading
-import random
-import uuid
 import sys
 import os
+from decimal import Decimal
 
 # Добавление пути к корневой директории проекта в sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from config import CHOSEN_TOKEN, FROM_ACCOUNT_TYPE, TO_ACCOUNT_TYPE, ACCOUNT_DELAY_RANGE, TRANSFER_AMOUNT
+from config import (API_URL, CHOSEN_TOKEN, FROM_ACCOUNT_TYPE, TO_ACCOUNT_TYPE, TRANSFER_AMOUNT,
+                    TRANSFER_SWEEP, SWEEP_COINS, SWEEP_MIN_AMOUNTS)
+from core import api, balances, transport, clock, engine, proxy_pool, runlog, coins, transfers
+from core.accounts import selected_accounts
+from core.journal import open_journal
 
-# ANSI escape codes
-GREEN = "\033[92m"
-RED = "\033[91m"
-YELLOW = "\033[93m"
-ENDC = "\033[0m"
+# Консоль и журнал logs/transfer_*.jsonl
+log = runlog.get_logger("transfer")
 
-def print_green(text):
-    print(f"{GREEN}{text}{ENDC}")
+def print_red(text, **fields):
+    log.error(text, **fields)
 
-def print_red(text):
-    print(f"{RED}{text}{ENDC}")
+def print_yellow(text, **fields):
+    log.warn(text, **fields)
 
-def print_yellow(text):
-    print(f"{YELLOW}{text}{ENDC}")
-
-BASE_URL = "https://api.bybit.com/"
-
-print_yellow(f"Перевожу {CHOSEN_TOKEN} с {FROM_ACCOUNT_TYPE} на {TO_ACCOUNT_TYPE}")
-
-def get_server_time(my_proxies) -> int:
-    response = requests.get(BASE_URL + "v3/public/time", proxies=my_proxies)
-    if response.status_code != 200:
-        raise Exception(f"Failed to get server time: {response.text}")
-
-    content = response.json()
-    if 'retCode' not in content or content['retCode'] != 0 or 'result' not in content or 'timeSecond' not in content['result']:
-        raise Exception(f"Unexpected response structure: {content}")
-
-    return int(content['result']['timeSecond'])
+BASE_URL = API_URL + "/"
 
 def generate_signed_headers(api_key, api_secret, payload, my_proxies) -> dict:
-    time_stamp = str(get_server_time(my_proxies) * 1000)
+    time_stamp = str(clock.timestamp(my_proxies))
     
     if isinstance(payload, dict):  
         param_str = time_stamp + api_key + '10000' + "&".join([f"{key}={value}" for key, value in payload.items()])
@@ -71,7 +52,7 @@ def get_balance(api_key, api_secret, account_type, my_proxies) -> float:
     }
 
     headers = generate_signed_headers(api_key, api_secret, params, my_proxies)
-    response = requests.get(BASE_URL + endpoint, headers=headers, params=params, proxies=my_proxies)
+    response = transport.get(BASE_URL + endpoint, headers=headers, params=params, proxies=my_proxies)
     content = response.json()
     
     if response.status_code != 200 or content.get('retCode') != 0:
@@ -79,30 +60,42 @@ def get_balance(api_key, api_secret, account_type, my_proxies) -> float:
 
     return float(content['result']['balance']['walletBalance'])
 
-def main(credentials, lock: threading.Lock):
-    API_KEY = credentials['api_key']
-    API_SECRET = credentials['api_secret']
-    PROXY_DATA = credentials['proxy'].split(":")
-    PROXY_IP = PROXY_DATA[0]
-    PROXY_PORT = PROXY_DATA[1]
-    PROXY_LOGIN = PROXY_DATA[2]
-    PROXY_PASSWORD = PROXY_DATA[3]
-    ACC_NUM = credentials['id']
-
-    proxy_data = f"{PROXY_IP}:{PROXY_PORT}:{PROXY_LOGIN}:{PROXY_PASSWORD}"
-    my_proxies = {
-        'http': f"http://{PROXY_LOGIN}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}",
-        'https': f"http://{PROXY_LOGIN}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}"
-    }
+def send_transfer(api_key, api_secret, my_proxies, transfer_data):
+    payload = json.dumps(transfer_data)
+    headers = generate_signed_headers(api_key, api_secret, payload, my_proxies)
+    transfer_response = transport.post(BASE_URL + "asset/v3/private/transfer/inter-transfer", headers=headers, data=payload, proxies=my_proxies)
+    return transfer_response.json()
+
+def get_transfer_status(api_key, api_secret, my_proxies, transfer_id):
+    """Статус перевода по transferId (SUCCESS, PENDING, FAILED) или None, если биржа его не знает."""
+    content = api.signed_get("/v5/asset/transfer/query-inter-transfer-list", api_key, api_secret, my_proxies,
+                             {"transferId": transfer_id})
+    if content.get("retCode") != 0:
+        raise Exception(f"Failed to get transfer status: {content.get('retMsg')}")
+    rows = content["result"]["list"]
+    return rows[0]["status"] if rows else None
+
+def process_account(account, journal):
+    API_KEY = account.api_key
+    API_SECRET = account.api_secret
+    ACC_NUM = account.id
+    my_proxies = account.proxy
+
+    entry = journal.last(ACC_NUM, "transfer")
+    if entry is not None and entry["status"] == "done":
+        log.info(f"Аккаунт номер {ACC_NUM}: перевод уже выполнен ({entry['ref']}), пропуск", account=ACC_NUM, step="resume")
+        return
 
-    with lock:
-        print(f"Запуск аккаунта номер {ACC_NUM}")
+    log.info(f"Запуск аккаунта номер {ACC_NUM}", account=ACC_NUM, step="start")
+
+    if entry is not None and entry["status"] == "started":
+        resume_transfer(account, journal, "transfer", entry)
+        return
 
     try:
         token_balance = get_balance(API_KEY, API_SECRET, FROM_ACCOUNT_TYPE, my_proxies)
     except Exception as e:
-        with lock:
-            print_red(f"Ошибка при получении баланса на аккаунте номер {ACC_NUM}: {str(e)}")
+        print_red(f"Ошибка при получении баланса на аккаунте номер {ACC_NUM}: {str(e)}", account=ACC_NUM, step="balance")
         return
 
     # Проверка, задан ли фиксированный объем перевода
@@ -113,63 +106,107 @@ def main(credentials, lock: threading.Lock):
 
     transfer_amount = round(transfer_amount, 4)  # Округление до 4 знаков после запятой
 
-    with lock:
-        print_yellow(f"Текущий баланс {CHOSEN_TOKEN} на аккаунте номер {ACC_NUM} в {FROM_ACCOUNT_TYPE}: {token_balance:.8f}")
-        print_yellow(f"Сумма для перевода: {transfer_amount:.8f} {CHOSEN_TOKEN}")
+    print_yellow(f"Текущий баланс {CHOSEN_TOKEN} на аккаунте номер {ACC_NUM} в {FROM_ACCOUNT_TYPE}: {token_balance:.8f}",
+                 account=ACC_NUM, step="balance")
+    print_yellow(f"Сумма для перевода: {transfer_amount:.8f} {CHOSEN_TOKEN}", account=ACC_NUM, step="balance")
 
     if transfer_amount > 0:
-        transfer_data = {
-            "transferId": str(uuid.uuid4()).replace('-', ''),
-            "coin": CHOSEN_TOKEN,
-            "amount": str(transfer_amount),
-            "fromAccountType": FROM_ACCOUNT_TYPE,
-            "toAccountType": TO_ACCOUNT_TYPE
-        }
-
-        payload = json.dumps(transfer_data)
-        headers = generate_signed_headers(API_KEY, API_SECRET, payload, my_proxies)
-        transfer_response = requests.post(BASE_URL + "asset/v3/private/transfer/inter-transfer", headers=headers, data=payload, proxies=my_proxies)
-        transfer_content = transfer_response.json()
-
-        with lock:
-            if transfer_content.get("retCode") == 0:
-                print_green(f"Перевод на аккаунте номер {ACC_NUM} успешно выполнен. Сумма: {transfer_amount:.8f} {CHOSEN_TOKEN}.")
-            else:
-                print_red(f"Ошибка перевода на аккаунте номер {ACC_NUM}. Сообщение: {transfer_content.get('retMsg')}")
-
-def load_credentials_from_file(filename: str) -> list:
-    credentials = []
-    with open(filename, 'r') as file:
-        for index, line in enumerate(file.readlines()):
-            parts = line.strip().split(":")
-            if len(parts) < 7:
-                print_red(f"Ошибка в строке {index + 1}: не хватает данных!")
-                continue
-            account_info = {
-                'id': int(parts[0]),
-                'api_key': parts[1],
-                'api_secret': parts[2],
-                'proxy': ':'.join(parts[3:7]),
-            }
-            credentials.append(account_info)
-    return credentials
+        # Сначала запись в журнал, потом запрос: после падения будет видно, что перевод мог уйти
+        transfer_data = transfers.start(journal, ACC_NUM, "transfer", CHOSEN_TOKEN, transfer_amount,
+                                        fromAccountType=FROM_ACCOUNT_TYPE, toAccountType=TO_ACCOUNT_TYPE)
+        finish_transfer(account, journal, transfer_data)
+    else:
+        journal.record(ACC_NUM, "transfer", "done", ref=None, amount="0")
+
+def _sender(account):
+    return lambda transfer_data: send_transfer(account.api_key, account.api_secret, account.proxy, transfer_data)
+
+def resume_transfer(account, journal, step, entry):
+    """
+    Запуск прервался после записи "started": сначала узнаем, дошел ли перевод до биржи,
+    и только если нет - повторяем с тем же transferId, баланс заново не запрашивается.
+    """
+    transfers.resume(journal, account.id, step, entry, _sender(account),
+                     lambda transfer_id: get_transfer_status(account.api_key, account.api_secret, account.proxy, transfer_id),
+                     log, f"аккаунте номер {account.id}")
+
+def process_account_sweep(account, journal):
+    """Все монеты счета FROM_ACCOUNT_TYPE: один запрос балансов и перевод каждой монеты, которая не пыль."""
+    API_KEY = account.api_key
+    API_SECRET = account.api_secret
+    ACC_NUM = account.id
+    my_proxies = account.proxy
+
+    # Шаги журнала - "transfer <монета>": сделанные монеты пропускаются, начатые проверяются по transferId,
+    # неудачные (в том числе при повторе начатых) переводятся заново по новому снимку
+    started = [(account, journal, step, entry)
+               for step, entry in journal.entries(ACC_NUM, "transfer ").items() if entry["status"] == "started"]
+    engine.run_threaded(resume_transfer, started, delay_range=(0, 0))
+    handled = {step for step, entry in journal.entries(ACC_NUM, "transfer ").items() if entry["status"] != "failed"}
+    if handled:
+        log.info(f"Аккаунт номер {ACC_NUM}: продолжение, уже обработано монет: {len(handled)}", account=ACC_NUM, step="resume")
 
-if __name__ == '__main__':
-    filename = "accounts.txt"
-    credentials = load_credentials_from_file(filename)
-    
-    lock = threading.Lock()
-    threads = []
+    try:
+        snapshot = balances.get_transferable(API_KEY, API_SECRET, my_proxies, FROM_ACCOUNT_TYPE)
+    except Exception as e:
+        print_red(f"Ошибка при получении балансов на аккаунте номер {ACC_NUM}: {str(e)}", account=ACC_NUM, step="balance")
+        return
 
-    for cred in credentials:
-        t = threading.Thread(target=main, args=(cred, lock))
-        threads.append(t)
-        t.start()
+    sweep_coins = SWEEP_COINS if SWEEP_COINS is not None else sorted(snapshot)
+    pending = []
+    for coin in sweep_coins:
+        if f"transfer {coin}" in handled:
+            continue
+        available = snapshot.get(coin, {}).get("transferBalance", 0.0)
+        # Суммы с точностью до 4 знаков; шаг точности - это же минимум для монет без SWEEP_MIN_AMOUNTS
+        amount = transfers.quantize(available)
+        if amount <= 0 or amount < Decimal(str(SWEEP_MIN_AMOUNTS.get(coin, transfers.AMOUNT_STEP))):
+            continue
+
+        # transferId в журнале до запроса: повтор после сбоя идет с тем же transferId и не дублирует перевод
+        transfer_data = transfers.start(journal, ACC_NUM, f"transfer {coin}", coin, amount,
+                                        fromAccountType=FROM_ACCOUNT_TYPE, toAccountType=TO_ACCOUNT_TYPE)
+        pending.append((account, journal, transfer_data, f"transfer {coin}"))
+
+    # Монеты переводятся параллельно, по потоку на монету; общий темп запросов держит лимитер core.transport
+    engine.run_threaded(finish_transfer, pending, delay_range=(0, 0))
+
+def finish_transfer(account, journal, transfer_data, step="transfer"):
+    transfers.finish(journal, account.id, step, transfer_data, _sender(account), log, f"аккаунте номер {account.id}")
+
+def run_job(account, sink):
+    """Задача очереди (cluster.py): шаги перевода хранятся в задаче (sink.journal), результат - итог из них."""
+    journal = sink.journal
+    if TRANSFER_SWEEP:
+        process_account_sweep(account, journal)
+        sink.add(account.id, journal.entries(account.id, "transfer "))
+    else:
+        process_account(account, journal)
+        sink.add(account.id, journal.last(account.id, "transfer") or {})
 
-        # Добавляем задержку между запуском потоков
-        delay = random.randint(*ACCOUNT_DELAY_RANGE)
-        print(f"Выбрана задержка перед следующим аккаунтом: {delay} секунд")
-        time.sleep(delay)
+def main():
+    if TRANSFER_SWEEP:
+        names = ", ".join(SWEEP_COINS) if SWEEP_COINS is not None else "все монеты"
+        print_yellow(f"Перевожу {names} с {FROM_ACCOUNT_TYPE} на {TO_ACCOUNT_TYPE}")
+    else:
+        print_yellow(f"Перевожу {CHOSEN_TOKEN} с {FROM_ACCOUNT_TYPE} на {TO_ACCOUNT_TYPE}")
+    filename = "accounts.txt"
+    accounts = selected_accounts(filename)
+    # Монеты проверяются по справочнику до запросов аккаунтов: опечатка в тикере не уходит на каждый аккаунт
+    for coin in (SWEEP_COINS or []) if TRANSFER_SWEEP else [CHOSEN_TOKEN]:
+        error = coins.check(coin, account=accounts[0] if accounts else None)
+        if error:
+            print_red(f"{error}. Перевод не запущен")
+            return
+    proxy_pool.prepare(accounts)
+
+    journal = open_journal("transfer")  # С --resume сделанные переводы пропускаются
+    # Аккаунты идут параллельно, а в режиме TRANSFER_SWEEP и монеты одного аккаунта (process_account_sweep)
+    engine.run_accounts(process_account_sweep if TRANSFER_SWEEP else process_account,
+                        [(account, journal) for account in accounts])
+    journal.close()
+
+    transport.print_stats()
 
-    for t in threads:
-        t.join()
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,4 @@
-import requests
 import json
-import random
 import time
 import hmac
 import hashlib
@@ -11,7 +9,9 @@ import os
 # Добавление пути к корневой директории проекта в sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from config import ACCOUNT_DELAY_RANGE
+from config import API_URL, UTA_POLL_INTERVAL, UTA_POLL_MAX_INTERVAL, UTA_POLL_TIMEOUT
+from core import transport, clock, engine, proxy_pool, account_state
+from core.accounts import selected_accounts
 
 # Перечисление цветов для вывода текста в консоли
 GREEN = "\033[92m"
@@ -34,32 +34,6 @@ def print_yellow(text):
     colored_text = color_text(text, YELLOW)
     print(colored_text)
 
-# Функция для загрузки информации об аккаунтах
-def load_accounts(filename='accounts.txt'):
-    accounts = []
-    with open(filename, 'r') as file:
-        for line in file:
-            parts = line.strip().split(':')
-            if len(parts) < 7:
-                continue
-            account_id, api_key, api_secret, proxy_ip, proxy_port, proxy_login, proxy_password = parts[:7]
-            
-            # Очистка API ключей от лишних символов и форматирование
-            api_key = api_key.strip()
-            api_secret = api_secret.strip()
-            
-            proxy_ip = proxy_ip.strip()
-            proxy_port = proxy_port.strip()
-            proxy_login = proxy_login.strip()
-            proxy_password = proxy_password.strip()
-            
-            proxy = {
-                "http": f"http://{proxy_login}:{proxy_password}@{proxy_ip}:{proxy_port}",
-                "https": f"http://{proxy_login}:{proxy_password}@{proxy_ip}:{proxy_port}"
-            }
-            accounts.append((account_id, api_key, api_secret, proxy))
-    return accounts
-
 # Генерация подписи для запроса
 def generate_signature(api_key, api_secret, timestamp, recv_window, params, method='POST'):
     sign_str = f"{timestamp}{api_key}{recv_window}"
@@ -72,10 +46,10 @@ def generate_signature(api_key, api_secret, timestamp, recv_window, params, meth
 
 # Функция для получения текущей информации об аккаунте
 def get_account_info(api_key, api_secret, proxy):
-    endpoint = "https://api.bybit.com/v5/account/info"
+    endpoint = API_URL + "/v5/account/info"
     
     # Генерация значений для заголовков
-    timestamp = int(time.time() * 1000)
+    timestamp = clock.timestamp(proxy)
     recv_window = 5000  # Вы можете настроить этот параметр по вашему усмотрению
     
     # Создание заголовков
@@ -88,10 +62,12 @@ def get_account_info(api_key, api_secret, proxy):
     
     try:
         # Выполнение HTTP-запроса
-        response = requests.get(endpoint, proxies=proxy, headers=headers)
+        response = transport.get(endpoint, proxies=proxy, headers=headers)
         data = response.json()
         
         if "unifiedMarginStatus" in data["result"]:
+            account_state.update(api_key, unifiedMarginStatus=data["result"]["unifiedMarginStatus"],
+                                 marginMode=data["result"].get("marginMode"))
             return data["result"]
         else:
             print_red("Поле 'unifiedMarginStatus' отсутствует в ответе от API.")
@@ -101,27 +77,34 @@ def get_account_info(api_key, api_secret, proxy):
         print_red(f"Произошла ошибка при выполнении запроса: {str(e)}")
         return None
 
-# Обновленная функция для обновления аккаунта до UTA
+# Обновленная функция для обновления аккаунта до UTA. Возвращает "done", "pending" (нужно дождаться) или "failed"
 def upgrade_account_to_uta_if_needed(api_key, api_secret, proxy):
+    # Аккаунт, уже обновленный в прошлых запусках, не запрашивается: обратно на классический счет он не вернется
+    if account_state.is_unified(account_state.get(api_key, api_secret, proxy, fetch=False)):
+        print_green("Аккаунт уже находится в режиме UTA (сохраненное состояние). Обновление не требуется.")
+        return "done"
+
     account_info = get_account_info(api_key, api_secret, proxy)
     
     if account_info:
         unified_margin_status = account_info["unifiedMarginStatus"]
         
-        if unified_margin_status == 4:
+        if account_state.is_unified(account_info):
             print_green("Аккаунт уже находится в режиме UTA. Обновление не требуется.")
+            return "done"
         else:
             print(f"Текущий статус аккаунта: {unified_margin_status}")
-            upgrade_account_to_uta(api_key, api_secret, proxy)
+            return upgrade_account_to_uta(api_key, api_secret, proxy)
     else:
         print_red("Не удалось получить информацию об аккаунте.")
+        return "failed"
 
-# Функция для обновления аккаунта до UTA
+# Функция для обновления аккаунта до UTA. "done", "pending" (обновление идет на стороне биржи) или "failed"
 def upgrade_account_to_uta(api_key, api_secret, proxy):
-    endpoint = "https://api.bybit.com/v5/account/upgrade-to-uta"
+    endpoint = API_URL + "/v5/account/upgrade-to-uta"
     
     # Генерация значений для заголовков
-    timestamp = int(time.time() * 1000)
+    timestamp = clock.timestamp(proxy)
     recv_window = 5000  # Вы можете настроить этот параметр по вашему усмотрению
     payload = "{}"
     
@@ -136,7 +119,7 @@ def upgrade_account_to_uta(api_key, api_secret, proxy):
     
     try:
         # Выполнение HTTP-запроса
-        response = requests.post(endpoint, proxies=proxy, headers=headers, data=payload)
+        response = transport.post(endpoint, proxies=proxy, headers=headers, data=payload)
         data = response.json()
         
         # Проверка наличия поля unifiedUpdateStatus
@@ -144,8 +127,10 @@ def upgrade_account_to_uta(api_key, api_secret, proxy):
             unified_update_status = data["result"]["unifiedUpdateStatus"]
             if unified_update_status == "SUCCESS":
                 print_green("Аккаунт успешно обновлен до UTA.")
+                return "done"
             elif unified_update_status == "PROCESS":
-                print_yellow("Обновление аккаунта в процессе. Проверьте статус позже.")
+                print_yellow("Обновление аккаунта в процессе, статус будет проверен позже.")
+                return "pending"
             else:
                 print_red(f"Ошибка при обновлении аккаунта. Статус: {unified_update_status}")
                 if "unifiedUpdateMsg" in data["result"]:
@@ -153,54 +138,99 @@ def upgrade_account_to_uta(api_key, api_secret, proxy):
                     for error_msg in error_msgs:
                         print_red(error_msg)
         else:
-            print_red("Поле 'unifiedUpdateStatus' отсутствует в ответе от API.")
+            print_red(f"Поле 'unifiedUpdateStatus' отсутствует в ответе от API: {data.get('retMsg')}")
     
     except Exception as e:
         print_red(f"Произошла ошибка при выполнении запроса: {str(e)}")
-
-# Функция для ожидания завершения обновления аккаунта
-def wait_for_account_upgrade(api_key, api_secret, proxy):
-    max_attempts = 30  # Максимальное количество попыток проверки статуса
-    interval_seconds = 10  # Интервал между попытками в секундах
-    
-    for attempt in range(max_attempts):
-        account_info = get_account_info(api_key, api_secret, proxy)
-        if account_info:
-            unified_margin_status = account_info["unifiedMarginStatus"]
-            if unified_margin_status == 4:
-                print_green("Аккаунт успешно обновлен до UTA.")
-                return
-            elif unified_margin_status == "PROCESS":
-                print_yellow("Обновление аккаунта в процессе. Проверьте статус позже.")
-            else:
-                print_red(f"Ошибка при обновлении аккаунта. Статус: {unified_margin_status}")
-                if "unifiedUpdateMsg" in account_info:
-                    error_msgs = account_info["unifiedUpdateMsg"]["msg"]
-                    for error_msg in error_msgs:
-                        print_red(error_msg)
-        else:
-            print_red("Не удалось получить информацию об аккаунте.")
-        
-        if attempt < max_attempts - 1:
-            time.sleep(interval_seconds)
-        else:
-            print_red("Достигнут лимит попыток. Проверьте статус аккаунта вручную.")
+    return "failed"
+
+# Отправка запроса на обновление одного аккаунта, итог записывается в statuses
+def submit_upgrade(account, statuses):
+    print(f"Обновление аккаунта {account.id}...")
+    statuses[account.id] = upgrade_account_to_uta_if_needed(account.api_key, account.api_secret, account.proxy)
+
+
+# Одна проверка статуса аккаунта, который ждет завершения обновления
+def check_upgrade(account, statuses):
+    account_info = get_account_info(account.api_key, account.api_secret, account.proxy)
+    if account_info and account_state.is_unified(account_info):
+        print_green(f"Аккаунт {account.id} обновлен до UTA.")
+        statuses[account.id] = "done"
+
+
+def poll_upgrades(accounts, statuses):
+    """
+    Общий опрос аккаунтов со статусом "pending": раунд проверок всех ожидающих аккаунтов
+    параллельно, пауза между раундами растет от UTA_POLL_INTERVAL до UTA_POLL_MAX_INTERVAL.
+    Через UTA_POLL_TIMEOUT секунд опрос прекращается, оставшиеся аккаунты остаются "pending".
+    """
+    interval = UTA_POLL_INTERVAL
+    deadline = time.monotonic() + UTA_POLL_TIMEOUT
+    while True:
+        pending = [account for account in accounts if statuses.get(account.id) == "pending"]
+        if not pending:
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print_red(f"Обновление не завершилось за {UTA_POLL_TIMEOUT} секунд у {len(pending)} аккаунтов.")
+            return
+        print_yellow(f"Ожидают завершения обновления: {len(pending)}, следующая проверка через {interval:.0f} секунд")
+        time.sleep(min(interval, remaining))
+        # Без ACCOUNT_DELAY_RANGE: проверки статуса не нужно разносить по времени, как запросы на обновление
+        engine.run_accounts(check_upgrade, [(account, statuses) for account in pending], delay_range=(0, 0))
+        interval = min(interval * 2, UTA_POLL_MAX_INTERVAL)
+
+
+def wait_upgrade(account, statuses):
+    """
+    Опрос одного аккаунта со статусом "pending" для задачи очереди. Генератор: паузы между
+    проверками (yield delay) ждет движок, и поток на время ожидания свободен.
+    """
+    interval = UTA_POLL_INTERVAL
+    deadline = time.monotonic() + UTA_POLL_TIMEOUT
+    while statuses.get(account.id) == "pending":
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print_red(f"Обновление аккаунта {account.id} не завершилось за {UTA_POLL_TIMEOUT} секунд.")
+            return
+        yield min(interval, remaining)
+        check_upgrade(account, statuses)
+        interval = min(interval * 2, UTA_POLL_MAX_INTERVAL)
+
+
+def print_summary(accounts, statuses):
+    groups = {"done": [], "failed": [], "pending": []}
+    for account in accounts:
+        groups[statuses.get(account.id, "failed")].append(str(account.id))
+    print()
+    print_green(f"Обновлены до UTA: {len(groups['done'])} из {len(accounts)}")
+    if groups["failed"]:
+        print_red(f"Ошибка обновления: {len(groups['failed'])} ({', '.join(groups['failed'])})")
+    if groups["pending"]:
+        print_yellow(f"Обновление еще идет, проверьте позже: {len(groups['pending'])} ({', '.join(groups['pending'])})")
+
+
+def run_job(account, sink):
+    """Задача очереди (cluster.py): генератор, ожидание обновления не занимает поток воркера."""
+    statuses = {}
+    submit_upgrade(account, statuses)
+    yield from wait_upgrade(account, statuses)
+    sink.add(account.id, {"status": statuses[account.id]})
 
 
 def main():
-    accounts = load_accounts()  # Загрузка информации о всех аккаунтах
-    
-    for account_id, api_key, api_secret, proxy in accounts:
-        print(f"Обновление аккаунта {account_id}...")
-        upgrade_account_to_uta_if_needed(api_key, api_secret, proxy)
-        wait_for_account_upgrade(api_key, api_secret, proxy)
-
-        # Генерация случайной задержки
-        delay = random.randint(*ACCOUNT_DELAY_RANGE)
-        print(f"Задержка перед следующим аккаунтом: {delay} секунд")
-        time.sleep(delay)
-
-        print("\n")
+    accounts = selected_accounts()  # Загрузка информации о выбранных аккаунтах
+    proxy_pool.prepare(accounts)
+
+    # Запросы на обновление уходят параллельно (с задержками ACCOUNT_DELAY_RANGE между аккаунтами и в
+    # пределах лимитов запросов), а завершения всех аккаунтов ждет один общий опрос, а не каждый аккаунт по очереди
+    statuses = {}
+    engine.run_accounts(submit_upgrade, [(account, statuses) for account in accounts])
+    poll_upgrades(accounts, statuses)
+
+    print_summary(accounts, statuses)
+    account_state.save()
+    transport.print_stats()
 
 if __name__ == "__main__":
     main()
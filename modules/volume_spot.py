@@ -1,14 +1,5 @@
-import requests
-import json
-from threading import Thread
 import time
-import hmac
-import hashlib
-from requests.exceptions import RequestException
-from urllib.parse import urlencode
-import math
 import random
-import datetime
 import sys
 import os
 
@@ -16,108 +7,36 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-from config import REPEATS, PAUSE_RANGE, MAX_RETRIES, DELAY_BETWEEN_RETRIES
+from config import (REPEATS, PAUSE_RANGE, MAX_RETRIES, DELAY_BETWEEN_RETRIES, USE_PRIVATE_STREAM, WS_FILL_TIMEOUT,
+                    RECONCILE_EVERY)
+from core import transport, proxy_pool, runlog
+from core import balances, orders, engine, instruments
+from core.stream import open_stream, FINAL_STATUSES
+from core.accounts import selected_accounts, id_sort_key
+from core.journal import open_journal
 
 
-# ANSI escape codes
-GREEN = "\033[92m"
-RED = "\033[91m"
-YELLOW = "\033[93m"
-ENDC = "\033[0m"
+# Консоль и журнал logs/volume_spot_*.jsonl (пишется фоновым потоком, аккаунты его не ждут)
+log = runlog.get_logger("volume_spot")
 
-# Создание пути к файлу лога в папке 'logs'
-log_folder = os.path.join(os.path.dirname(__file__), '..', 'logs')
-os.makedirs(log_folder, exist_ok=True)  # Создает папку logs, если она не существует
-log_filename = os.path.join(log_folder, datetime.datetime.now().strftime("Spot_volume_log_%Y-%m-%d_%H-%M-%S.txt"))
+def print_green(text, **fields):
+    log.ok(text, **fields)
 
-def color_text(text, color_code):
-    return f"{color_code}{text}{ENDC}"
+def print_red(text, **fields):
+    log.error(text, **fields)
 
-def log_to_file(message):
-    """Записывает сообщение в файл лога."""
-    with open(log_filename, "a") as log_file:
-        log_file.write(message + "\n")
-
-def print_green(text):
-    colored_text = color_text(text, GREEN)
-    print(colored_text)
-    log_to_file(text)  # Записываем неформатированный текст в файл лога
-
-def print_red(text):
-    colored_text = color_text(text, RED)
-    print(colored_text)
-    log_to_file(text)  # Записываем неформатированный текст в файл лога
-
-def print_yellow(text):
-    colored_text = color_text(text, YELLOW)
-    print(colored_text)
-    log_to_file(text)  # Записываем неформатированный текст в файл лога
-
-# Функция для получения текущего времени в формате timestamp
-def get_server_time(proxy):
-    url = 'https://api.bybit.com/v5/market/time'
-    url = url.strip()  # Очистка URL-адреса от лишних символов
-    try:
-        response = requests.get(url, proxies=proxy)
-        if response.status_code == 200:
-            data = response.json()
-            return int(data['result']['timeSecond']) * 1000
-        raise Exception(f"Ошибка запроса: {response.status_code}")
-    except Exception as e:
-        raise
-
-# Функция для подписи параметров запроса
-def generate_signature(api_key, api_secret, timestamp, recv_window, params, method='GET'):
-    sign_str = f"{timestamp}{api_key}{recv_window}"
-    if method == 'POST':
-        sign_str += params
-    else:
-        sign_str += urlencode(sorted(params.items()))
-    signature = hmac.new(api_secret.encode('utf-8'), sign_str.encode('utf-8'), hashlib.sha256).hexdigest()
-    return signature
-
-# Функция для получения баланса монеты
-def get_coin_balance(api_key, api_secret, proxy, coin, accountType="UNIFIED", memberId=None): # вместо UNIFIED может быть SPOT
-    timestamp = get_server_time(proxy)
-    recv_window = "20000"
-    params = {"accountType": accountType, "coin": coin}
-    if memberId:
-        params["memberId"] = memberId
-
-    signature = generate_signature(api_key, api_secret, timestamp, recv_window, params, 'GET')
-    headers = {
-        "X-BAPI-API-KEY": api_key,
-        "X-BAPI-SIGN": signature,
-        "X-BAPI-TIMESTAMP": str(timestamp),
-        "X-BAPI-RECV-WINDOW": recv_window,
-    }
-    url = "https://api.bybit.com/v5/asset/transfer/query-account-coin-balance?" + urlencode(params)
-    
-    #print_yellow(f"Отправляемый запрос на получение баланса: {url}")  # Логируем URL запроса
-    response = requests.get(url, headers=headers, proxies=proxy)
-    #print_yellow(f"Ответ API на запрос баланса: {response.text}")  # Логируем ответ API
-
-    return response.text
-
-
-def format_number(number, decimal_places):
-    number_str = f"{number:.{decimal_places + 10}f}"  # Форматируем число с дополнительными знаками после запятой
-    dot_index = number_str.find('.')
-    if dot_index != -1:
-        return number_str[:dot_index] + number_str[dot_index:dot_index + decimal_places + 1]
-    return number_str
+def print_yellow(text, **fields):
+    log.warn(text, **fields)
 
 def create_unique_order_link_id():
     current_milliseconds = int(round(time.time() * 1000))
     random_number = random.randint(100, 999)
     return f"order_{current_milliseconds}_{random_number}"
 
-# Функция для размещения рыночного ордера
-def place_market_order(api_key, api_secret, symbol, side, quantity, proxy, decimal_places):
-    timestamp = str(int(time.time() * 1000))
-    recv_window = "20000"
-
-    formatted_quantity = format_number(quantity, decimal_places)
+# Функция для размещения рыночного ордера (REST или WebSocket, по настройке ORDER_TRANSPORT)
+def place_market_order(api_key, api_secret, symbol, side, quantity, proxy, account_id=None):
+    # Количество обрезается вниз до шага пары: для BUY - в монете котировки, для SELL - в базовой
+    formatted_quantity = instruments.get_instrument(symbol, proxy).format(side, quantity)
 
     print(f"Отправляемый запрос с количеством: {formatted_quantity}")
 
@@ -132,124 +51,247 @@ def place_market_order(api_key, api_secret, symbol, side, quantity, proxy, decim
         "orderLinkId": order_link_id
     }
 
-    params_json = json.dumps(params, separators=(',', ':'), sort_keys=True)
+    started = time.perf_counter()
+    order_response = orders.create_order(api_key, api_secret, proxy, params)
+    fields = {"account": account_id, "step": f"order {side.upper()}", "latency": time.perf_counter() - started,
+              "ret_code": order_response.get("retCode")}
+
+    if order_response.get("retCode") == 0:
+        print_green("Ордер успешно размещен", **fields)
+        return order_link_id
+
+    print_red(f"Ошибка при размещении ордера: {order_response.get('retMsg')}", **fields)
+    return None
+
+
+# Пара USDCUSDT: покупка тратит USDT и дает USDC, продажа наоборот
+BASE_COIN = "USDC"
+QUOTE_COIN = "USDT"
+SYMBOL = BASE_COIN + QUOTE_COIN
+MIN_QUANTITY = 0.01  # Расхождение с биржей меньше этого при сверке не выводится
+
+
+def wait_fill(api_key, api_secret, proxy, stream, order_link_id, counter, account_id=None):
+    """
+    Итог исполнения ордера (cumExecQty, cumExecValue, cumExecFee).
+    С потоком он приходит событием order без запросов, без потока - одним запросом /v5/order/realtime.
+    """
+    if stream is not None:
+        order = stream.book.wait_order(order_link_id, WS_FILL_TIMEOUT)
+        if order is not None:
+            return order
+        print_yellow("Событие об исполнении не пришло вовремя, исполнение запрашивается через REST",
+                     account=account_id, step="fill")
+
+    for attempt in range(3):
+        counter["requests"] += 1
+        order = orders.get_order(api_key, api_secret, proxy, order_link_id)
+        if order is not None and order.get("orderStatus") in FINAL_STATUSES:
+            return order
+        time.sleep(0.2 * (attempt + 1))
+    return None
+
+
+def apply_fill(local, side, order):
+    """Обновляет локальный баланс по фактическому исполнению, а не по запрошенному количеству."""
+    filled = float(order.get("cumExecQty") or 0)
+    value = float(order.get("cumExecValue") or 0)
+    fee = float(order.get("cumExecFee") or 0)
+    # Комиссия на споте списывается в получаемой монете
+    if side == "BUY":
+        local[QUOTE_COIN] -= value
+        local[BASE_COIN] += filled - fee
+    else:
+        local[BASE_COIN] -= filled
+        local[QUOTE_COIN] += value - fee
+
+
+def reconcile(api_key, api_secret, proxy, local, counter, account_id=None):
+    """Сверяет локальный баланс с биржей одним снимком и берет значения биржи."""
+    counter["requests"] += 1
+    snapshot = balances.get_balances(api_key, api_secret, proxy, max_age=0)
+    for coin in (QUOTE_COIN, BASE_COIN):
+        actual = snapshot.get(coin, {}).get("walletBalance", 0.0)
+        if abs(actual - local.get(coin, 0.0)) >= MIN_QUANTITY:
+            print_yellow(f"Расхождение баланса {coin}: локально {local.get(coin, 0.0)}, на бирже {actual}",
+                         account=account_id, step="reconcile")
+        local[coin] = actual
+
+
+def run_leg(api_key, api_secret, proxy, stream, local, side, counter, account_id=None):
+    """Одна нога цикла: весь локальный баланс монеты в ордер и учет исполнения. False, если нужна сверка."""
+    coin = QUOTE_COIN if side == "BUY" else BASE_COIN
+    quantity = local[coin]
+    print(f"Баланс {coin} по последнему исполнению: {quantity}")
+    # Остаток меньше минимального ордера пары (minOrderAmt для покупки, minOrderQty для продажи) не торгуется
+    if not instruments.get_instrument(SYMBOL, proxy).is_tradable(side, quantity):
+        return True
+
+    print(f"Вызов функции place_market_order для {coin}...")
+    counter["requests"] += 1
+    order_link_id = place_market_order(api_key, api_secret, SYMBOL, side, quantity, proxy, account_id)
+    balances.invalidate(api_key)
+    if not order_link_id:
+        return False
+    counter.setdefault("orders", []).append(order_link_id)
+
+    order = wait_fill(api_key, api_secret, proxy, stream, order_link_id, counter, account_id)
+    if order is None:
+        print_yellow("Нет данных об исполнении ордера, баланс будет сверен с биржей", account=account_id, step="fill")
+        return False
+
+    print(f"Ордер исполнен: {order.get('orderStatus')}, количество {order.get('cumExecQty')}, сумма {order.get('cumExecValue')}")
+    apply_fill(local, side, order)
+    return True
+
+
+def process_account(account, pause_range, account_balances, cycle_stats=None, journal=None):
+    API_KEY = account.api_key
+    API_SECRET = account.api_secret
+    ACC_NUM = account.id
+    my_proxies = account.proxy
+
+    # Продолжение по журналу: законченный аккаунт пропускается, остальные идут со следующего повторения
+    first_repeat = 1
+    if journal is not None:
+        finished = journal.last(ACC_NUM, "account")
+        if finished is not None and finished["status"] == "done":
+            print_yellow(f"Аккаунт номер {ACC_NUM} уже обработан, пропуск", account=ACC_NUM, step="resume")
+            account_balances[ACC_NUM] = finished["data"]["balance"]
+            return
+        last_repeat = journal.last(ACC_NUM, "repeat")
+        if last_repeat is not None:
+            first_repeat = int(last_repeat["ref"]) + 1
+            print_yellow(f"Аккаунт номер {ACC_NUM}: продолжение с повторения {first_repeat}/{REPEATS}",
+                         account=ACC_NUM, step="resume")
+
+    print_yellow(f"Запуск аккаунта номер {ACC_NUM}", account=ACC_NUM, step="start")
+
+    stream = None
+    if USE_PRIVATE_STREAM:
+        # Исполнение ордеров приходит событиями, без опроса REST после каждого ордера
+        stream = open_stream(API_KEY, API_SECRET, my_proxies)
+        if stream is None:
+            print_yellow("Не удалось подключить WebSocket, исполнение ордеров будет запрашиваться через REST",
+                         account=ACC_NUM, step="stream")
+
+    # Баланс считается локально по исполнениям и сверяется с биржей раз в RECONCILE_EVERY повторений
+    local = {QUOTE_COIN: 0.0, BASE_COIN: 0.0}
+    counter = {"requests": 0}
+    cycle_requests = []
+    try:
+        if stream is not None:
+            local.update({coin: stream.book.balance(coin) for coin in local})
+        else:
+            reconcile(API_KEY, API_SECRET, my_proxies, local, counter, ACC_NUM)
+
+        need_reconcile = False
+        for i in range(first_repeat, REPEATS + 1):
+            print_yellow(f"Повторение: {i}/{REPEATS}", account=ACC_NUM, step="repeat")
+            counter["requests"] = 0
+            counter["orders"] = []
+            status = "done"
 
-    signature = generate_signature(api_key, api_secret, timestamp, recv_window, params_json, method='POST')
+            try:
+                if need_reconcile or (RECONCILE_EVERY and i > 1 and (i - 1) % RECONCILE_EVERY == 0):
+                    reconcile(API_KEY, API_SECRET, my_proxies, local, counter, ACC_NUM)
+                    need_reconcile = False
 
-    headers = {
-        "X-BAPI-API-KEY": api_key,
-        "X-BAPI-SIGN": signature,
-        "X-BAPI-TIMESTAMP": timestamp,
-        "X-BAPI-RECV-WINDOW": recv_window,
-        "Content-Type": "application/json"
-    }
+                # Продажа сразу берет то, что купила первая нога
+                for side in ("BUY", "SELL"):
+                    if not run_leg(API_KEY, API_SECRET, my_proxies, stream, local, side, counter, ACC_NUM):
+                        need_reconcile = True
+                        break
 
-    url = "https://api.bybit.com/v5/order/create"
-    response = requests.post(url, headers=headers, data=params_json, proxies=proxy)
+            except Exception as e:
+                need_reconcile = True
+                status = "failed"
+                print_red(f"Ошибка: {e}", account=ACC_NUM, step="repeat")
+
+            if journal is not None:
+                journal.record(ACC_NUM, "repeat", status, ref=str(i), orders=counter["orders"])
+            cycle_requests.append(counter["requests"])
+            print(f"Запросов к бирже за повторение: {counter['requests']}")
+
+            if i < REPEATS:
+                delay = random.randint(*pause_range)
+                print(f"Выбрана задержка: {delay} секунд")
+                # Пауза отдается планировщику: поток тем временем работает с другими аккаунтами
+                yield delay
+
+        # В конце обработки каждого аккаунта сверяем баланс с биржей и сохраняем в account_balances
+        try:
+            reconcile(API_KEY, API_SECRET, my_proxies, local, counter, ACC_NUM)
+            account_balances[ACC_NUM] = local[QUOTE_COIN]
+            if journal is not None:
+                journal.record(ACC_NUM, "account", "done", balance=local[QUOTE_COIN])
+        except Exception as e:
+            print_red(f"Не удалось получить итоговый баланс аккаунта {ACC_NUM}: {e}", account=ACC_NUM, step="reconcile")
+    finally:
+        if stream is not None:
+            stream.close()
+
+    if cycle_requests:
+        print_yellow(f"Аккаунт {ACC_NUM}: в среднем {sum(cycle_requests) / len(cycle_requests):.1f} запросов за повторение",
+                     account=ACC_NUM, step="done")
+        if cycle_stats is not None:
+            cycle_stats[ACC_NUM] = cycle_requests
+
+
+def run_account(account, account_balances, cycle_stats, journal=None):
+    """Аккаунт с повторными попытками; паузы между попытками тоже через планировщик."""
+    retry_count = 0
+    while retry_count < MAX_RETRIES:
+        try:
+            yield from process_account(account, PAUSE_RANGE, account_balances, cycle_stats, journal)
+            break
+        except Exception as e:
+            print_red(f"Ошибка: {e}", account=account.id, step="retry")
+            retry_count += 1
+            if retry_count < MAX_RETRIES:
+                print_yellow(f"Попытка {retry_count + 1} из {MAX_RETRIES}")
+                yield DELAY_BETWEEN_RETRIES
+            else:
+                print_red("Достигнуто максимальное количество попыток.")
+
+
+def run_job(account, sink):
+    """
+    Задача очереди (cluster.py): все повторения аккаунта, результат - итоговый баланс и запросы.
+    Сделанные повторения хранятся в задаче (sink.journal), повторная выдача продолжает с прерванного.
+    """
+    account_balances = {}
+    cycle_stats = {}
+    yield from run_account(account, account_balances, cycle_stats, sink.journal)
+    sink.add(account.id, {"balance": account_balances.get(account.id), "requests": cycle_stats.get(account.id)})
+
+
+def main():
+    accounts = selected_accounts('accounts.txt')  # Загрузка учетных данных
+    proxy_pool.prepare(accounts)
+    if accounts:
+        instruments.get_instrument(SYMBOL, accounts[0].proxy)
+    account_balances = {}  # Словарь для хранения балансов
+    cycle_stats = {}  # Запросы к бирже по повторениям каждого аккаунта
 
-    if response.status_code == 200:
-        print_green("Ордер успешно размещен")
-    else:
-        print_red(f"Ошибка при размещении ордера: {response.status_code}")
-        print(response.text)
-
-    return response.text
-
-
-def main(credentials, pause_range, account_balances):
-    API_KEY = credentials['api_key']
-    API_SECRET = credentials['api_secret']
-    PROXY_DATA = credentials['proxy'].split(":")
-    PROXY_IP = PROXY_DATA[0]
-    PROXY_PORT = PROXY_DATA[1]
-    PROXY_LOGIN = PROXY_DATA[2]
-    PROXY_PASSWORD = PROXY_DATA[3]
-    ACC_NUM = credentials['id']
-
-    print_yellow(f"Запуск аккаунта номер {ACC_NUM}")
-    
-    my_proxies = {
-        'http': f"http://{PROXY_LOGIN}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}",
-        'https': f"http://{PROXY_LOGIN}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}"
-    }
-    
-    for i in range(1, REPEATS + 1):
-        print_yellow(f"Повторение: {i}/{REPEATS}")
+    journal = open_journal("volume_spot")  # С --resume аккаунты продолжаются с прерванного повторения
 
-        try:
-            # Получение баланса USDT
-            response_text_usdt = get_coin_balance(API_KEY, API_SECRET, my_proxies, 'USDT')
-            balance_data_usdt = json.loads(response_text_usdt)
-            usdt_balance = 0.0
-            if 'result' in balance_data_usdt and 'balance' in balance_data_usdt['result']:
-                usdt_balance = float(balance_data_usdt['result']['balance']['walletBalance'])
-
-            print(f"Полученный баланс USDT: {usdt_balance}")
-            if usdt_balance > 0:
-                print("Вызов функции place_market_order для USDT...")
-                place_market_order(API_KEY, API_SECRET, "USDCUSDT", "BUY", usdt_balance, my_proxies, 2)  # Количество знаков после запятой для USDT
-
-            # Получение баланса USDC
-            response_text_usdc = get_coin_balance(API_KEY, API_SECRET, my_proxies, 'USDC')
-            balance_data_usdc = json.loads(response_text_usdc)
-            usdc_balance = 0.0
-            if 'result' in balance_data_usdc and 'balance' in balance_data_usdc['result']:
-                usdc_balance = float(balance_data_usdc['result']['balance']['walletBalance'])
-
-            print(f"Полученный баланс USDC: {usdc_balance}")
-            if usdc_balance > 0:
-                print("Вызов функции place_market_order для USDC...")
-                place_market_order(API_KEY, API_SECRET, "USDCUSDT", "SELL", usdc_balance, my_proxies, 2)  # Количество знаков после запятой для USDC
+    # Аккаунты идут параллельно, их паузы между повторениями перекрываются
+    engine.run_accounts(run_account, [(account, account_balances, cycle_stats, journal) for account in accounts])
+    journal.close()
 
-        except Exception as e:
-            print_red(f"Ошибка: {e}")
-
-        delay = random.randint(*PAUSE_RANGE)
-        print(f"Выбрана задержка: {delay} секунд")
-        time.sleep(delay)
-
-    # В конце обработки каждого аккаунта обновляем баланс в account_balances
-    final_balance_usdt = get_coin_balance(API_KEY, API_SECRET, my_proxies, 'USDT')
-    final_balance_data = json.loads(final_balance_usdt)
-    if 'result' in final_balance_data and 'balance' in final_balance_data['result']:
-        account_balances[ACC_NUM] = float(final_balance_data['result']['balance']['walletBalance'])
-
-
-def load_credentials_from_file(filename: str) -> list:
-    credentials = []
-    with open(filename, 'r') as file:
-        for line in file.readlines():
-            parts = line.strip().split(":")
-            if len(parts) >= 6:  # Учет возможности отсутствия поля повторений
-                account_info = {
-                    'id': int(parts[0]),
-                    'api_key': parts[1],
-                    'api_secret': parts[2],
-                    'proxy': ':'.join(parts[3:7])
-                }
-                credentials.append(account_info)
-    return credentials
+    # Вывод баланса USDT каждого аккаунта
+    for account_id, balance in sorted(account_balances.items(), key=lambda item: id_sort_key(item[0])):
+        print_yellow(f"Баланс на аккаунте номер {account_id}: {balance} USDT")
 
+    cycles = [count for counts in cycle_stats.values() for count in counts]
+    if cycles:
+        print_yellow(f"Запросов к бирже за повторение в среднем: {sum(cycles) / len(cycles):.2f}")
 
-if __name__ == "__main__":
-    credentials = load_credentials_from_file('accounts.txt')  # Загрузка учетных данных
-    account_balances = {}  # Словарь для хранения балансов
+    orders.print_stats()
+    orders.close_all()
+    transport.print_stats()
 
-    for cred in credentials:
-        retry_count = 0
-        while retry_count < MAX_RETRIES:
-            try:
-                main(cred, PAUSE_RANGE, account_balances)
-                break
-            except Exception as e:
-                print_red(f"Ошибка: {e}")
-                retry_count += 1
-                if retry_count < MAX_RETRIES:
-                    print_yellow(f"Попытка {retry_count + 1} из {MAX_RETRIES}")
-                    time.sleep(DELAY_BETWEEN_RETRIES)
-                else:
-                    print_red("Достигнуто максимальное количество попыток.")
 
-    # Вывод баланса USDT каждого аккаунта
-    for account_id, balance in account_balances.items():
-        print_yellow(f"Баланс на аккаунте номер {account_id}: {balance} USDT")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
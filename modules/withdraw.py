@@ -1,47 +1,35 @@
-import requests
 import time
 import hmac
 import json
 import hashlib
-import random
-import threading
+import uuid
 import sys
 import os
 
 # Добавление пути к корневой директории проекта в sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK, ACCOUNT_DELAY_RANGE, WITHDRAW_AMOUNT
+from config import API_URL, CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK, WITHDRAW_AMOUNT
+from core import api, transport, clock, engine, proxy_pool, runlog, coins
+from core.accounts import selected_accounts
+from core.journal import open_journal
+from requests.exceptions import RequestException
 
-# ANSI escape codes
-GREEN = "\033[92m"
-RED = "\033[91m"
-YELLOW = "\033[93m"
-ENDC = "\033[0m"
+# Консоль и журнал logs/withdraw_*.jsonl
+log = runlog.get_logger("withdraw")
 
-def print_green(text):
-    print(f"{GREEN}{text}{ENDC}")
+def print_green(text, **fields):
+    log.ok(text, **fields)
 
-def print_red(text):
-    print(f"{RED}{text}{ENDC}")
+def print_red(text, **fields):
+    log.error(text, **fields)
 
-def print_yellow(text):
-    print(f"{YELLOW}{text}{ENDC}")
+def print_yellow(text, **fields):
+    log.warn(text, **fields)
 
-BASE_URL = "https://api.bybit.com/"
-
-def get_server_time(my_proxies) -> int:
-    response = requests.get(BASE_URL + "v3/public/time", proxies=my_proxies)
-    if response.status_code != 200:
-        raise Exception(f"Не удалось получить время сервера: {response.text}")
-
-    content = response.json()
-    if 'retCode' not in content or content['retCode'] != 0 or 'result' not in content or 'timeSecond' not in content['result']:
-        raise Exception(f"Неожиданная структура ответа: {content}")
-
-    return int(content['result']['timeSecond'])
+BASE_URL = API_URL + "/"
 
 def generate_signed_headers(api_key, api_secret, payload, my_proxies, request_type="GET") -> dict:
-    time_stamp = str(get_server_time(my_proxies) * 1000)
+    time_stamp = str(clock.timestamp(my_proxies))
     
     if request_type == "GET":
         param_str = time_stamp + api_key + '10000' + "&".join([f"{key}={value}" for key, value in payload.items()])
@@ -68,7 +56,7 @@ def get_balance(api_key, api_secret, account_type, my_proxies) -> float:
 
     headers = generate_signed_headers(api_key, api_secret, params, my_proxies, request_type="GET")
     
-    response = requests.get(BASE_URL + endpoint, headers=headers, params=params, proxies=my_proxies)
+    response = transport.get(BASE_URL + endpoint, headers=headers, params=params, proxies=my_proxies)
     
     content = response.json()
     
@@ -77,15 +65,16 @@ def get_balance(api_key, api_secret, account_type, my_proxies) -> float:
 
     return float(content['result']['balance']['walletBalance'])
 
-def withdraw_from_bybit(api_key, api_secret, coin, chain, address, amount, my_proxies, tag=None):
+def withdraw_from_bybit(api_key, api_secret, coin, chain, address, amount, my_proxies, tag=None, request_id=None):
     """
-    Вывести активы из аккаунта Bybit.
+    Вывести активы из аккаунта Bybit. request_id - ключ идемпотентности: повтор запроса
+    с тем же request_id не создает второй вывод.
     """
     # Конечная точка
     endpoint = "v5/asset/withdraw/create"
     
     # Текущее время
-    timestamp = int(time.time() * 1000)
+    timestamp = clock.timestamp(my_proxies)
     
     # Данные запроса
     data = {
@@ -101,11 +90,13 @@ def withdraw_from_bybit(api_key, api_secret, coin, chain, address, amount, my_pr
     
     if tag:
         data["tag"] = tag
+    if request_id:
+        data["requestId"] = request_id
     
     # Создать подписанные заголовки
     headers = generate_signed_headers(api_key, api_secret, data, my_proxies, request_type="POST")
     # Отправить запрос
-    response = requests.post(BASE_URL + endpoint, headers=headers, data=json.dumps(data), proxies=my_proxies)
+    response = transport.post(BASE_URL + endpoint, headers=headers, data=json.dumps(data), proxies=my_proxies)
     
     content = response.json()
     
@@ -114,95 +105,166 @@ def withdraw_from_bybit(api_key, api_secret, coin, chain, address, amount, my_pr
 
     return content['result']['id']  # Вернуть идентификатор вывода
 
-def main(credentials, lock: threading.Lock):
-    API_KEY = credentials['api_key']
-    API_SECRET = credentials['api_secret']
-    PROXY_DATA = credentials['proxy'].split(":")
-    PROXY_IP = PROXY_DATA[0]
-    PROXY_PORT = PROXY_DATA[1]
-    PROXY_LOGIN = PROXY_DATA[2]
-    PROXY_PASSWORD = PROXY_DATA[3]
-    ACC_NUM = credentials['id']
-    WITHDRAW_ADDRESS = credentials['withdraw_address']
-    TAG = credentials['tag']
-
-    proxy_data = f"{PROXY_IP}:{PROXY_PORT}:{PROXY_LOGIN}:{PROXY_PASSWORD}"
-
-    my_proxies = {
-        'http': f"http://{PROXY_LOGIN}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}",
-        'https': f"http://{PROXY_LOGIN}:{PROXY_PASSWORD}@{PROXY_IP}:{PROXY_PORT}"
-    }
+# Статусы вывода в истории, при которых средства не ушли со счета
+FAILED_WITHDRAW_STATUSES = ("CancelByUser", "Reject", "Fail")
+
+def get_withdrawals(api_key, api_secret, my_proxies, coin, start_time):
+    """Выводы монеты coin на блокчейн с момента start_time (мс, время биржи)."""
+    content = api.signed_get("/v5/asset/withdraw/query-record", api_key, api_secret, my_proxies,
+                             {"coin": coin, "withdrawType": 0, "startTime": start_time, "limit": 50})
+    if content.get("retCode") != 0:
+        raise Exception(f"Не удалось получить историю выводов: {content.get('retMsg')}")
+    return content["result"]["rows"]
+
+def send_withdraw(account, journal, data):
+    """Отправляет вывод, записанный в журнал как начатый (data - данные записи), и пишет итог."""
+    ACC_NUM = account.id
+    started = time.perf_counter()
+    try:
+        transaction_id = withdraw_from_bybit(account.api_key, account.api_secret, CHOSEN_TOKEN_WITHDRAW, data["chain"],
+                                             data["address"], data["amount"], account.proxy, tag=data.get("tag"),
+                                             request_id=data["requestId"])
+        journal.record(ACC_NUM, "withdraw", "done", ref=str(transaction_id), amount=data["amount"])
+        print_green(f"Вывод на аккаунте номер {ACC_NUM} прошел успешно. Сумма: {data['amount']} {CHOSEN_TOKEN_WITHDRAW}. Идентификатор транзакции: {transaction_id}",
+                    account=ACC_NUM, step="withdraw", latency=time.perf_counter() - started, ret_code=0)
+    except RequestException as e:
+        # Ответа нет - вывод мог пройти, запись "started" остается для проверки
+        print_red(f"Ошибка соединения при выводе на аккаунте номер {ACC_NUM}: {str(e)}",
+                  account=ACC_NUM, step="withdraw", latency=time.perf_counter() - started)
+    except Exception as e:
+        journal.record(ACC_NUM, "withdraw", "failed", ref=data["requestId"], error=str(e))
+        print_red(f"Ошибка вывода на аккаунте номер {ACC_NUM}. Сообщение: {str(e)}",
+                  account=ACC_NUM, step="withdraw", latency=time.perf_counter() - started)
+
+def resume_withdraw(account, journal, entry):
+    """
+    Вывод записан как начатый, но ответ биржи не получен: сначала он ищется в истории выводов
+    (тот же адрес и сеть, не раньше времени отправки). Найден - итог берется из истории, не найден -
+    запрос повторяется с тем же requestId, и биржа не создаст второй вывод, даже если первый
+    еще не появился в истории.
+    """
+    ACC_NUM = account.id
+    data = entry["data"]
+    if not data.get("requestId"):
+        # Запись без requestId (старый журнал): повтор мог бы вывести средства дважды
+        print_red(f"Аккаунт номер {ACC_NUM}: вывод {data.get('amount')} {CHOSEN_TOKEN_WITHDRAW} был отправлен, "
+                  f"но ответ биржи не получен. Проверьте историю выводов, аккаунт пропущен", account=ACC_NUM, step="resume")
+        return
+    try:
+        # Минута запаса на расхождение часов между записью в журнал и временем создания вывода на бирже
+        rows = get_withdrawals(account.api_key, account.api_secret, account.proxy, CHOSEN_TOKEN_WITHDRAW, data["started"] - 60000)
+    except Exception as e:
+        print_red(f"Аккаунт номер {ACC_NUM}: {e}, проверка неподтвержденного вывода отложена", account=ACC_NUM, step="resume")
+        return
+    found = next((row for row in rows if row.get("toAddress") == data["address"] and row.get("chain") == data["chain"]
+                  and (row.get("tag") or None) == data.get("tag")), None)
+    if found is None:
+        print_yellow(f"Вывод на аккаунте номер {ACC_NUM} не найден в истории, повтор с тем же requestId", account=ACC_NUM, step="resume")
+        send_withdraw(account, journal, data)
+    elif found.get("status") in FAILED_WITHDRAW_STATUSES:
+        journal.record(ACC_NUM, "withdraw", "failed", ref=found.get("withdrawId"), error=found.get("status"))
+        print_red(f"Вывод {found.get('withdrawId')} на аккаунте номер {ACC_NUM} не прошел: {found.get('status')}",
+                  account=ACC_NUM, step="resume")
+    else:
+        journal.record(ACC_NUM, "withdraw", "done", ref=found.get("withdrawId"), amount=data["amount"])
+        print_green(f"Вывод {found.get('withdrawId')} на аккаунте номер {ACC_NUM} уже создан биржей (статус {found.get('status')})",
+                    account=ACC_NUM, step="resume")
+
+def process_account(account, journal):
+    API_KEY = account.api_key
+    API_SECRET = account.api_secret
+    ACC_NUM = account.id
+    WITHDRAW_ADDRESS = account.withdraw_address
+    TAG = account.withdraw_tag
+
+    entry = journal.last(ACC_NUM, "withdraw")
+    if entry is not None and entry["status"] == "done":
+        log.info(f"Аккаунт номер {ACC_NUM}: вывод уже выполнен ({entry['ref']}), пропуск", account=ACC_NUM, step="resume")
+        return
+    if entry is not None and entry["status"] == "started":
+        resume_withdraw(account, journal, entry)
+        return
 
-    with lock:
-        print(f"Работаю с номером аккаунта {ACC_NUM}")
+    proxy_data = f"{account.proxy_ip}:{account.proxy_port}:{account.proxy_login}:{account.proxy_password}"
+    my_proxies = account.proxy
 
-    with lock:
-        print(f"Подключение через прокси: {proxy_data}")
+    log.info(f"Работаю с номером аккаунта {ACC_NUM}", account=ACC_NUM, step="start")
+    # Только в консоль: данные прокси с паролем в журнал не пишутся
+    log.info(f"Подключение через прокси: {proxy_data}", file=False)
 
     try:
         token_balance = get_balance(API_KEY, API_SECRET, "FUND", my_proxies)  # Получить баланс из FUND
     except Exception as e:
-        with lock:
-            print_red(f"Ошибка получения баланса на аккаунте номер {ACC_NUM}: {str(e)}")
+        print_red(f"Ошибка получения баланса на аккаунте номер {ACC_NUM}: {str(e)}", account=ACC_NUM, step="balance")
         return
 
-    # Проверка, задан ли фиксированный объем вывода
-    if WITHDRAW_AMOUNT is None:
-        withdraw_amount = token_balance - 0.0001  # оставляем небольшой остаток для избежания ошибок точности
+    chain = coins.get_chain(CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK, account)
+    if chain is not None:
+        # Сумма обрезается вниз до точности сети из справочника, запас на ошибки округления не нужен
+        withdraw_amount = chain.quantize(token_balance if WITHDRAW_AMOUNT is None else min(WITHDRAW_AMOUNT, token_balance))
     else:
-        withdraw_amount = min(WITHDRAW_AMOUNT, token_balance - 0.0001)  # не выводим больше, чем есть на балансе
+        # Проверка, задан ли фиксированный объем вывода
+        if WITHDRAW_AMOUNT is None:
+            withdraw_amount = token_balance - 0.0001  # оставляем небольшой остаток для избежания ошибок точности
+        else:
+            withdraw_amount = min(WITHDRAW_AMOUNT, token_balance - 0.0001)  # не выводим больше, чем есть на балансе
 
-    withdraw_amount = round(withdraw_amount, 4)  # Округление до 4 знаков после запятой
+        withdraw_amount = round(withdraw_amount, 4)  # Округление до 4 знаков после запятой
 
-    with lock:
-        print_yellow(f"Текущий баланс {CHOSEN_TOKEN_WITHDRAW} на аккаунте номер {ACC_NUM} в FUND: {token_balance:.8f}")
-        print_yellow(f"Сумма для вывода: {withdraw_amount:.8f} {CHOSEN_TOKEN_WITHDRAW}")
+    print_yellow(f"Текущий баланс {CHOSEN_TOKEN_WITHDRAW} на аккаунте номер {ACC_NUM} в FUND: {token_balance:.8f}",
+                 account=ACC_NUM, step="balance")
+    print_yellow(f"Сумма для вывода: {withdraw_amount:.8f} {CHOSEN_TOKEN_WITHDRAW}", account=ACC_NUM, step="balance")
+
+    if chain is not None and 0 < withdraw_amount < chain.withdraw_min:
+        print_yellow(f"Сумма меньше минимума вывода {chain.withdraw_min} {CHOSEN_TOKEN_WITHDRAW} в сети {chain.chain}, "
+                     f"аккаунт номер {ACC_NUM} пропущен", account=ACC_NUM, step="balance")
+        return
 
     if withdraw_amount > 0:
-        try:
-            # Попытка вывода
-            transaction_id = withdraw_from_bybit(API_KEY, API_SECRET, CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK, WITHDRAW_ADDRESS, withdraw_amount, my_proxies, tag=TAG)
-            with lock:
-                print_green(f"Вывод на аккаунте номер {ACC_NUM} прошел успешно. Сумма: {withdraw_amount:.8f} {CHOSEN_TOKEN_WITHDRAW}. Идентификатор транзакции: {transaction_id}")
-        except Exception as e:
-            with lock:
-                print_red(f"Ошибка вывода на аккаунте номер {ACC_NUM}. Сообщение: {str(e)}")
-
-def load_credentials_from_file(filename: str) -> list:
-    credentials = []
-    with open(filename, 'r') as file:
-        for index, line in enumerate(file.readlines()):
-            parts = line.strip().split(":")
-            if len(parts) < 8:  # Минимум 8 частей, без тега
-                print_red(f"Ошибка в строке {index + 1}: недостаточно данных!")
-                continue
-            account_info = {
-                'id': int(parts[0]),
-                'api_key': parts[1],
-                'api_secret': parts[2],
-                'proxy': ':'.join(parts[3:7]),  # Прокси состоит из 4 частей
-                'withdraw_address': parts[7],  # Адрес вывода
-                'tag': parts[8] if len(parts) > 8 else None  # Тег, если он указан
-            }
-            credentials.append(account_info)
-    return credentials
+        # Сначала запись в журнал (с requestId и временем биржи), потом запрос: после падения вывод
+        # находится в истории выводов или безопасно повторяется с тем же requestId
+        data = {"requestId": uuid.uuid4().hex, "amount": str(withdraw_amount), "address": WITHDRAW_ADDRESS,
+                "chain": DESIRED_NETWORK, "tag": TAG, "started": clock.timestamp(my_proxies)}
+        journal.record(ACC_NUM, "withdraw", "started", ref=data["requestId"], **data)
+        send_withdraw(account, journal, data)
 
-if __name__ == '__main__':
+def run_job(account, sink):
+    """Задача очереди (cluster.py): шаги вывода хранятся в задаче (sink.journal), результат - итог из них."""
+    if not account.withdraw_address:
+        raise Exception(f"Аккаунт номер {account.id}: не указан адрес для вывода!")
+    error = coins.check(CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK, "withdraw", account)
+    if error:
+        raise Exception(error)
+    journal = sink.journal
+    process_account(account, journal)
+    sink.add(account.id, journal.last(account.id, "withdraw") or {})
+
+def main():
     filename = "accounts.txt"
-    credentials = load_credentials_from_file(filename)
+    accounts = []
+    for account in selected_accounts(filename):
+        if account.withdraw_address:
+            accounts.append(account)
+        else:
+            print_red(f"Аккаунт номер {account.id}: не указан адрес для вывода!")
 
-    lock = threading.Lock()
-    threads = []
+    # Монета и сеть проверяются по справочнику до запросов аккаунтов: при опечатке вывод не начинается
+    error = coins.check(CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK, "withdraw", accounts[0] if accounts else None)
+    if error:
+        print_red(f"{error}. Вывод не запущен")
+        return
+    chain = coins.get_chain(CHOSEN_TOKEN_WITHDRAW, DESIRED_NETWORK)
+    if chain is not None:
+        print_yellow(f"Вывод {CHOSEN_TOKEN_WITHDRAW} в сети {chain.chain}: комиссия {chain.withdraw_fee}, "
+                     f"минимум {chain.withdraw_min}, точность {chain.precision} знаков")
+
+    proxy_pool.prepare(accounts)
 
-    for cred in credentials:
-        t = threading.Thread(target=main, args=(cred, lock))
-        threads.append(t)
-        t.start()
+    journal = open_journal("withdraw")  # С --resume сделанные выводы пропускаются
+    engine.run_accounts(process_account, [(account, journal) for account in accounts])
+    journal.close()
 
-        # Задержка перед запуском следующего потока
-        delay = random.randint(*ACCOUNT_DELAY_RANGE)
-        print(f"Задержка перед следующим аккаунтом: {delay} секунд")
-        time.sleep(delay)
+    transport.print_stats()
 
-    for t in threads:
-        t.join()
+if __name__ == '__main__':
+    main()
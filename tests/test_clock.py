@@ -0,0 +1,54 @@
+import pytest
+
+from config import CLOCK_SYNC_SAMPLES
+from core import api, clock
+from tools.mock_bybit import start_server
+
+SKEW_MS = 60_000
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = start_server(clock_skew_ms=SKEW_MS)
+    base = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(clock, "TIME_URL", base + "/v5/market/time")
+    monkeypatch.setattr(api, "API_URL", base)
+    monkeypatch.setattr(clock, "_shared", None)
+    monkeypatch.setattr(clock, "_offsets", {})
+    monkeypatch.setattr(clock, "_skewed", set())
+    yield server
+    server.shutdown()
+
+
+def time_requests(server):
+    return server.RequestHandlerClass.state.requests.get("/v5/market/time", 0)
+
+
+def test_offset_is_measured_once_and_shared(server):
+    offset = clock.get_offset(None)
+    assert abs(offset - SKEW_MS) < 1000
+    assert time_requests(server) == CLOCK_SYNC_SAMPLES
+
+    assert clock.get_offset({"http": "http://other", "https": "http://other"}) == offset
+    assert time_requests(server) == CLOCK_SYNC_SAMPLES
+
+
+def test_probe_keeps_fastest_sample(server, monkeypatch):
+    samples = iter([(50.0, 100.0), (5.0, 200.0), (20.0, 300.0)])
+    monkeypatch.setattr(clock, "_measure", lambda proxies, failover=True: next(samples))
+    for _ in range(3):
+        clock.sync(None, samples=1)
+    assert clock.get_offset(None) == 200.0
+
+
+def test_timestamp_error_resyncs_and_retries(server, monkeypatch):
+    # Устаревшее общее смещение: подпись без поправки уходит за recv_window
+    clock.get_offset(None)
+    rtt, offset, synced_at = clock._shared
+    monkeypatch.setattr(clock, "_shared", (rtt, 0.0, synced_at))
+
+    data = api.signed_get("/v5/account/wallet-balance", "benchkey1", "benchsecret1", None, {"accountType": "UNIFIED"})
+    assert data["retCode"] == 0
+    assert None in clock._skewed
+    assert abs(clock.get_offset(None) - SKEW_MS) < 1000
+    assert server.RequestHandlerClass.state.requests["/v5/account/wallet-balance"] == 2
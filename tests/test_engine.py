@@ -0,0 +1,57 @@
+import threading
+import time
+
+from core import engine
+
+
+def test_async_keeps_result_order():
+    def account(index):
+        yield 0.01 * (5 - index)
+        return index * 10
+
+    assert engine.run_async(account, [(index,) for index in range(5)], concurrency=5, workers=2,
+                            delay_range=(0, 0)) == [0, 10, 20, 30, 40]
+
+
+def test_async_pauses_do_not_hold_threads():
+    def account():
+        yield 0.2
+        return threading.current_thread().name
+
+    started = time.monotonic()
+    engine.run_async(account, [() for _ in range(20)], concurrency=20, workers=1, delay_range=(0, 0))
+    # 20 пауз по 0.2 с на одном потоке идут одновременно
+    assert time.monotonic() - started < 1.0
+
+
+def test_async_caps_accounts_in_flight():
+    lock = threading.Lock()
+    state = {"now": 0, "peak": 0}
+
+    def account():
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        yield 0.02
+        with lock:
+            state["now"] -= 1
+
+    pulled = []
+
+    def args_list():
+        for index in range(30):
+            pulled.append(index)
+            yield ()
+
+    engine.run_async(account, args_list(), concurrency=4, workers=8, delay_range=(0, 0))
+    assert state["peak"] <= 4
+    assert len(pulled) == 30
+
+
+def test_async_error_does_not_stop_other_accounts():
+    def account(index):
+        if index == 1:
+            raise ValueError("boom")
+        return index
+
+    assert engine.run_async(account, [(0,), (1,), (2,)], concurrency=2, workers=2, delay_range=(0, 0)) == [0, None, 2]
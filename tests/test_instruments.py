@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import pytest
+
+from config import DECIMAL_PLACES
+from core import instruments
+from core.instruments import Instrument
+
+ROW = {"symbol": "BTCUSDT", "baseCoin": "BTC", "quoteCoin": "USDT",
+       "lotSizeFilter": {"basePrecision": "0.000001", "quotePrecision": "0.00000001",
+                         "minOrderQty": "0.000048", "minOrderAmt": "1"}}
+
+
+@pytest.fixture
+def btc():
+    return Instrument.from_api(ROW)
+
+
+def test_quantize_rounds_down_to_side_step(btc):
+    assert btc.quantize("SELL", 0.1234567) == Decimal("0.123456")
+    assert btc.quantize("BUY", 10.123456789) == Decimal("10.12345678")
+    # Двоичный хвост float не дает лишнего шага: 0.1 + 0.2 = 0.30000000000000004
+    assert btc.quantize("SELL", 0.1 + 0.2) == Decimal("0.300000")
+
+
+def test_format_has_no_exponent_or_trailing_zeros(btc):
+    assert btc.format("SELL", 0.00005) == "0.00005"
+    assert btc.format("SELL", 2.0) == "2"
+    assert btc.format("BUY", 1e-7) == "0.0000001"
+
+
+def test_is_tradable_checks_side_minimum(btc):
+    assert btc.is_tradable("SELL", 0.000048)
+    assert not btc.is_tradable("SELL", 0.0000479)
+    assert btc.is_tradable("BUY", 1)
+    assert not btc.is_tradable("BUY", 0.99999999)
+
+
+def test_fallback_uses_decimal_places():
+    instrument = Instrument.fallback("XYZUSDT")
+    assert instrument.step("SELL") == Decimal(1).scaleb(-DECIMAL_PLACES)
+    assert instrument.is_tradable("SELL", 1)
+
+
+def test_get_instrument_fetches_once_and_caches_on_disk(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(instruments, "CACHE_FILE", str(tmp_path / "instruments.json"))
+    monkeypatch.setattr(instruments, "_instruments", {})
+    monkeypatch.setattr(instruments, "_disk", None)
+    monkeypatch.setattr(instruments, "_fetch", lambda symbol, proxy: calls.append(symbol) or ROW)
+
+    assert instruments.get_instrument("BTCUSDT").min_order_qty == Decimal("0.000048")
+    instruments.get_instrument("BTCUSDT")
+    assert calls == ["BTCUSDT"]
+
+    # Новый процесс: память пуста, параметры берутся с диска
+    monkeypatch.setattr(instruments, "_instruments", {})
+    monkeypatch.setattr(instruments, "_disk", None)
+    assert instruments.get_instrument("BTCUSDT").base_precision == Decimal("0.000001")
+    assert calls == ["BTCUSDT"]
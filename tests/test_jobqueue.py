@@ -0,0 +1,88 @@
+import pytest
+
+from core.jobqueue import SqliteJobQueue
+from core.worker import JobJournal
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.db"))
+    yield queue
+    queue.close()
+
+
+def expire_leases(jobs):
+    jobs._db.execute("UPDATE jobs SET lease_until = 0 WHERE status = 'leased'")
+
+
+def test_leased_job_is_not_given_twice(jobs):
+    jobs.publish("withdraw", [1, 2])
+
+    first = jobs.lease("a", 10)
+    assert [(job.module, job.account, job.attempts) for job in first] == [("withdraw", 1, 1), ("withdraw", 2, 1)]
+    assert jobs.lease("b", 10) == []
+
+
+def test_expired_lease_goes_to_other_worker_with_steps(jobs):
+    jobs.publish("withdraw", [1])
+    job, = jobs.lease("a", 10)
+    assert job.steps == {}
+    journal = JobJournal(jobs, "a", job)
+    journal.record(1, "withdraw", "started", ref="req1", amount="15")
+
+    expire_leases(jobs)
+    released, = jobs.lease("b", 10)
+    assert released.id == job.id
+    assert released.attempts == 2
+    assert released.steps == {"withdraw": {"status": "started", "ref": "req1", "data": {"amount": "15"}}}
+    assert JobJournal(jobs, "b", released).last(1, "withdraw")["ref"] == "req1"
+
+
+def test_stale_worker_cannot_write_steps_or_ack(jobs):
+    jobs.publish("transfer", [1])
+    job, = jobs.lease("a", 10)
+    expire_leases(jobs)
+    released, = jobs.lease("b", 10)
+
+    with pytest.raises(Exception):
+        JobJournal(jobs, "a", job).record(1, "transfer", "started", ref="t1")
+    assert not jobs.ack("a", job.id, {})
+    assert jobs.ack("b", released.id, {"status": "done"})
+    assert list(jobs.results("transfer")) == [(1, {"status": "done"})]
+
+
+def test_lease_expiry_after_last_attempt_fails_job(jobs):
+    jobs.publish("balance", [1], max_attempts=1)
+    jobs.lease("a", 10)
+    expire_leases(jobs)
+
+    assert jobs.lease("b", 10) == []
+    assert jobs.stats()["statuses"] == {"failed": 1}
+
+
+def test_failed_job_returns_to_queue(jobs):
+    jobs.publish("balance", [1], max_attempts=2)
+    job, = jobs.lease("a", 10)
+    jobs.fail("a", job.id, "timeout")
+
+    retry, = jobs.lease("b", 10)
+    assert retry.attempts == 2
+    jobs.fail("b", retry.id, "timeout")
+    assert jobs.stats()["statuses"] == {"failed": 1}
+
+
+def test_restrict_accounts_limits_lease(jobs):
+    jobs.publish("balance", [1, 2, 3])
+    jobs.restrict_accounts([2])
+
+    assert [job.account for job in jobs.lease("a", 10)] == [2]
+
+
+def test_string_ids_keep_their_type_and_order(jobs):
+    jobs.publish("balance", ["main", 2, "1e3", 10])
+    leased = jobs.lease("a", 10)
+    assert [job.account for job in leased] == ["main", 2, "1e3", 10]
+    for job in leased:
+        jobs.ack("a", job.id, {"id": job.account})
+
+    assert [account for account, result in jobs.results("balance")] == [2, 10, "1e3", "main"]
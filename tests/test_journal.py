@@ -0,0 +1,56 @@
+from core.journal import Journal
+
+
+def test_resume_continues_unfinished_run(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = Journal("transfer", path=path)
+    journal.record(1, "transfer", "started", ref="t1", amount="5")
+    run_id = journal.run_id
+
+    resumed = Journal("transfer", resume=True, path=path)
+    assert resumed.resumed
+    assert resumed.run_id == run_id
+    assert resumed.last(1, "transfer") == {"status": "started", "ref": "t1", "data": {"amount": "5"}}
+
+
+def test_resume_after_finished_run_starts_new(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = Journal("transfer", path=path)
+    journal.record(1, "transfer", "done", ref="t1")
+    journal.close()
+
+    resumed = Journal("transfer", resume=True, path=path)
+    assert not resumed.resumed
+    assert resumed.run_id != journal.run_id
+    assert resumed.last(1, "transfer") is None
+
+
+def test_resume_is_per_module(tmp_path):
+    path = str(tmp_path / "journal.db")
+    Journal("withdraw", path=path).record(1, "withdraw", "started", ref="r1")
+
+    assert not Journal("transfer", resume=True, path=path).resumed
+    assert Journal("withdraw", resume=True, path=path).resumed
+
+
+def test_last_and_entries_return_latest_status(tmp_path):
+    journal = Journal("transfer", path=str(tmp_path / "journal.db"))
+    journal.record(1, "transfer BTC", "started", ref="t1")
+    journal.record(1, "transfer BTC", "done", ref="t1", amount="0.5")
+    journal.record(1, "transfer ETH", "failed", ref="t2")
+    journal.record(2, "transfer BTC", "started", ref="t3")
+
+    assert journal.is_done(1, "transfer BTC")
+    assert not journal.is_done(2, "transfer BTC")
+    entries = journal.entries(1, "transfer ")
+    assert {step: entry["status"] for step, entry in entries.items()} == {"transfer BTC": "done", "transfer ETH": "failed"}
+
+
+def test_string_and_numeric_ids_are_kept_apart(tmp_path):
+    journal = Journal("transfer", path=str(tmp_path / "journal.db"))
+    journal.record(1, "transfer", "done", ref="t1")
+    journal.record("1e3", "transfer", "started", ref="t2")
+
+    assert journal.last("1e3", "transfer")["ref"] == "t2"
+    assert journal.last(1000, "transfer") is None
+    assert journal.last("1", "transfer") is None
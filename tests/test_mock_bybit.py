@@ -0,0 +1,42 @@
+import time
+
+import pytest
+import requests
+
+from core import api
+from tools.mock_bybit import start_server
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = start_server()
+    yield server
+    server.shutdown()
+
+
+def signed(api_key, api_secret, payload):
+    timestamp = str(int(time.time() * 1000))
+    return {"X-BAPI-API-KEY": api_key, "X-BAPI-SIGN": api.sign(api_key, api_secret, timestamp, payload),
+            "X-BAPI-TIMESTAMP": timestamp, "X-BAPI-RECV-WINDOW": api.RECV_WINDOW, "Content-Type": "application/json"}
+
+
+def test_signed_get_is_accepted(server):
+    url = f"http://127.0.0.1:{server.server_port}/v5/account/wallet-balance?accountType=UNIFIED"
+    data = requests.get(url, headers=signed("benchkey1", "benchsecret1", "accountType=UNIFIED")).json()
+    assert data["retCode"] == 0
+
+
+def test_wrong_secret_is_rejected(server):
+    url = f"http://127.0.0.1:{server.server_port}/v5/account/wallet-balance?accountType=UNIFIED"
+    data = requests.get(url, headers=signed("benchkey1", "benchsecret2", "accountType=UNIFIED")).json()
+    assert data["retCode"] == 10004
+
+
+def test_post_signature_covers_body(server):
+    url = f"http://127.0.0.1:{server.server_port}/asset/v3/private/transfer/inter-transfer"
+    body = '{"transferId":"t1","coin":"USDT","amount":"1","fromAccountType":"UNIFIED","toAccountType":"FUND"}'
+    headers = signed("benchkey1", "benchsecret1", body)
+    tampered = body.replace('"amount":"1"', '"amount":"100"')
+
+    assert requests.post(url, headers=headers, data=tampered).json()["retCode"] == 10004
+    assert requests.post(url, headers=headers, data=body).json()["retCode"] == 0
@@ -0,0 +1,38 @@
+import json
+import os
+
+import pytest
+
+from core.results import ResultSink
+
+
+@pytest.fixture
+def sink(tmp_path):
+    return ResultSink(str(tmp_path / "balances.txt"))
+
+
+def test_records_in_id_order_with_missing_keys(sink):
+    sink.add("main", {"value": 3})
+    sink.add(10, {"value": 2})
+    sink.add(2, {"value": 1})
+
+    assert len(sink) == 3 and 10 in sink
+    assert list(sink.records()) == [(2, {"key": 2, "value": 1}), (10, {"key": 10, "value": 2}),
+                                    ("main", {"key": "main", "value": 3})]
+    assert list(sink.records([10, 5])) == [(10, {"key": 10, "value": 2}), (5, None)]
+
+
+def test_later_result_replaces_earlier(sink):
+    sink.add(1, {"error": "timeout"})
+    sink.add(1, {"value": 5})
+    assert list(sink.records()) == [(1, {"key": 1, "value": 5})]
+
+
+def test_partial_file_keeps_results_until_finish(sink):
+    sink.add(1, {"value": 5})
+    sink.close()
+    with open(sink.stream_path) as file:
+        assert [json.loads(line) for line in file] == [{"key": 1, "value": 5}]
+
+    sink.finish()
+    assert not os.path.exists(sink.stream_path)
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from core.scheduler import Scheduler, drive
+
+
+def test_jobs_run_in_time_order():
+    scheduler = Scheduler(workers=1)
+    order = []
+    start = time.monotonic()
+    for name, offset in (("c", 0.06), ("a", 0.0), ("b", 0.03)):
+        scheduler.call_at(start + offset, order.append, name)
+    scheduler.run()
+    assert order == ["a", "b", "c"]
+
+
+def test_equal_times_keep_submission_order():
+    scheduler = Scheduler(workers=1)
+    order = []
+    start = time.monotonic()
+    for index in range(20):
+        scheduler.call_at(start, order.append, index)
+    scheduler.run()
+    assert order == list(range(20))
+
+
+def test_paused_generator_does_not_hold_worker():
+    scheduler = Scheduler(workers=1)
+    events = []
+
+    def slow():
+        events.append("slow start")
+        yield 0.1
+        events.append("slow end")
+        return "slow"
+
+    def fast():
+        events.append("fast")
+        return "fast"
+
+    start = time.monotonic()
+    slow_job = scheduler.call_at(start, slow)
+    fast_job = scheduler.call_at(start + 0.01, fast)
+    scheduler.run()
+    assert events == ["slow start", "fast", "slow end"]
+    assert (slow_job.result, fast_job.result) == ("slow", "fast")
+
+
+def test_error_is_kept_on_job():
+    scheduler = Scheduler(workers=2)
+
+    def broken():
+        raise ValueError("boom")
+
+    job = scheduler.call_later(0, broken)
+    scheduler.run()
+    assert job.done.is_set()
+    assert isinstance(job.error, ValueError)
+
+
+def test_run_waits_for_all_jobs():
+    scheduler = Scheduler(workers=4)
+    counter = []
+    lock = threading.Lock()
+
+    def step(index):
+        for _ in range(3):
+            yield 0.001
+        with lock:
+            counter.append(index)
+
+    for index in range(50):
+        scheduler.call_later(0, step, index)
+    scheduler.run()
+    assert sorted(counter) == list(range(50))
+
+
+def test_drive_runs_generator_inline():
+    def steps():
+        yield 0
+        yield 0
+        return 42
+
+    assert drive(steps()) == 42
+    assert drive(7) == 7
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from core import shard
+from core.accounts import Account
+from core.results import ResultSink
+
+
+@pytest.fixture
+def sink(tmp_path):
+    return ResultSink(str(tmp_path / "balances.txt"))
+
+
+def record_pid(account, sink):
+    sink.add(account.id, {"pid": os.getpid()})
+
+
+def test_shards_merge_into_parent_sink(sink, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Прокси на закрытом порту: проверка прокси в воркерах сразу получает отказ в соединении
+    accounts = [Account(index, f"key{index}", f"secret{index}", "127.0.0.1", "9", "user", "pass")
+                for index in range(1, 8)]
+    shard.run_accounts(record_pid, accounts, sink, processes=2)
+
+    records = dict(sink.records())
+    assert sorted(records) == list(range(1, 8))
+    assert len({record["pid"] for record in records.values()}) == 2
+    assert os.getpid() not in {record["pid"] for record in records.values()}
+    assert shard.get_stats()["processes"] == 2
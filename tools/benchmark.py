@@ -0,0 +1,138 @@
+"""
+Замер пропускной способности модулей на локальной заглушке Bybit (tools/mock_bybit.py).
+
+Пример: python tools/benchmark.py --accounts 200 --latency-ms 30 --modules balance,swap
+
+Каждый модуль запускается в отдельном процессе с синтетическим accounts.txt, чтобы
+прогретые соединения и кэши одного модуля не влияли на замер другого.
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+MODULES = ["balance", "transfer", "swap", "leverage_swap", "volume_spot", "withdraw", "get_address", "upgrade_to_uta"]
+
+# Адрес, который заглушка обслуживает как прокси; DNS для него не нужен
+MOCK_API_URL = "http://bybit.mock"
+
+
+def write_accounts(path, count, proxy_port):
+    with open(path, "w") as file:
+        for index in range(1, count + 1):
+            # У каждого аккаунта свой логин прокси - отдельная сессия и свой лимит IP, как в реальном запуске
+            file.write(f"{index}:benchkey{index}:benchsecret{index}:127.0.0.1:{proxy_port}:bench{index}:pass:0xbench{index:036d}\n")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run_module(module_name, accounts, proxy_port, engine, order_transport, pause=0, warmup_enabled=True, processes=1):
+    """Выполняется в дочернем процессе: запускает main() модуля и печатает JSON с замерами."""
+    import config
+    config.API_URL = MOCK_API_URL
+    config.ACCOUNT_DELAY_RANGE = (0, 0)
+    config.PAUSE_RANGE = (pause, pause)
+    config.DELAY_BETWEEN_RETRIES = 0
+    config.ENGINE = engine
+    config.ORDER_TRANSPORT = order_transport
+    config.WS_URL = MOCK_API_URL.replace("http://", "ws://")
+    config.WARMUP = warmup_enabled
+    config.PROCESSES = processes
+
+    from core import transport, orders, warmup, shard
+
+    latencies = []
+    transport.add_response_hook(lambda response, proxies: latencies.append(response.elapsed.total_seconds()))
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_{module_name}_")
+    write_accounts(os.path.join(workdir, "accounts.txt"), accounts, proxy_port)
+    os.chdir(workdir)
+
+    real_stdout = sys.stdout
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        module = importlib.import_module(f"modules.{module_name}")
+        started = time.perf_counter()
+        module.main()
+        elapsed = time.perf_counter() - started
+        stats = transport.get_stats()
+        order_stats = orders.get_stats().get(order_transport)
+        warmup_stats = warmup.get_stats()
+        # Запросы воркеров при PROCESSES > 1 идут мимо хука задержек родителя
+        stats["handshakes"] += shard.get_stats().get("handshakes", 0)
+
+    real_stdout.write(json.dumps({
+        "elapsed": elapsed,
+        "order_p50": order_stats["p50"] if order_stats else None,
+        "warmup": warmup_stats.get("elapsed"),
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "handshakes": stats["handshakes"],
+    }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк модулей на локальной заглушке Bybit")
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--modules", default=",".join(MODULES))
+    parser.add_argument("--engine", default="scheduler", choices=["scheduler", "threads", "async"])
+    parser.add_argument("--pause", type=int, default=0, help="PAUSE_RANGE в секундах для volume_spot")
+    parser.add_argument("--no-warmup", action="store_true", help="не прогревать соединения перед ордерами")
+    parser.add_argument("--order-transport", default="rest", choices=["rest", "ws"])
+    parser.add_argument("--processes", type=int, default=1, help="PROCESSES для balance и get_address")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--run-module", help=argparse.SUPPRESS)
+    parser.add_argument("--proxy-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_module:
+        return run_module(args.run_module, args.accounts, args.proxy_port, args.engine, args.order_transport, args.pause,
+                          not args.no_warmup, args.processes)
+
+    from tools.mock_bybit import start_server
+    server = start_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, rate_limit=args.rate_limit)
+
+    print(f"{'Модуль':<16}{'акк/с':>10}{'запр/акк':>10}{'p50, мс':>10}{'p99, мс':>10}{'соединений':>12}{'ордер p50':>11}{'прогрев, с':>12}")
+    for module_name in args.modules.split(","):
+        # Каждый модуль начинает с исходными балансами
+        server.state.reset()
+        requests_before = sum(server.state.requests.values())
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-module", module_name,
+             "--accounts", str(args.accounts), "--proxy-port", str(server.server_port), "--engine", args.engine,
+             "--order-transport", args.order_transport, "--pause", str(args.pause), "--processes", str(args.processes)]
+            + (["--no-warmup"] if args.no_warmup else []),
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        if result.returncode != 0 or not result.stdout.strip():
+            print(f"{module_name:<16}ошибка: {result.stderr.strip().splitlines()[-1:] or result.returncode}")
+            continue
+
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        requests_made = sum(server.state.requests.values()) - requests_before
+        print(f"{module_name:<16}{args.accounts / report['elapsed']:>10.1f}{requests_made / args.accounts:>10.2f}"
+              f"{report['p50'] * 1000:>10.1f}{report['p99'] * 1000:>10.1f}{report['handshakes']:>12}"
+              f"{report['order_p50'] * 1000 if report['order_p50'] is not None else 0:>11.1f}"
+              f"{report['warmup'] if report['warmup'] is not None else 0:>12.2f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,767 @@
+"""
+Локальная заглушка Bybit v5 API для замеров производительности без реальной биржи.
+
+Сервер одновременно работает как HTTP-прокси: модули ходят на API_URL через прокси
+из accounts.txt, поэтому достаточно указать в прокси адрес заглушки, а в API_URL
+любой http:// адрес (например http://bybit.mock). Приватный WebSocket /v5/private
+обслуживается там же (WS_URL = ws://bybit.mock): auth, subscribe, ping и события
+order, execution и wallet после каждого ордера. Торговый WebSocket /v5/trade
+принимает order.create и order.cancel.
+
+Подпись проверяется как на бирже: X-BAPI-SIGN - HMAC-SHA256 строки timestamp + ключ +
+recv_window + строка запроса (GET) или тело (POST), auth в WebSocket - "GET/realtime" + expires.
+Секрет ключа берется из secrets или по правилу tools/benchmark.py: benchkeyN -> benchsecretN.
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+DEFAULT_BALANCES = {"USDT": 1000.0, "USDC": 1000.0, "ETH": 1.0, "VELAR": 1000.0}
+
+COINS = [
+    {"coin": "USDT", "name": "USDT", "remainAmount": "1000000", "chains": [
+        {"chain": "BSC", "chainType": "BSC (BEP20)", "withdrawFee": "0.3", "withdrawMin": "10",
+         "minAccuracy": "4", "chainDeposit": "1", "chainWithdraw": "1", "depositMin": "0"},
+        {"chain": "TRX", "chainType": "TRC20", "withdrawFee": "1", "withdrawMin": "10",
+         "minAccuracy": "4", "chainDeposit": "1", "chainWithdraw": "1", "depositMin": "0"},
+    ]},
+    {"coin": "ETH", "name": "ETH", "remainAmount": "1000", "chains": [
+        {"chain": "ARBI", "chainType": "Arbitrum One", "withdrawFee": "0.0001", "withdrawMin": "0.001",
+         "minAccuracy": "8", "chainDeposit": "1", "chainWithdraw": "1", "depositMin": "0"},
+        {"chain": "ETH", "chainType": "ERC20", "withdrawFee": "0.001", "withdrawMin": "0.002",
+         "minAccuracy": "8", "chainDeposit": "1", "chainWithdraw": "1", "depositMin": "0"},
+    ]},
+    {"coin": "USDC", "name": "USDC", "remainAmount": "1000000", "chains": [
+        {"chain": "ARBI", "chainType": "Arbitrum One", "withdrawFee": "0.1", "withdrawMin": "1",
+         "minAccuracy": "6", "chainDeposit": "1", "chainWithdraw": "1", "depositMin": "0"},
+        {"chain": "SOL", "chainType": "SOL", "withdrawFee": "1", "withdrawMin": "2",
+         "minAccuracy": "6", "chainDeposit": "1", "chainWithdraw": "0", "depositMin": "0"},
+    ]},
+    {"coin": "VELAR", "name": "VELAR", "remainAmount": "1000000", "chains": [
+        {"chain": "STX", "chainType": "Stacks", "withdrawFee": "10", "withdrawMin": "50",
+         "minAccuracy": "2", "chainDeposit": "1", "chainWithdraw": "1", "depositMin": "0"},
+    ]},
+]
+
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _ws_frame(opcode, payload):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack(">H", length)
+    else:
+        header += bytes([127]) + struct.pack(">Q", length)
+    return header + payload
+
+
+def _ws_read_frame(rfile):
+    """Читает один кадр клиента. Возвращает (opcode, payload) или (None, None), если сокет закрыт."""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, None
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b""
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return head[0] & 0x0F, payload
+
+
+class MockStream:
+    """Одно WebSocket-соединение клиента с заглушкой."""
+
+    def __init__(self, connection, wfile, path):
+        self.connection = connection
+        self.path = path
+        self.wfile = wfile
+        self.lock = threading.Lock()
+        self.conn_id = str(uuid.uuid4())
+        self.api_key = None
+        self.topics = set()
+
+    def send(self, message, opcode=0x1):
+        payload = message if isinstance(message, bytes) else json.dumps(message, separators=(",", ":")).encode()
+        with self.lock:
+            try:
+                self.wfile.write(_ws_frame(opcode, payload))
+            except OSError:
+                pass
+
+    def drop(self):
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class MockState:
+    """Балансы, ордера и счетчики запросов заглушки. Аккаунт определяется по API-ключу."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit=None, clock_skew_ms=0, upgrade_seconds=0,
+                 sub_members=0, secrets=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.clock_skew_ms = clock_skew_ms
+        self.upgrade_seconds = upgrade_seconds
+        self.sub_members = sub_members
+        self.secrets = dict(secrets or {})
+        self.lock = threading.Lock()
+        self.accounts = {}
+        self.windows = {}
+        self.requests = {}
+        self.streams = []
+        self.streams_lock = threading.Lock()
+
+    def account(self, api_key):
+        account = self.accounts.get(api_key)
+        if account is None:
+            account = self.accounts[api_key] = {
+                "balances": {"UNIFIED": dict(DEFAULT_BALANCES), "FUND": dict(DEFAULT_BALANCES)},
+                "unifiedMarginStatus": 1,
+                "spotMarginMode": "0",
+                "spotLeverage": "",
+                "orders": {},
+                "transfers": {},
+                "withdrawals": [],
+            }
+        return account
+
+    def secret(self, api_key):
+        """Секрет ключа или None, если он неизвестен (тогда подпись не проверяется)."""
+        if api_key in self.secrets:
+            return self.secrets[api_key]
+        if api_key and api_key.startswith("benchkey"):
+            return "benchsecret" + api_key[len("benchkey"):]
+        return None
+
+    def signature_ok(self, api_key, sign_str, signature):
+        secret = self.secret(api_key)
+        if secret is None:
+            return True
+        expected = hmac.new(secret.encode("utf-8"), sign_str.encode("utf-8"), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature or "")
+
+    def reset(self):
+        with self.lock:
+            self.accounts.clear()
+            self.windows.clear()
+
+    def publish(self, api_key, topic, data):
+        """Рассылает событие topic всем соединениям аккаунта, подписанным на него."""
+        message = {"id": str(uuid.uuid4()), "topic": topic, "creationTime": self.now_ms(), "data": data}
+        with self.streams_lock:
+            streams = [stream for stream in self.streams if stream.api_key == api_key and topic in stream.topics]
+        for stream in streams:
+            stream.send(message)
+
+    def drop_streams(self):
+        """Рвет все WebSocket-соединения - для проверки переподключения."""
+        with self.streams_lock:
+            streams = list(self.streams)
+        for stream in streams:
+            stream.drop()
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def now_ms(self):
+        return int(time.time() * 1000) + self.clock_skew_ms
+
+    def take_rate_limit(self, api_key, path):
+        """Возвращает (limit, remaining, reset_ms, exceeded) или None, если лимит не задан."""
+        if not self.rate_limit or not api_key:
+            return None
+        now = self.now_ms()
+        window = now // 1000
+        with self.lock:
+            key = (api_key, path)
+            start, used = self.windows.get(key, (window, 0))
+            if start != window:
+                start, used = window, 0
+            used += 1
+            self.windows[key] = (start, used)
+        return self.rate_limit, max(self.rate_limit - used, 0), (window + 1) * 1000, used > self.rate_limit
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Без TCP_NODELAY заголовки и тело ответа уходят разными пакетами с задержкой Nagle
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            return self._websocket()
+        self._handle("GET")
+
+    def do_CONNECT(self):
+        # Туннель через прокси (так подключается WebSocket): дальше по этому же сокету придет обычный запрос
+        self.send_response(200, "Connection established")
+        self.end_headers()
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        # Запрос через прокси приходит с абсолютным URL, напрямую - с путем
+        parts = urlsplit(self.path)
+        path = parts.path
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        body = {}
+        raw = b""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            raw = self.rfile.read(length)
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                body = {}
+        params.update(body if isinstance(body, dict) else {})
+
+        state = self.state
+        state.count(path)
+        delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        api_key = self.headers.get("X-BAPI-API-KEY") or params.get("api_key")
+        headers = {"Timenow": str(state.now_ms())}
+
+        limit = state.take_rate_limit(api_key, path)
+        if limit:
+            limit_value, remaining, reset_ms, exceeded = limit
+            headers.update({
+                "X-Bapi-Limit": str(limit_value),
+                "X-Bapi-Limit-Status": str(remaining),
+                "X-Bapi-Limit-Reset-Timestamp": str(reset_ms),
+            })
+            if exceeded:
+                return self._reply(10006, "Too many visits!", {}, headers)
+
+        if api_key and state.error_rate and random.random() < state.error_rate:
+            return self._reply(10016, "Internal server error.", {}, headers)
+
+        timestamp = self.headers.get("X-BAPI-TIMESTAMP")
+        recv_window = int(self.headers.get("X-BAPI-RECV-WINDOW") or 5000)
+        if timestamp and abs(int(timestamp) - state.now_ms()) > recv_window:
+            return self._reply(10002, "invalid request, please check your server timestamp or recv_window param", {}, headers)
+
+        route = ROUTES.get(path)
+        if route is None:
+            return self._reply(10404, f"Unknown path {path}", {}, headers, status=404)
+        if route not in PUBLIC_ROUTES and not api_key:
+            return self._reply(10003, "API key is invalid.", {}, headers)
+        if route not in PUBLIC_ROUTES:
+            # Подписывается ровно то, что ушло на биржу: строка запроса GET или тело POST
+            payload = raw.decode("utf-8") if method == "POST" else parts.query
+            sign_str = f"{timestamp}{api_key}{self.headers.get('X-BAPI-RECV-WINDOW') or ''}{payload}"
+            if not state.signature_ok(api_key, sign_str, self.headers.get("X-BAPI-SIGN")):
+                return self._reply(10004, "error sign! please check your signature generation algorithm", {}, headers)
+
+        with state.lock:
+            ret_code, ret_msg, result = route(state, api_key, params)
+        self._reply(ret_code, ret_msg, result, headers)
+
+    def _websocket(self):
+        state = self.state
+        path = urlsplit(self.path).path
+        state.count(path)
+        if path not in ("/v5/private", "/v5/trade"):
+            return self._reply(10404, f"Unknown path {path}", {}, {}, status=404)
+
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+
+        stream = MockStream(self.connection, self.wfile, path)
+        with state.streams_lock:
+            state.streams.append(stream)
+        try:
+            while True:
+                opcode, payload = _ws_read_frame(self.rfile)
+                if opcode is None or opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    stream.send(payload, opcode=0xA)
+                elif opcode == 0x1:
+                    self._ws_message(stream, json.loads(payload))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with state.streams_lock:
+                state.streams.remove(stream)
+
+    def _ws_message(self, stream, message):
+        op = message.get("op")
+        if stream.path == "/v5/trade":
+            return self._ws_trade(stream, message)
+        reply = {"success": True, "ret_msg": "", "op": op, "conn_id": stream.conn_id, "req_id": message.get("req_id", "")}
+        if op == "ping":
+            reply.update(op="pong", args=[str(self.state.now_ms())])
+        elif op == "auth":
+            api_key, expires, signature = message.get("args", [None, 0, None])
+            if int(expires) < self.state.now_ms():
+                reply.update(success=False, ret_msg="Params Error")
+            elif not self.state.signature_ok(api_key, f"GET/realtime{expires}", signature):
+                reply.update(success=False, ret_msg="Error sign")
+            else:
+                stream.api_key = api_key
+        elif op == "subscribe":
+            if stream.api_key is None:
+                reply.update(success=False, ret_msg="Request not authorized")
+            else:
+                stream.topics.update(message.get("args", []))
+        else:
+            reply.update(success=False, ret_msg=f"Unknown op {op}")
+        stream.send(reply)
+
+    def _ws_trade(self, stream, message):
+        state = self.state
+        op = message.get("op")
+        reply = {"reqId": message.get("reqId", ""), "retCode": 0, "retMsg": "OK", "op": op, "data": {},
+                 "header": {"Timenow": str(state.now_ms())}, "connId": stream.conn_id}
+        if op == "ping":
+            reply["op"] = "pong"
+        elif op == "auth":
+            api_key, expires, signature = message.get("args", [None, 0, None])
+            if int(expires) < state.now_ms():
+                reply.update(retCode=10004, retMsg="Params Error")
+            elif not state.signature_ok(api_key, f"GET/realtime{expires}", signature):
+                reply.update(retCode=10004, retMsg="Error sign")
+            else:
+                stream.api_key = api_key
+        elif op in TRADE_OPS:
+            state.count(f"{stream.path}:{op}")
+            delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            timestamp = int(message.get("header", {}).get("X-BAPI-TIMESTAMP") or 0)
+            recv_window = int(message.get("header", {}).get("X-BAPI-RECV-WINDOW") or 5000)
+            if stream.api_key is None:
+                reply.update(retCode=10003, retMsg="Request not authorized")
+            elif abs(timestamp - state.now_ms()) > recv_window:
+                reply.update(retCode=10002, retMsg="invalid request, please check your server timestamp or recv_window param")
+            else:
+                with state.lock:
+                    ret_code, ret_msg, result = TRADE_OPS[op](state, stream.api_key, (message.get("args") or [{}])[0])
+                reply.update(retCode=ret_code, retMsg=ret_msg, data=result)
+        else:
+            reply.update(retCode=10404, retMsg=f"Unknown op {op}")
+        stream.send(reply)
+
+    def _reply(self, ret_code, ret_msg, result, headers, status=200):
+        payload = json.dumps({
+            "retCode": ret_code,
+            "retMsg": ret_msg,
+            "result": result,
+            "retExtInfo": {},
+            "time": self.state.now_ms(),
+        }, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _fmt(value):
+    return f"{value:.8f}".rstrip("0").rstrip(".") or "0"
+
+
+def _coin_balance(balances, coin):
+    amount = _fmt(balances.get(coin, 0.0))
+    return {"coin": coin, "walletBalance": amount, "transferBalance": amount, "bonus": "0"}
+
+
+def _market_time(state, api_key, params):
+    now_ns = time.time_ns() + state.clock_skew_ms * 1_000_000
+    return 0, "OK", {"timeSecond": str(now_ns // 1_000_000_000), "timeNano": str(now_ns)}
+
+
+def _query_coin_balance(state, api_key, params):
+    balances = state.account(api_key)["balances"].setdefault(params.get("accountType", "UNIFIED"), {})
+    return 0, "success", {"accountType": params.get("accountType"), "balance": _coin_balance(balances, params.get("coin"))}
+
+
+def _uid(api_key):
+    return int(hashlib.sha1(api_key.encode()).hexdigest()[:7], 16) + 10 ** 8
+
+
+def _member(state, api_key, member_id):
+    """Аккаунт по memberId: сам ключ или его субаккаунт (субаккаунты хранятся под ключом "uid:<uid>")."""
+    if not member_id or int(member_id) == _uid(api_key):
+        return state.account(api_key)
+    return state.account(f"uid:{member_id}")
+
+
+def _query_api(state, api_key, params):
+    return 0, "", {"apiKey": api_key, "userID": _uid(api_key), "readOnly": 0, "isMaster": True,
+                   "permissions": {"Wallet": ["AccountTransfer", "SubMemberTransfer"]}}
+
+
+def _sub_members(state, api_key, params):
+    master = _uid(api_key)
+    members = [{"uid": str(master * 1000 + index), "username": f"sub{index}", "memberType": 1, "status": 1,
+                "accountMode": 3, "remark": ""} for index in range(1, state.sub_members + 1)]
+    return 0, "", {"subMembers": members}
+
+
+def _universal_transfer(state, api_key, params):
+    master = state.account(api_key)
+    transfer_id = params.get("transferId")
+    if transfer_id in master["transfers"]:
+        return 0, "success", {"transferId": transfer_id, "status": master["transfers"][transfer_id]["status"]}
+    source = _member(state, api_key, params.get("fromMemberId"))["balances"].setdefault(params.get("fromAccountType"), {})
+    target = _member(state, api_key, params.get("toMemberId"))["balances"].setdefault(params.get("toAccountType"), {})
+    amount = float(params.get("amount") or 0)
+    coin = params.get("coin")
+    if source.get(coin, 0.0) + 1e-12 < amount:
+        return 131212, "Insufficient balance.", {}
+    source[coin] = source.get(coin, 0.0) - amount
+    target[coin] = target.get(coin, 0.0) + amount
+    master["transfers"][transfer_id] = {
+        "transferId": transfer_id, "coin": coin, "amount": str(params.get("amount")), "status": "SUCCESS",
+        "fromMemberId": params.get("fromMemberId"), "toMemberId": params.get("toMemberId"),
+        "fromAccountType": params.get("fromAccountType"), "toAccountType": params.get("toAccountType"),
+        "timestamp": str(state.now_ms()),
+    }
+    return 0, "success", {"transferId": transfer_id, "status": "SUCCESS"}
+
+
+def _query_coins_balance(state, api_key, params):
+    balances = _member(state, api_key, params.get("memberId"))["balances"].setdefault(params.get("accountType", "UNIFIED"), {})
+    coins = params["coin"].split(",") if params.get("coin") else sorted(balances)
+    return 0, "success", {"accountType": params.get("accountType"), "memberId": "",
+                          "balance": [_coin_balance(balances, coin) for coin in coins]}
+
+
+def _wallet_balance(state, api_key, params):
+    balances = state.account(api_key)["balances"]["UNIFIED"]
+    coins = [{"coin": coin, "walletBalance": _fmt(amount), "equity": _fmt(amount), "locked": "0",
+              "availableToWithdraw": _fmt(amount), "usdValue": _fmt(amount)}
+             for coin, amount in sorted(balances.items())]
+    return 0, "OK", {"list": [{"accountType": "UNIFIED", "coin": coins}]}
+
+
+# Шаг количества и минимумы спотовых пар; пары, которых нет в таблице, получают значения по умолчанию
+INSTRUMENTS = {
+    "USDCUSDT": {"basePrecision": "0.01", "quotePrecision": "0.0001", "minOrderQty": "1", "minOrderAmt": "1"},
+    "VELARUSDT": {"basePrecision": "0.1", "quotePrecision": "0.000001", "minOrderQty": "1", "minOrderAmt": "1"},
+}
+DEFAULT_INSTRUMENT = {"basePrecision": "0.0001", "quotePrecision": "0.000001", "minOrderQty": "0.01", "minOrderAmt": "1"}
+
+
+def _split_symbol(symbol):
+    quote = next((q for q in ("USDT", "USDC") if symbol.endswith(q) and symbol != q), symbol[-4:])
+    return symbol[:-len(quote)], quote
+
+
+def _instrument(symbol):
+    base, quote = _split_symbol(symbol)
+    return {"symbol": symbol, "baseCoin": base, "quoteCoin": quote, "status": "Trading",
+            "lotSizeFilter": dict(INSTRUMENTS.get(symbol, DEFAULT_INSTRUMENT), maxOrderQty="1000000000", maxOrderAmt="1000000000"),
+            "priceFilter": {"tickSize": "0.0001"}}
+
+
+def _instruments_info(state, api_key, params):
+    symbols = [params["symbol"]] if params.get("symbol") else sorted(INSTRUMENTS)
+    return 0, "OK", {"category": "spot", "list": [_instrument(symbol) for symbol in symbols], "nextPageCursor": ""}
+
+
+def _order_create(state, api_key, params):
+    account = state.account(api_key)
+    balances = account["balances"]["UNIFIED"]
+    symbol = params.get("symbol", "")
+    base, quote = _split_symbol(symbol)
+    qty = float(params.get("qty") or 0)
+    # Рыночная покупка на споте по умолчанию указывается в монете котировки, цена всегда 1
+    buy = str(params.get("side")).upper() == "BUY"
+    spend_coin, get_coin = (quote, base) if buy else (base, quote)
+    # Как на бирже: лишние знаки и количество меньше минимума пары отклоняются
+    lot = INSTRUMENTS.get(symbol, DEFAULT_INSTRUMENT)
+    step = Decimal(lot["quotePrecision"] if buy else lot["basePrecision"])
+    if Decimal(str(params.get("qty") or 0)) % step != 0:
+        return 170137, "Order quantity has too many decimals.", {}
+    if qty <= 0 or qty < float(lot["minOrderAmt"] if buy else lot["minOrderQty"]):
+        return 170136, "Order quantity is lower than the minimum.", {}
+    if str(params.get("isLeverage")) == "1" and account["spotMarginMode"] != "1":
+        return 176007, "Spot margin trade is not turned on.", {}
+    if balances.get(spend_coin, 0.0) + 1e-12 < qty and not str(params.get("isLeverage")) == "1":
+        return 170131, "Insufficient balance.", {}
+    balances[spend_coin] = balances.get(spend_coin, 0.0) - qty
+    balances[get_coin] = balances.get(get_coin, 0.0) + qty
+    order_id = str(uuid.uuid4())
+    order = account["orders"][order_id] = {
+        "category": "spot", "orderId": order_id, "orderLinkId": params.get("orderLinkId", ""), "symbol": symbol,
+        "side": params.get("side"), "orderType": params.get("orderType", "Market"), "orderStatus": "Filled",
+        "qty": _fmt(qty), "cumExecQty": _fmt(qty), "cumExecValue": _fmt(qty), "cumExecFee": "0", "avgPrice": "1",
+        "updatedTime": str(state.now_ms()),
+    }
+    state.publish(api_key, "order", [order])
+    state.publish(api_key, "execution", [{
+        "category": "spot", "symbol": symbol, "orderId": order_id, "orderLinkId": order["orderLinkId"],
+        "side": order["side"], "execId": str(uuid.uuid4()), "execQty": _fmt(qty), "execPrice": "1",
+        "execValue": _fmt(qty), "execFee": "0", "execTime": str(state.now_ms()), "isMaker": False,
+    }])
+    state.publish(api_key, "wallet", _wallet_balance(state, api_key, {})[2]["list"])
+    return 0, "OK", {"orderId": order_id, "orderLinkId": params.get("orderLinkId", "")}
+
+
+def _order_cancel(state, api_key, params):
+    orders = state.account(api_key)["orders"]
+    order = orders.get(params.get("orderId")) or next(
+        (row for row in orders.values() if params.get("orderLinkId") and row["orderLinkId"] == params.get("orderLinkId")), None)
+    # Рыночные ордера исполняются сразу, отменять уже нечего
+    if order is None or order["orderStatus"] in ("Filled", "Cancelled"):
+        return 170213, "Order does not exist.", {}
+    order["orderStatus"] = "Cancelled"
+    return 0, "OK", {"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]}
+
+
+def _order_realtime(state, api_key, params):
+    rows = [order for order in state.account(api_key)["orders"].values()
+            if (not params.get("orderId") or order["orderId"] == params.get("orderId"))
+            and (not params.get("orderLinkId") or order["orderLinkId"] == params.get("orderLinkId"))]
+    return 0, "OK", {"category": "spot", "list": rows, "nextPageCursor": ""}
+
+
+def _margin_switch(state, api_key, params):
+    state.account(api_key)["spotMarginMode"] = str(params.get("spotMarginMode", "0"))
+    return 0, "success", {"spotMarginMode": str(params.get("spotMarginMode", "0"))}
+
+
+def _margin_leverage(state, api_key, params):
+    state.account(api_key)["spotLeverage"] = str(params.get("leverage", ""))
+    return 0, "success", {}
+
+
+def _margin_state(state, api_key, params):
+    account = state.account(api_key)
+    return 0, "success", {"spotLeverage": account["spotLeverage"], "spotMarginMode": account["spotMarginMode"],
+                          "effectiveLeverage": account["spotLeverage"]}
+
+
+def _withdraw_create(state, api_key, params):
+    account = state.account(api_key)
+    balances = account["balances"]["FUND"]
+    amount = float(params.get("amount") or 0)
+    # Как на бирже: повтор с тем же requestId не создает второй вывод
+    request_id = params.get("requestId")
+    for row in account["withdrawals"]:
+        if request_id and row["requestId"] == request_id:
+            return 0, "success", {"id": row["withdrawId"]}
+    coin = next((row for row in COINS if row["coin"] == params.get("coin")), {"chains": []})
+    chain = next((row for row in coin["chains"] if row["chain"] == params.get("chain")), None)
+    if chain is None or chain["chainWithdraw"] != "1":
+        return 131002, "Withdraw address chain or destination tag are not equal", {}
+    if amount < float(chain["withdrawMin"]):
+        return 131084, "Withdraw amount is less than minimum", {}
+    if -Decimal(str(params.get("amount"))).normalize().as_tuple().exponent > int(chain["minAccuracy"]):
+        return 131073, "The withdrawal amount exceeds the precision", {}
+    if balances.get(params.get("coin"), 0.0) + 1e-12 < amount:
+        return 131001, "Insufficient balance.", {}
+    balances[params.get("coin")] -= amount
+    withdraw_id = str(random.randint(10 ** 7, 10 ** 8))
+    account["withdrawals"].append({
+        "withdrawId": withdraw_id, "requestId": request_id, "txID": "", "withdrawType": 0,
+        "coin": params.get("coin"), "chain": params.get("chain"), "amount": str(params.get("amount")),
+        "withdrawFee": chain["withdrawFee"], "status": "success", "toAddress": params.get("address"),
+        "tag": params.get("tag") or "", "createTime": str(state.now_ms()), "updateTime": str(state.now_ms()),
+    })
+    return 0, "success", {"id": withdraw_id}
+
+
+def _withdraw_records(state, api_key, params):
+    start = int(params.get("startTime") or 0)
+    rows = [row for row in state.account(api_key)["withdrawals"]
+            if (not params.get("coin") or row["coin"] == params.get("coin"))
+            and (not params.get("withdrawID") or row["withdrawId"] == params.get("withdrawID"))
+            and int(row["createTime"]) >= start]
+    return 0, "success", {"rows": [{k: v for k, v in row.items() if k != "requestId"} for row in reversed(rows)],
+                          "nextPageCursor": ""}
+
+
+def _deposit_address(state, api_key, params):
+    address = "0x" + uuid.uuid5(uuid.NAMESPACE_OID, api_key).hex + "00000000"
+    return 0, "success", {"coin": params.get("coin"), "chains": [
+        {"chainType": params.get("chainType"), "addressDeposit": address, "tagDeposit": "", "chain": params.get("chainType")}]}
+
+
+def _coin_info(state, api_key, params):
+    rows = [row for row in COINS if not params.get("coin") or row["coin"] == params.get("coin")]
+    return 0, "success", {"rows": rows}
+
+
+def _account_info(state, api_key, params):
+    account = state.account(api_key)
+    if account.get("upgradeAt") is not None and time.time() >= account["upgradeAt"]:
+        account["unifiedMarginStatus"] = 4
+        account["upgradeAt"] = None
+    return 0, "OK", {"unifiedMarginStatus": account["unifiedMarginStatus"], "marginMode": "REGULAR_MARGIN",
+                     "isMasterTrader": False, "spotHedgingStatus": "OFF", "updatedTime": str(state.now_ms())}
+
+
+def _upgrade_to_uta(state, api_key, params):
+    account = state.account(api_key)
+    # С upgrade_seconds обновление идет асинхронно, как на бирже: статус в account/info меняется позже
+    if state.upgrade_seconds > 0 and account["unifiedMarginStatus"] == 1:
+        if account.get("upgradeAt") is None:
+            account["upgradeAt"] = time.time() + state.upgrade_seconds
+        return 0, "", {"unifiedUpdateStatus": "PROCESS", "unifiedUpdateMsg": {"msg": []}}
+    account["unifiedMarginStatus"] = 4
+    return 0, "", {"unifiedUpdateStatus": "SUCCESS", "unifiedUpdateMsg": {"msg": []}}
+
+
+def _legacy_coin_balance(state, api_key, params):
+    balances = state.account(api_key)["balances"].setdefault(params.get("accountType", "UNIFIED"), {})
+    return 0, "OK", {"balance": _coin_balance(balances, params.get("coin"))}
+
+
+def _inter_transfer(state, api_key, params):
+    account = state.account(api_key)
+    transfer_id = params.get("transferId")
+    # Как на бирже: повтор с тем же transferId не проводит перевод второй раз
+    if transfer_id in account["transfers"]:
+        return 0, "success", {"transferId": transfer_id, "status": account["transfers"][transfer_id]["status"]}
+    balances = account["balances"]
+    source = balances.setdefault(params.get("fromAccountType"), {})
+    target = balances.setdefault(params.get("toAccountType"), {})
+    amount = float(params.get("amount") or 0)
+    coin = params.get("coin")
+    if source.get(coin, 0.0) + 1e-12 < amount:
+        return 131212, "Insufficient balance.", {}
+    source[coin] = source.get(coin, 0.0) - amount
+    target[coin] = target.get(coin, 0.0) + amount
+    account["transfers"][transfer_id] = {
+        "transferId": transfer_id, "coin": coin, "amount": str(params.get("amount")), "status": "SUCCESS",
+        "fromAccountType": params.get("fromAccountType"), "toAccountType": params.get("toAccountType"),
+        "timestamp": str(state.now_ms()),
+    }
+    return 0, "success", {"transferId": transfer_id, "status": "SUCCESS"}
+
+
+def _transfer_list(state, api_key, params):
+    transfers = state.account(api_key)["transfers"]
+    rows = [row for transfer_id, row in transfers.items() if not params.get("transferId") or transfer_id == params.get("transferId")]
+    return 0, "success", {"list": rows, "nextPageCursor": ""}
+
+
+ROUTES = {
+    "/v5/market/time": _market_time,
+    "/v5/market/instruments-info": _instruments_info,
+    "/v5/asset/transfer/query-account-coin-balance": _query_coin_balance,
+    "/v5/asset/transfer/query-account-coins-balance": _query_coins_balance,
+    "/v5/account/wallet-balance": _wallet_balance,
+    "/v5/order/create": _order_create,
+    "/v5/order/cancel": _order_cancel,
+    "/v5/order/realtime": _order_realtime,
+    "/v5/spot-margin-trade/switch-mode": _margin_switch,
+    "/v5/spot-margin-trade/set-leverage": _margin_leverage,
+    "/v5/spot-margin-trade/state": _margin_state,
+    "/v5/asset/withdraw/create": _withdraw_create,
+    "/v5/asset/withdraw/query-record": _withdraw_records,
+    "/v5/asset/transfer/query-inter-transfer-list": _transfer_list,
+    "/v5/asset/transfer/universal-transfer": _universal_transfer,
+    "/v5/asset/transfer/query-universal-transfer-list": _transfer_list,
+    "/v5/user/query-api": _query_api,
+    "/v5/user/query-sub-members": _sub_members,
+    "/v5/asset/deposit/query-address": _deposit_address,
+    "/v5/asset/coin/query-info": _coin_info,
+    "/v5/account/info": _account_info,
+    "/v5/account/upgrade-to-uta": _upgrade_to_uta,
+    # v3 эндпоинты, которые пока используют transfer.py и withdraw.py
+    "/asset/v3/private/transfer/account-coin/balance/query": _legacy_coin_balance,
+    "/asset/v3/private/transfer/inter-transfer": _inter_transfer,
+}
+
+
+# Эндпоинты без ключа API
+PUBLIC_ROUTES = (_market_time, _instruments_info)
+
+
+TRADE_OPS = {
+    "order.create": _order_create,
+    "order.cancel": _order_cancel,
+}
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь listen() по умолчанию 5: при одновременном старте сотен аккаунтов SYN теряются
+    # и соединение открывается только после повтора через секунду
+    request_queue_size = 1024
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Запускает заглушку в фоновом потоке и возвращает сервер (порт - server.server_port)."""
+    state = MockState(**options)
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = MockServer((host, port), handler)
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка Bybit v5 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None, help="запросов в секунду на ключ и эндпоинт")
+    parser.add_argument("--clock-skew-ms", type=int, default=0)
+    parser.add_argument("--upgrade-seconds", type=float, default=0, help="через сколько секунд завершается обновление до UTA")
+    parser.add_argument("--sub-members", type=int, default=0, help="сколько субаккаунтов у каждого ключа")
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, rate_limit=args.rate_limit, clock_skew_ms=args.clock_skew_ms,
+                          upgrade_seconds=args.upgrade_seconds, sub_members=args.sub_members)
+    print(f"Заглушка Bybit запущена на http://{args.host}:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())